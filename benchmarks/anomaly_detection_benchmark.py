@@ -0,0 +1,58 @@
+"""
+Per-reading overhead of the streaming anomaly detectors.
+
+Usage: python benchmarks/anomaly_detection_benchmark.py [--sensors N] [--readings N] [--batch N]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routers.anomaly_detection import AnomalyDetector
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sensors", type=int, default=500)
+    parser.add_argument("--readings", type=int, default=2000, help="Readings per sensor")
+    parser.add_argument("--batch", type=int, default=60, help="Readings per sensor per ingestion batch")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    detector = AnomalyDetector()
+    sensor_types = ["piezometer", "inclinometer", "water_level", "ph"]
+    sensors = [
+        {"sensor_id": f"SEN{i:06d}", "facility_id": "FAC001", "sensor_type": sensor_types[i % len(sensor_types)]}
+        for i in range(args.sensors)
+    ]
+
+    # One reading per minute with noise and occasional steps
+    start_us = 1_700_000_000_000_000
+    timestamps = start_us + np.arange(args.readings, dtype=np.int64) * 60_000_000
+    values = 100 + rng.normal(0, 0.05, size=(args.sensors, args.readings))
+    values[:, args.readings // 2:] += rng.choice([0, 0, 0, 25], size=(args.sensors, 1))
+
+    total = args.sensors * args.readings
+    detections = 0
+    started = time.perf_counter()
+    for offset in range(0, args.readings, args.batch):
+        batch_times = timestamps[offset:offset + args.batch]
+        for index, sensor in enumerate(sensors):
+            detections += len(detector.process(sensor, batch_times, values[index, offset:offset + args.batch]))
+    elapsed = time.perf_counter() - started
+
+    print(f"sensors:            {args.sensors}")
+    print(f"readings:           {total}")
+    print(f"detections:         {detections}")
+    print(f"elapsed:            {elapsed:.3f} s")
+    print(f"per reading:        {elapsed / total * 1e6:.2f} us")
+    print(f"throughput:         {total / elapsed:,.0f} readings/s")
+    print(f"state per sensor:   {detector.config['window']}-point window, fixed size")
+
+
+if __name__ == "__main__":
+    main()
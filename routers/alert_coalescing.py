@@ -0,0 +1,110 @@
+from typing import Dict, Optional, Any, Tuple
+import math
+import threading
+import numpy as np
+from .sensor_store import STATUS_CODES, to_epoch_us
+
+# Repeats of an open (sensor, alert type) alert within the window fold into it instead of raising a new one;
+# a threshold alert re-arms only once readings are back inside the bound by this fraction of it
+default_coalescing_config = {"window_seconds": 1800.0, "hysteresis": 0.05}
+
+ALERT_CODE = STATUS_CODES["Alert"]
+
+
+def coalescing_config_from_env(environ: Dict[str, str]) -> Dict[str, float]:
+    """Coalescing settings from TAILINGSIQ_ALERT_WINDOW_SECONDS and TAILINGSIQ_ALERT_HYSTERESIS"""
+    return {
+        "window_seconds": float(environ.get("TAILINGSIQ_ALERT_WINDOW_SECONDS", default_coalescing_config["window_seconds"])),
+        "hysteresis": float(environ.get("TAILINGSIQ_ALERT_HYSTERESIS", default_coalescing_config["hysteresis"]))
+    }
+
+
+def rearm_margin(bound: float, hysteresis: float) -> float:
+    return abs(bound) * hysteresis if math.isfinite(bound) else 0.0
+
+
+class AlertCoalescer:
+    """
+    Alert storm control between the detectors and the alert store.
+    Keeps the open alert and last sighting per (sensor, alert type) and a threshold latch per sensor,
+    so each event costs a dictionary lookup.
+    """
+
+    def __init__(self, config: Optional[Dict[str, float]] = None):
+        self.config = dict(default_coalescing_config, **(config or {}))
+        self.window_us = int(self.config["window_seconds"] * 1_000_000)
+        self.lock = threading.RLock()
+        self.open: Dict[Tuple[str, str], Tuple[str, int]] = {}
+        self.latched: Dict[str, bool] = {}
+        self.raised = 0
+        self.coalesced = 0
+        self.suppressed = 0
+
+    def match(self, sensor_id: str, alert_type: str, timestamp_us: int) -> Optional[str]:
+        """
+        Return the open alert a new occurrence folds into, recording the sighting, or None if a
+        new alert should be raised. Call with the lock held until the new alert is stored.
+        """
+        key = (sensor_id, alert_type)
+        entry = self.open.get(key)
+        if entry is None or timestamp_us - entry[1] > self.window_us:
+            self.raised += 1
+            return None
+        self.open[key] = (entry[0], max(entry[1], timestamp_us))
+        self.coalesced += 1
+        return entry[0]
+
+    def alert_changed(self, alert: Any, previous_status: Optional[str]):
+        """Alert store listener: track open alerts and forget resolved ones"""
+        key = (alert.sensor_id, alert.alert_type)
+        with self.lock:
+            if alert.status == "Resolved":
+                entry = self.open.get(key)
+                if entry is not None and entry[0] == alert.alert_id:
+                    del self.open[key]
+            elif previous_status is None:
+                last_seen = to_epoch_us(alert.last_seen or alert.timestamp)
+                entry = self.open.get(key)
+                if entry is None or entry[1] <= last_seen:
+                    self.open[key] = (alert.alert_id, last_seen)
+
+    def threshold_crossings(self, sensor_id: str, values: np.ndarray, statuses: np.ndarray, low: float, high: float) -> np.ndarray:
+        """
+        Indices of readings that trigger a threshold alert. After a trigger the sensor stays latched
+        until a reading is back inside [low, high] by the hysteresis margin, so a value oscillating
+        around a bound triggers once.
+        """
+        hysteresis = self.config["hysteresis"]
+        trigger = statuses == ALERT_CODE
+        rearm = (values >= low + rearm_margin(low, hysteresis)) & (values <= high - rearm_margin(high, hysteresis))
+        events = np.flatnonzero(trigger | rearm)
+        if len(events) == 0:
+            return events
+
+        # A trigger fires only when the event before it (or the latch state before the batch) re-armed
+        is_trigger = trigger[events]
+        with self.lock:
+            latched_before = self.latched.get(sensor_id, False)
+            self.latched[sensor_id] = bool(is_trigger[-1])
+            was_latched = np.concatenate(([latched_before], is_trigger[:-1]))
+            fires = is_trigger & ~was_latched
+            self.suppressed += int(is_trigger.sum() - fires.sum())
+        return events[fires]
+
+    def reset(self, sensor_id: Optional[str] = None):
+        """Re-arm a sensor's threshold latch (or every sensor's), e.g. after thresholds change"""
+        with self.lock:
+            if sensor_id is None:
+                self.latched.clear()
+            else:
+                self.latched.pop(sensor_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.config,
+            "open_alerts": len(self.open),
+            "latched_sensors": sum(self.latched.values()),
+            "raised": self.raised,
+            "coalesced": self.coalesced,
+            "suppressed": self.suppressed
+        }
@@ -0,0 +1,189 @@
+from typing import Callable, Dict, List, Optional, Any, Tuple
+import bisect
+import threading
+from .sensor_store import to_epoch_us
+
+# Index entries sort oldest first, so new alerts append at the end: (timestamp in microseconds, alert_id)
+IndexEntry = Tuple[int, str]
+
+
+def alert_id_for(facility_id: str, sequence: int) -> str:
+    """Alert ID for a facility's nth alert; the separator keeps IDs unique past 999 facilities or alerts"""
+    return f"ALT{facility_id[3:]}-{sequence:03d}"
+
+
+class SortedIndex:
+    """Maps a key to the alerts carrying it, kept in timestamp order"""
+
+    def __init__(self):
+        self.entries: Dict[tuple, List[IndexEntry]] = {}
+
+    def add(self, key: tuple, entry: IndexEntry):
+        entries = self.entries.setdefault(key, [])
+        if not entries or entries[-1] <= entry:
+            entries.append(entry)
+        else:
+            bisect.insort(entries, entry)
+
+    def remove(self, key: tuple, entry: IndexEntry):
+        entries = self.entries.get(key)
+        if not entries:
+            return
+        position = bisect.bisect_left(entries, entry)
+        if position < len(entries) and entries[position] == entry:
+            del entries[position]
+            if not entries:
+                del self.entries[key]
+
+    def get(self, key: tuple) -> List[IndexEntry]:
+        return self.entries.get(key, [])
+
+
+class AlertStore:
+    """
+    In-process alert repository.
+    Primary index on alert_id; secondary indexes on facility, (facility, status)
+    and (facility, severity), each ordered by timestamp and read newest first.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.alerts: Dict[str, Any] = {}
+        self.entries: Dict[str, IndexEntry] = {}
+        self.by_facility = SortedIndex()
+        self.by_status = SortedIndex()
+        self.by_severity = SortedIndex()
+        self.sequences: Dict[str, int] = {}
+        self.listeners: List[Callable] = []
+
+    def add_listener(self, listener: Callable):
+        """Register a callback run as listener(alert, previous_status) after an alert is added (previous_status None) or changes status"""
+        self.listeners.append(listener)
+
+    def _notify(self, alert: Any, previous_status: Optional[str]):
+        for listener in self.listeners:
+            listener(alert, previous_status)
+
+    def _index(self, alert: Any, entry: IndexEntry):
+        self.by_facility.add((alert.facility_id,), entry)
+        self.by_status.add((alert.facility_id, alert.status), entry)
+        self.by_severity.add((alert.facility_id, alert.severity), entry)
+
+    def _unindex(self, alert: Any, entry: IndexEntry):
+        self.by_facility.remove((alert.facility_id,), entry)
+        self.by_status.remove((alert.facility_id, alert.status), entry)
+        self.by_severity.remove((alert.facility_id, alert.severity), entry)
+
+    def next_alert_id(self, facility_id: str) -> str:
+        """Allocate the next alert ID for a facility (ALT + facility number + "-" + sequence)"""
+        with self.lock:
+            sequence = self.sequences.get(facility_id, 0) + 1
+            self.sequences[facility_id] = sequence
+            return alert_id_for(facility_id, sequence)
+
+    def add(self, alert: Any) -> Any:
+        """Store a new alert"""
+        with self.lock:
+            if alert.alert_id in self.alerts:
+                raise ValueError(f"Alert {alert.alert_id} already exists")
+            entry = (to_epoch_us(alert.timestamp), alert.alert_id)
+            self.alerts[alert.alert_id] = alert
+            self.entries[alert.alert_id] = entry
+            self._index(alert, entry)
+
+            # Keep generated IDs ahead of any explicitly numbered alerts
+            _, separator, suffix = alert.alert_id.rpartition("-")
+            if not separator:
+                suffix = alert.alert_id[len(alert.facility_id):]  # Logged before IDs had a separator
+            if suffix.isdigit():
+                self.sequences[alert.facility_id] = max(self.sequences.get(alert.facility_id, 0), int(suffix))
+        self._notify(alert, None)
+        return alert
+
+    def get(self, alert_id: str) -> Optional[Any]:
+        """Get an alert by ID"""
+        return self.alerts.get(alert_id)
+
+    def transition(self, alert_id: str, status: str, **changes) -> Any:
+        """Change an alert's status (and any other fields), moving it between index entries"""
+        with self.lock:
+            alert = self.alerts[alert_id]
+            entry = self.entries[alert_id]
+            previous_status = alert.status
+
+            self._unindex(alert, entry)
+            alert.status = status
+            for field, value in changes.items():
+                setattr(alert, field, value)
+            if "timestamp" in changes:
+                entry = (to_epoch_us(alert.timestamp), alert_id)
+                self.entries[alert_id] = entry
+            self._index(alert, entry)
+        self._notify(alert, previous_status)
+        return alert
+
+    def update(self, alert_id: str, **changes) -> Any:
+        """Change fields that no index covers, without touching the indexes"""
+        with self.lock:
+            alert = self.alerts[alert_id]
+            for field, value in changes.items():
+                setattr(alert, field, value)
+        self._notify(alert, alert.status)
+        return alert
+
+    def query(
+        self,
+        facility_id: str,
+        status: Optional[str] = None,
+        severity: Optional[str] = None,
+        limit: Optional[int] = None,
+        start_us: Optional[int] = None,
+        end_us: Optional[int] = None,
+        before: Optional[IndexEntry] = None
+    ) -> List[Any]:
+        """
+        Get a facility's alerts, most recent first, through the secondary indexes.
+        start_us/end_us bound the alert timestamp (inclusive); before is a keyset
+        position (timestamp, alert_id) and only older alerts are returned.
+        """
+        with self.lock:
+            field = value = None
+            if status and severity:
+                # Walk the smaller index and check the other attribute
+                by_status = self.by_status.get((facility_id, status))
+                by_severity = self.by_severity.get((facility_id, severity))
+                if len(by_status) <= len(by_severity):
+                    entries, field, value = by_status, "severity", severity
+                else:
+                    entries, field, value = by_severity, "status", status
+            elif status:
+                entries = self.by_status.get((facility_id, status))
+            elif severity:
+                entries = self.by_severity.get((facility_id, severity))
+            else:
+                entries = self.by_facility.get((facility_id,))
+
+            # Narrow to the requested window by bisection
+            lo = 0 if start_us is None else bisect.bisect_left(entries, (start_us,))
+            hi = len(entries)
+            if end_us is not None:
+                hi = bisect.bisect_left(entries, (end_us + 1,))
+            if before is not None:
+                hi = min(hi, bisect.bisect_left(entries, tuple(before)))
+
+            alerts = []
+            for position in range(hi - 1, lo - 1, -1):
+                if limit is not None and len(alerts) >= limit:
+                    break
+                alert = self.alerts[entries[position][1]]
+                if field is None or getattr(alert, field) == value:
+                    alerts.append(alert)
+            return alerts
+
+    def sort_key(self, alert_id: str) -> IndexEntry:
+        """Keyset position of an alert, usable as a cursor for query(before=...)"""
+        return self.entries[alert_id]
+
+    def facility_alerts(self, facility_id: str, limit: Optional[int] = None) -> List[Any]:
+        """Get a facility's alerts, most recent first"""
+        return self.query(facility_id, limit=limit)
@@ -0,0 +1,182 @@
+from typing import Dict, List, Optional, Any, Tuple
+import math
+import threading
+import numpy as np
+
+# Detector settings shared by all sensors
+default_detector_config = {
+    "window": 12,        # Readings in the rolling slope window
+    "alpha": 0.1,        # EWMA smoothing factor
+    "warmup": 12,        # Readings before z-score and CUSUM checks start
+    "z_threshold": 5.0,  # |z| that counts as a spike
+    "cusum_k": 0.5,      # CUSUM slack, in standard deviations
+    "cusum_h": 8.0       # CUSUM decision threshold, in standard deviations
+}
+
+# Maximum sustained rate of change per sensor type, in units per hour
+default_rate_limits = {
+    "piezometer": 10.0,
+    "inclinometer": 0.5,
+    "water_level": 0.5,
+    "settlement": 1.0,
+    "flow_rate": 5.0
+}
+
+# Re-centre slope sums when times drift this far (seconds) from the origin, to keep precision
+RECENTRE_SECONDS = 86400.0
+
+
+class SensorDetector:
+    """
+    Constant-size online state for one sensor: rolling-window least-squares slope,
+    EWMA mean/variance for z-scores, and a two-sided CUSUM on the standardised residual.
+    Each update is O(1).
+    """
+
+    __slots__ = (
+        "window", "alpha", "warmup", "z_threshold", "cusum_k", "cusum_h", "rate_limit",
+        "times", "values", "head", "size", "origin",
+        "sum_t", "sum_v", "sum_tt", "sum_tv",
+        "count", "mean", "variance", "cusum_pos", "cusum_neg", "last_time"
+    )
+
+    def __init__(self, config: Dict[str, float], rate_limit: Optional[float] = None):
+        self.window = int(config["window"])
+        self.alpha = config["alpha"]
+        self.warmup = int(config["warmup"])
+        self.z_threshold = config["z_threshold"]
+        self.cusum_k = config["cusum_k"]
+        self.cusum_h = config["cusum_h"]
+        self.rate_limit = rate_limit
+        self.times = [0.0] * self.window
+        self.values = [0.0] * self.window
+        self.head = 0
+        self.size = 0
+        self.origin = None
+        self.sum_t = self.sum_v = self.sum_tt = self.sum_tv = 0.0
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+        self.cusum_pos = self.cusum_neg = 0.0
+        self.last_time = None
+
+    def _recentre(self, origin: float):
+        # Shift stored times to a new origin and recompute the sums (window-sized, so O(1))
+        shift = self.origin - origin
+        self.origin = origin
+        self.sum_t = self.sum_tt = self.sum_tv = 0.0
+        for i in range(self.size):
+            index = (self.head - self.size + i) % self.window
+            t = self.times[index] + shift
+            self.times[index] = t
+            self.sum_t += t
+            self.sum_tt += t * t
+            self.sum_tv += t * self.values[index]
+
+    def update(self, time_seconds: float, value: float) -> List[Tuple[str, float, float]]:
+        """Feed one reading; returns (kind, statistic, ratio to threshold) for each detector that fired"""
+        detections = []
+        self.last_time = time_seconds
+
+        # Rolling-window slope: evict the oldest point, add the new one
+        if self.origin is None:
+            self.origin = time_seconds
+        elif time_seconds - self.origin > RECENTRE_SECONDS:
+            self._recentre(time_seconds)
+        t = time_seconds - self.origin
+        if self.size == self.window:
+            old_t = self.times[self.head]
+            old_v = self.values[self.head]
+            self.sum_t -= old_t
+            self.sum_v -= old_v
+            self.sum_tt -= old_t * old_t
+            self.sum_tv -= old_t * old_v
+        else:
+            self.size += 1
+        self.times[self.head] = t
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.window
+        self.sum_t += t
+        self.sum_v += value
+        self.sum_tt += t * t
+        self.sum_tv += t * value
+
+        if self.rate_limit and self.size == self.window:
+            n = self.size
+            denominator = n * self.sum_tt - self.sum_t * self.sum_t
+            if denominator > 0:
+                rate = (n * self.sum_tv - self.sum_t * self.sum_v) / denominator * 3600.0
+                if abs(rate) > self.rate_limit:
+                    detections.append(("slope", rate, abs(rate) / self.rate_limit))
+
+        # EWMA z-score against the state before this reading
+        self.count += 1
+        if self.count == 1:
+            self.mean = value
+            return detections
+
+        deviation = value - self.mean
+        if self.count > self.warmup and self.variance > 0:
+            z = deviation / math.sqrt(self.variance)
+            if abs(z) > self.z_threshold:
+                detections.append(("zscore", z, abs(z) / self.z_threshold))
+
+            # Two-sided CUSUM on the standardised residual, reset after it fires
+            self.cusum_pos = max(0.0, self.cusum_pos + z - self.cusum_k)
+            self.cusum_neg = max(0.0, self.cusum_neg - z - self.cusum_k)
+            if self.cusum_pos > self.cusum_h or self.cusum_neg > self.cusum_h:
+                statistic = self.cusum_pos if self.cusum_pos >= self.cusum_neg else -self.cusum_neg
+                detections.append(("cusum", statistic, abs(statistic) / self.cusum_h))
+                self.cusum_pos = self.cusum_neg = 0.0
+
+        self.mean += self.alpha * deviation
+        self.variance = (1 - self.alpha) * (self.variance + self.alpha * deviation * deviation)
+        return detections
+
+
+class AnomalyDetector:
+    """Per-sensor streaming detectors, created on a sensor's first reading"""
+
+    def __init__(self, config: Optional[Dict[str, float]] = None, rate_limits: Optional[Dict[str, float]] = None):
+        self.config = dict(default_detector_config, **(config or {}))
+        self.rate_limits = dict(default_rate_limits if rate_limits is None else rate_limits)
+        self.detectors: Dict[str, SensorDetector] = {}
+        self.lock = threading.Lock()
+
+    def detector(self, sensor: Dict[str, Any]) -> SensorDetector:
+        detector = self.detectors.get(sensor["sensor_id"])
+        if detector is None:
+            detector = SensorDetector(self.config, self.rate_limits.get(sensor["sensor_type"]))
+            self.detectors[sensor["sensor_id"]] = detector
+        return detector
+
+    def process(self, sensor: Dict[str, Any], timestamps: np.ndarray, values: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Run a batch of new readings through the sensor's detectors in time order, whatever order
+        the batch arrived in; detections carry the reading's index in the batch as given.
+        Readings older than the last one seen before the batch are skipped; the state only moves forward.
+        """
+        detections = []
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values)
+        order = np.argsort(timestamps, kind="stable")
+        with self.lock:
+            detector = self.detector(sensor)
+            times = (timestamps[order] / 1_000_000).tolist()
+            for index, time_seconds, value in zip(order.tolist(), times, values[order].tolist()):
+                if detector.last_time is not None and time_seconds <= detector.last_time:
+                    continue
+                for kind, statistic, ratio in detector.update(time_seconds, value):
+                    detections.append({
+                        "index": index,
+                        "kind": kind,
+                        "statistic": statistic,
+                        "ratio": ratio,
+                        "value": value
+                    })
+        return detections
+
+    def reset(self, sensor_id: str):
+        """Forget a sensor's state, e.g. after recalibration"""
+        with self.lock:
+            self.detectors.pop(sensor_id, None)
@@ -0,0 +1,179 @@
+"""
+Columnar binary export of sensor readings, built straight from the stored arrays.
+
+Two formats are produced:
+
+Arrow IPC stream (application/vnd.apache.arrow.stream), when pyarrow is installed.
+One record batch per sensor with columns
+    sensor_id  dictionary<int32, string>
+    timestamp  timestamp[us]
+    value      float64
+    status     dictionary<int8, string>  (Normal, Warning, Alert)
+
+TailingsIQ packed readings (application/vnd.tailingsiq.readings), always available.
+All integers and floats are little-endian.
+    header:   4s  magic "TIQR"
+              u16 format version (1)
+              u16 reserved (0)
+              u32 number of sensor blocks
+    per sensor block:
+              u16 sensor_id length, then sensor_id bytes (UTF-8)
+              u16 unit length, then unit bytes (UTF-8)
+              u32 reading count n
+              padding with zero bytes so the arrays below start on an 8-byte boundary
+              i64[n] timestamps, microseconds since the Unix epoch (naive server time)
+              f64[n] values
+              u8[n]  status codes (0 Normal, 1 Warning, 2 Alert)
+"""
+from typing import Dict, Iterator, List, Optional, Any, Tuple
+import struct
+import numpy as np
+from .sensor_store import SeriesView, READING_STATUSES
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow export is optional
+    pa = None
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PACKED_MEDIA_TYPE = "application/vnd.tailingsiq.readings"
+
+PACKED_MAGIC = b"TIQR"
+PACKED_VERSION = 1
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+def _is_zero_quality(param: str) -> bool:
+    name, _, value = param.partition("=")
+    if name.strip().lower() != "q":
+        return False
+    try:
+        return float(value) == 0
+    except ValueError:
+        return False
+
+
+def negotiate_export_format(accept: Optional[str]) -> Optional[str]:
+    """Pick a binary format from an Accept header; None means the client wants JSON"""
+    if not accept:
+        return None
+    for part in accept.split(","):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        if any(_is_zero_quality(param) for param in params):
+            continue
+        media_type = media_type.lower()
+        if media_type == ARROW_STREAM_MEDIA_TYPE:
+            return "arrow"
+        if media_type == PACKED_MEDIA_TYPE:
+            return "packed"
+    return None
+
+
+def _encode_text(text: str) -> bytes:
+    raw = text.encode("utf-8")
+    return struct.pack("<H", len(raw)) + raw
+
+
+def iter_packed(series: List[Tuple[Dict[str, Any], SeriesView]]) -> Iterator[bytes]:
+    """Stream the packed readings format, one chunk per sensor block"""
+    yield struct.pack("<4sHHI", PACKED_MAGIC, PACKED_VERSION, 0, len(series))
+    offset = 12
+
+    for sensor, view in series:
+        head = _encode_text(sensor["sensor_id"]) + _encode_text(sensor["unit"]) + struct.pack("<I", len(view))
+        head += b"\0" * (-(offset + len(head)) % 8)
+        offset += len(head)
+        yield head
+        body = (
+            view.timestamps.astype("<i8", copy=False).tobytes()
+            + view.values.astype("<f8", copy=False).tobytes()
+            + view.statuses.astype(np.uint8, copy=False).tobytes()
+        )
+        offset += len(body)
+        yield body
+
+
+def read_packed(data: bytes) -> Dict[str, Dict[str, Any]]:
+    """Decode the packed readings format (reference reader for clients and tests)"""
+    magic, version, _, count = struct.unpack_from("<4sHHI", data, 0)
+    if magic != PACKED_MAGIC or version != PACKED_VERSION:
+        raise ValueError("Not a TIQR v1 stream")
+    offset = 12
+    sensors = {}
+    for _ in range(count):
+        fields = []
+        for _ in range(2):
+            length, = struct.unpack_from("<H", data, offset)
+            fields.append(data[offset + 2:offset + 2 + length].decode("utf-8"))
+            offset += 2 + length
+        n, = struct.unpack_from("<I", data, offset)
+        offset += 4
+        offset += -offset % 8
+        timestamps = np.frombuffer(data, dtype="<i8", count=n, offset=offset)
+        offset += 8 * n
+        values = np.frombuffer(data, dtype="<f8", count=n, offset=offset)
+        offset += 8 * n
+        statuses = np.frombuffer(data, dtype=np.uint8, count=n, offset=offset)
+        offset += n
+        sensors[fields[0]] = {"unit": fields[1], "timestamps": timestamps, "values": values, "statuses": statuses}
+    return sensors
+
+
+class _ChunkSink:
+    """Minimal writable file object collecting what the Arrow writer emits"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def arrow_schema():
+    return pa.schema([
+        pa.field("sensor_id", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("timestamp", pa.timestamp("us")),
+        pa.field("value", pa.float64()),
+        pa.field("status", pa.dictionary(pa.int8(), pa.string()))
+    ])
+
+
+def iter_arrow(series: List[Tuple[Dict[str, Any], SeriesView]]) -> Iterator[bytes]:
+    """Stream an Arrow IPC stream, one record batch per sensor"""
+    schema = arrow_schema()
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+    status_dictionary = pa.array(READING_STATUSES, type=pa.string())
+    yield sink.drain()
+
+    for sensor, view in series:
+        n = len(view)
+        batch = pa.RecordBatch.from_arrays([
+            pa.DictionaryArray.from_arrays(
+                pa.array(np.zeros(n, dtype=np.int32)), pa.array([sensor["sensor_id"]], type=pa.string())
+            ),
+            pa.array(view.timestamps, type=pa.timestamp("us")),
+            pa.array(view.values, type=pa.float64()),
+            pa.DictionaryArray.from_arrays(pa.array(view.statuses.astype(np.int8)), status_dictionary)
+        ], schema=schema)
+        writer.write_batch(batch)
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
@@ -0,0 +1,145 @@
+from typing import Dict, Set, Any, Optional
+from datetime import datetime
+import asyncio
+import json
+
+
+def json_default(value: Any):
+    """JSON encoder fallback for datetimes"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def running_in(loop: asyncio.AbstractEventLoop) -> bool:
+    """Check whether the caller is running on the given event loop"""
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+class BroadcastEvent:
+    """An event serialized once and shared by every subscriber it is delivered to"""
+
+    __slots__ = ("event_type", "payload", "_sse")
+
+    def __init__(self, event_type: str, payload: str):
+        self.event_type = event_type
+        self.payload = payload
+        self._sse = None
+
+    @property
+    def sse(self) -> str:
+        """Server-Sent Events frame, built on first use"""
+        if self._sse is None:
+            self._sse = f"event: {self.event_type}\ndata: {self.payload}\n\n"
+        return self._sse
+
+
+class Subscription:
+    """A subscriber's bounded queue of pending events"""
+
+    def __init__(self, facility_id: str, queue_size: int):
+        self.facility_id = facility_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    async def get(self) -> Optional[BroadcastEvent]:
+        """Wait for the next event; None means the subscription was dropped"""
+        return await self.queue.get()
+
+    def close(self):
+        """Discard pending events and wake the consumer with the end-of-stream marker"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class BroadcastHub:
+    """
+    Per-facility fan-out of monitoring events.
+    Publishing never waits: a subscriber whose queue is full is dropped
+    so one slow client cannot stall the others. Subscribe from the event loop;
+    publishes from worker threads are handed over to that loop.
+    """
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self.subscribers: Dict[str, Set[Subscription]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, facility_id: str) -> Subscription:
+        """Register a subscriber for a facility's events"""
+        self.loop = asyncio.get_running_loop()
+        subscription = Subscription(facility_id, self.queue_size)
+        self.subscribers.setdefault(facility_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a subscriber"""
+        subscribers = self.subscribers.get(subscription.facility_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.subscribers[subscription.facility_id]
+
+    def has_subscribers(self, facility_id: str) -> bool:
+        """Check whether anyone listens to a facility, so callers can skip building events"""
+        return facility_id in self.subscribers
+
+    def publish(self, facility_id: str, event_type: str, data: Any) -> int:
+        """Serialize an event once and queue it for every subscriber of the facility"""
+        subscribers = self.subscribers.get(facility_id)
+        if not subscribers:
+            return 0
+
+        event = BroadcastEvent(event_type, json.dumps(
+            {"type": event_type, "facility_id": facility_id, "data": data},
+            default=json_default
+        ))
+        self.published += 1
+
+        # asyncio queues are not thread-safe, so deliver on the subscribers' loop
+        if self.loop is not None and not running_in(self.loop):
+            try:
+                self.loop.call_soon_threadsafe(self.deliver, facility_id, event)
+            except RuntimeError:
+                # The loop has closed, and its subscribers with it
+                return 0
+            return len(subscribers)
+        return self.deliver(facility_id, event)
+
+    def deliver(self, facility_id: str, event: BroadcastEvent) -> int:
+        """Queue an event for every current subscriber of the facility (on the event loop)"""
+        subscribers = self.subscribers.get(facility_id)
+        if not subscribers:
+            return 0
+        delivered = 0
+
+        for subscription in list(subscribers):
+            try:
+                subscription.queue.put_nowait(event)
+                delivered += 1
+            except asyncio.QueueFull:
+                # Slow consumer: drop it rather than buffer without bound
+                subscription.dropped = True
+                self.dropped += 1
+                self.unsubscribe(subscription)
+                subscription.close()
+
+        self.delivered += delivered
+        return delivered
+
+    def stats(self) -> Dict[str, Any]:
+        """Subscriber counts and delivery totals"""
+        return {
+            "subscribers": {facility_id: len(subs) for facility_id, subs in self.subscribers.items()},
+            "queue_size": self.queue_size,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped
+        }
@@ -0,0 +1,129 @@
+from typing import Dict, Iterable, Optional, Any
+import threading
+from collections import Counter
+from .sensor_store import READING_STATUSES
+
+SENSOR_STATUSES = ["Online", "Offline", "Maintenance"]
+ALERT_SEVERITIES = ["Critical", "High", "Medium", "Low"]
+ALERT_STATUSES = ["Active", "Acknowledged", "Resolved"]
+
+
+class FacilityCounters:
+    """Running dashboard counts for one facility"""
+
+    __slots__ = ("sensors", "readings", "alerts")
+
+    def __init__(self):
+        self.sensors = Counter()   # Sensor status -> count
+        self.readings = Counter()  # Latest reading status -> count of sensors
+        self.alerts = Counter()    # (alert status, severity) -> count
+
+    def sensors_count(self) -> Dict[str, int]:
+        counts = {status: self.sensors[status] for status in SENSOR_STATUSES}
+        counts["Total"] = sum(self.sensors.values())
+        return counts
+
+    def alerts_count(self) -> Dict[str, int]:
+        counts = {severity: 0 for severity in ALERT_SEVERITIES}
+        for (_, severity), count in self.alerts.items():
+            counts[severity] = counts.get(severity, 0) + count
+        counts["Total"] = sum(self.alerts.values())
+        return counts
+
+    def alerts_by_status(self) -> Dict[str, int]:
+        counts = {status: 0 for status in ALERT_STATUSES}
+        for (status, _), count in self.alerts.items():
+            counts[status] = counts.get(status, 0) + count
+        return counts
+
+    def overall_status(self) -> str:
+        """Worst of the sensors' latest readings, escalated by active Critical/High alerts"""
+        if self.readings["Alert"] or self.alerts[("Active", "Critical")]:
+            return "Alert"
+        if self.readings["Warning"] or self.alerts[("Active", "High")]:
+            return "Warning"
+        return "Normal"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Plain-dict view used to compare counters"""
+        return {
+            "sensors_count": self.sensors_count(),
+            "readings_count": {status: self.readings[status] for status in READING_STATUSES},
+            "alerts_count": self.alerts_count(),
+            "alerts_by_status": self.alerts_by_status(),
+            "overall_status": self.overall_status()
+        }
+
+
+class DashboardCounters:
+    """Per-facility dashboard counts maintained incrementally from sensor, reading and alert events"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.facilities: Dict[str, FacilityCounters] = {}
+
+    def facility(self, facility_id: str) -> FacilityCounters:
+        counters = self.facilities.get(facility_id)
+        if counters is None:
+            counters = self.facilities.setdefault(facility_id, FacilityCounters())
+        return counters
+
+    def sensor_changed(self, sensor: Dict[str, Any], previous_status: Optional[str]):
+        """A sensor was registered (previous_status None) or its metadata changed"""
+        with self.lock:
+            counters = self.facility(sensor["facility_id"])
+            if previous_status is not None:
+                counters.sensors[previous_status] -= 1
+            counters.sensors[sensor["status"]] += 1
+
+    def latest_status_changed(self, facility_id: str, previous_code: Optional[int], latest_code: int):
+        """A sensor's latest reading status changed (previous_code None for its first reading)"""
+        with self.lock:
+            counters = self.facility(facility_id)
+            if previous_code is not None:
+                counters.readings[READING_STATUSES[previous_code]] -= 1
+            counters.readings[READING_STATUSES[latest_code]] += 1
+
+    def alert_changed(self, alert: Any, previous_status: Optional[str]):
+        """An alert was added (previous_status None) or changed status"""
+        with self.lock:
+            counters = self.facility(alert.facility_id)
+            if previous_status is not None:
+                counters.alerts[(previous_status, alert.severity)] -= 1
+            counters.alerts[(alert.status, alert.severity)] += 1
+
+    def replace(self, facility_id: str, counters: FacilityCounters):
+        """Swap in counters rebuilt from scratch"""
+        with self.lock:
+            self.facilities[facility_id] = counters
+
+
+def build_facility_counters(
+    sensors: Iterable[Dict[str, Any]],
+    latest_statuses: Iterable[int],
+    alerts: Iterable[Any]
+) -> FacilityCounters:
+    """Rebuild a facility's counters from scratch"""
+    counters = FacilityCounters()
+    for sensor in sensors:
+        counters.sensors[sensor["status"]] += 1
+    for code in latest_statuses:
+        counters.readings[READING_STATUSES[code]] += 1
+    for alert in alerts:
+        counters.alerts[(alert.status, alert.severity)] += 1
+    return counters
+
+
+def compare_counters(incremental: FacilityCounters, rebuilt: FacilityCounters) -> Dict[str, Any]:
+    """List every counter whose incremental value differs from the rebuilt one"""
+    current = incremental.snapshot()
+    expected = rebuilt.snapshot()
+    mismatches = {}
+    for section, values in expected.items():
+        if isinstance(values, dict):
+            for key, value in values.items():
+                if current[section].get(key) != value:
+                    mismatches[f"{section}.{key}"] = {"incremental": current[section].get(key), "rebuilt": value}
+        elif current[section] != values:
+            mismatches[section] = {"incremental": current[section], "rebuilt": values}
+    return mismatches
@@ -0,0 +1,355 @@
+from typing import Dict, List, Optional, Any, Iterable, Set, Tuple
+from functools import lru_cache
+import bisect
+import math
+import re
+import threading
+
+# Fields indexed per document and how much a match in each counts
+default_field_weights = {
+    "title": 3.0,
+    "tags": 2.0,
+    "category": 1.0,
+    "facility_name": 1.0,
+    "description": 1.0,
+    "content": 1.0
+}
+
+# BM25 parameters: term frequency saturation and document length normalisation
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Most vocabulary words a prefix query expands to
+MAX_PREFIX_EXPANSIONS = 64
+
+# Position gap between fields, so a phrase never matches across two fields
+FIELD_GAP = 1000
+
+# Runs of Unicode letters and digits; underscores and punctuation separate words
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+QUERY_PATTERN = re.compile(r'"([^"]*)"?|(\S+)')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case alphanumeric words"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+# Porter stemmer (M.F. Porter, 1980)
+
+def _consonant(word: str, i: int) -> bool:
+    if word[i] in "aeiou":
+        return False
+    if word[i] == "y":
+        return i == 0 or not _consonant(word, i - 1)
+    return True
+
+
+def _measure(stem: str) -> int:
+    """Number of vowel-consonant sequences in the stem"""
+    count, previous_vowel = 0, False
+    for i in range(len(stem)):
+        vowel = not _consonant(stem, i)
+        if previous_vowel and not vowel:
+            count += 1
+        previous_vowel = vowel
+    return count
+
+
+def _has_vowel(stem: str) -> bool:
+    return any(not _consonant(stem, i) for i in range(len(stem)))
+
+
+def _double_consonant(word: str) -> bool:
+    return len(word) >= 2 and word[-1] == word[-2] and _consonant(word, len(word) - 1)
+
+
+def _cvc(word: str) -> bool:
+    """Ends consonant-vowel-consonant, the last not w, x or y"""
+    return (
+        len(word) >= 3
+        and _consonant(word, len(word) - 3)
+        and not _consonant(word, len(word) - 2)
+        and _consonant(word, len(word) - 1)
+        and word[-1] not in "wxy"
+    )
+
+
+def _by_length(rules: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    return sorted(rules, key=lambda rule: -len(rule[0]))
+
+
+STEP2_RULES = _by_length([
+    ("ational", "ate"), ("tional", "tion"), ("enci", "ence"), ("anci", "ance"), ("izer", "ize"),
+    ("abli", "able"), ("alli", "al"), ("entli", "ent"), ("eli", "e"), ("ousli", "ous"),
+    ("ization", "ize"), ("ation", "ate"), ("ator", "ate"), ("alism", "al"), ("iveness", "ive"),
+    ("fulness", "ful"), ("ousness", "ous"), ("aliti", "al"), ("iviti", "ive"), ("biliti", "ble")
+])
+STEP3_RULES = _by_length([
+    ("icate", "ic"), ("ative", ""), ("alize", "al"), ("iciti", "ic"), ("ical", "ic"), ("ful", ""), ("ness", "")
+])
+STEP4_SUFFIXES = sorted([
+    "al", "ance", "ence", "er", "ic", "able", "ible", "ant", "ement", "ment", "ent",
+    "ion", "ou", "ism", "ate", "iti", "ous", "ive", "ize"
+], key=lambda suffix: -len(suffix))
+
+
+def _replace(word: str, rules: List[Tuple[str, str]], min_measure: int) -> str:
+    """Apply the longest matching rule if its stem is long enough"""
+    for suffix, replacement in rules:
+        if word.endswith(suffix):
+            stem = word[:-len(suffix)]
+            return stem + replacement if _measure(stem) > min_measure else word
+    return word
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """Reduce an English word to its stem, so inspections, inspecting and inspection match"""
+    if len(word) <= 2 or not word.isascii() or not word.isalpha():
+        return word
+
+    # Step 1a: plurals
+    if word.endswith("sses") or word.endswith("ies"):
+        word = word[:-2]
+    elif word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+
+    # Step 1b: -ed and -ing
+    if word.endswith("eed"):
+        if _measure(word[:-3]) > 0:
+            word = word[:-1]
+    else:
+        for suffix in ("ed", "ing"):
+            if word.endswith(suffix) and _has_vowel(word[:-len(suffix)]):
+                word = word[:-len(suffix)]
+                if word.endswith(("at", "bl", "iz")):
+                    word += "e"
+                elif _double_consonant(word) and word[-1] not in "lsz":
+                    word = word[:-1]
+                elif _measure(word) == 1 and _cvc(word):
+                    word += "e"
+                break
+
+    # Step 1c: terminal y
+    if word.endswith("y") and _has_vowel(word[:-1]):
+        word = word[:-1] + "i"
+
+    # Steps 2-3: derivational suffixes
+    word = _replace(word, STEP2_RULES, 0)
+    word = _replace(word, STEP3_RULES, 0)
+
+    # Step 4: remove suffixes from long stems
+    for suffix in STEP4_SUFFIXES:
+        if word.endswith(suffix):
+            base = word[:-len(suffix)]
+            if _measure(base) > 1 and (suffix != "ion" or base.endswith(("s", "t"))):
+                word = base
+            break
+
+    # Step 5: final e and double l
+    if word.endswith("e"):
+        measure = _measure(word[:-1])
+        if measure > 1 or (measure == 1 and not _cvc(word[:-1])):
+            word = word[:-1]
+    if word.endswith("ll") and _measure(word) > 1:
+        word = word[:-1]
+    return word
+
+
+def parse_query(query: str) -> List[Tuple[str, List[str]]]:
+    """
+    Split a search into clauses: ("phrase", words) for "quoted words", ("prefix", [word]) for word*,
+    ("term", [word]) otherwise. The last bare word also matches as a prefix, for search-as-you-type.
+    """
+    clauses = []
+    for match in QUERY_PATTERN.finditer(query):
+        phrase, word = match.groups()
+        if phrase is not None:
+            words = tokenize(phrase)
+            if len(words) > 1:
+                clauses.append(("phrase", words))
+            elif words:
+                clauses.append(("term", words))
+        elif word.endswith("*"):
+            clauses.extend(("prefix", [token]) for token in tokenize(word))
+        else:
+            clauses.extend(("term", [token]) for token in tokenize(word))
+    if clauses and clauses[-1][0] == "term" and not query.endswith((" ", '"')):
+        clauses[-1] = ("prefix", clauses[-1][1])
+    return clauses
+
+
+class DocumentIndex:
+    """
+    In-process inverted index over document fields, ranked with BM25.
+    Postings map each stem to the documents containing it, with a field-weighted term frequency
+    and token positions for phrase queries. A sorted vocabulary of unstemmed words serves prefix
+    queries. add() and remove() update the index incrementally.
+    """
+
+    def __init__(self, field_weights: Optional[Dict[str, float]] = None):
+        self.field_weights = field_weights or default_field_weights
+        self.lock = threading.RLock()
+        self.postings: Dict[str, Dict[str, Tuple[float, Tuple[int, ...]]]] = {}
+        self.lengths: Dict[str, float] = {}  # Field-weighted token count per document
+        self.total_length = 0.0
+        self.document_words: Dict[str, Set[str]] = {}  # Unstemmed words per document, for removal
+        self.words: List[str] = []  # Sorted vocabulary
+        self.word_counts: Dict[str, int] = {}  # Documents containing each word
+
+    def add(self, document_id: str, fields: Dict[str, Optional[str]]):
+        """Index a document's fields, replacing any earlier version of it"""
+        term_frequencies: Dict[str, float] = {}
+        positions: Dict[str, List[int]] = {}
+        words: Set[str] = set()
+        length = 0.0
+        offset = 0
+        for field, weight in self.field_weights.items():
+            tokens = tokenize(fields.get(field) or "")
+            for position, token in enumerate(tokens, offset):
+                term = stem(token)
+                term_frequencies[term] = term_frequencies.get(term, 0.0) + weight
+                positions.setdefault(term, []).append(position)
+                words.add(token)
+            length += weight * len(tokens)
+            offset += len(tokens) + FIELD_GAP
+
+        with self.lock:
+            self.remove(document_id)
+            for term, frequency in term_frequencies.items():
+                self.postings.setdefault(term, {})[document_id] = (frequency, tuple(positions[term]))
+            self.lengths[document_id] = length
+            self.total_length += length
+            self.document_words[document_id] = words
+            for word in words:
+                count = self.word_counts.get(word, 0)
+                if count == 0:
+                    bisect.insort(self.words, word)
+                self.word_counts[word] = count + 1
+
+    def remove(self, document_id: str) -> bool:
+        """Drop a document from the index; returns whether it was indexed"""
+        with self.lock:
+            words = self.document_words.pop(document_id, None)
+            if words is None:
+                return False
+            for term in {stem(word) for word in words}:
+                postings = self.postings[term]
+                del postings[document_id]
+                if not postings:
+                    del self.postings[term]
+            for word in words:
+                count = self.word_counts[word] - 1
+                if count == 0:
+                    del self.word_counts[word]
+                    del self.words[bisect.bisect_left(self.words, word)]
+                else:
+                    self.word_counts[word] = count
+            self.total_length -= self.lengths.pop(document_id)
+            return True
+
+    def expand_prefix(self, prefix: str) -> Set[str]:
+        """Stems of the vocabulary words starting with prefix, most common first up to the expansion limit"""
+        start = bisect.bisect_left(self.words, prefix)
+        end = bisect.bisect_left(self.words, prefix + "\uffff")
+        words = self.words[start:end]
+        if len(words) > MAX_PREFIX_EXPANSIONS:
+            words = sorted(words, key=lambda word: -self.word_counts[word])[:MAX_PREFIX_EXPANSIONS]
+        return {stem(word) for word in words}
+
+    def bm25(self, term: str, documents: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """BM25 scores of a term, for every document containing it or just the given ones"""
+        postings = self.postings.get(term)
+        if not postings:
+            return {}
+        count = len(self.lengths)
+        idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+        base = BM25_K1 * (1 - BM25_B)
+        per_length = BM25_K1 * BM25_B * count / self.total_length if self.total_length else 0.0
+        lengths = self.lengths
+        if documents is None:
+            entries = postings.items()
+        else:
+            entries = ((document_id, postings[document_id]) for document_id in documents if document_id in postings)
+        return {
+            document_id: idf * entry[0] * (BM25_K1 + 1) / (entry[0] + base + per_length * lengths[document_id])
+            for document_id, entry in entries
+        }
+
+    def phrase_matches(self, terms: List[str], documents: Optional[Iterable[str]] = None) -> Set[str]:
+        """Documents (optionally among the given ones) with the terms at consecutive positions"""
+        postings = [self.postings.get(term) for term in terms]
+        if not all(postings):
+            return set()
+        candidates = set(min(postings, key=len) if documents is None else documents)
+        candidates = candidates.intersection(*postings)
+        matches = set()
+        for document_id in candidates:
+            starts = set(postings[0][document_id][1])
+            for shift, term_postings in enumerate(postings[1:], 1):
+                starts &= {position - shift for position in term_postings[document_id][1]}
+                if not starts:
+                    break
+            if starts:
+                matches.add(document_id)
+        return matches
+
+    def clause_terms(self, kind: str, words: List[str]) -> List[str]:
+        """The stems a clause looks up: the word's, its prefix expansions, or the phrase's"""
+        if kind == "prefix":
+            return sorted(self.expand_prefix(words[0]) | {stem(words[0])})
+        return [stem(word) for word in words]
+
+    def clause_size(self, kind: str, terms: List[str]) -> int:
+        """Upper bound on the documents a clause matches"""
+        sizes = [len(self.postings.get(term, ())) for term in terms]
+        return sum(sizes) if kind == "prefix" else min(sizes)
+
+    def clause_scores(self, kind: str, terms: List[str], documents: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """Scores of the documents (optionally among the given ones) matching a clause"""
+        if kind == "prefix":
+            scores: Dict[str, float] = {}
+            for term in terms:
+                for document_id, score in self.bm25(term, documents).items():
+                    if score > scores.get(document_id, 0.0):
+                        scores[document_id] = score
+            return scores
+        if kind == "phrase":
+            documents = self.phrase_matches(terms, documents)
+        scores = {}
+        for term in set(terms):
+            for document_id, score in self.bm25(term, documents).items():
+                scores[document_id] = scores.get(document_id, 0.0) + score
+        return scores
+
+    def search(self, query: str) -> List[Tuple[str, float]]:
+        """
+        (document id, score) of the documents matching every clause of the query, best first;
+        nothing if the query has no searchable words. Clauses are evaluated smallest first, each
+        only over the documents still matching.
+        """
+        clauses = parse_query(query)
+        if not clauses:
+            return []
+        with self.lock:
+            resolved = [(kind, self.clause_terms(kind, words)) for kind, words in clauses]
+            resolved.sort(key=lambda clause: self.clause_size(*clause))
+            totals: Optional[Dict[str, float]] = None
+            for kind, terms in resolved:
+                scores = self.clause_scores(kind, terms, None if totals is None else list(totals))
+                if totals is None:
+                    totals = scores
+                else:
+                    totals = {document_id: total + scores[document_id] for document_id, total in totals.items() if document_id in scores}
+                if not totals:
+                    return []
+        return sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self.lengths),
+            "terms": len(self.postings),
+            "words": len(self.words),
+            "average_length": round(self.total_length / len(self.lengths), 3) if self.lengths else 0.0
+        }
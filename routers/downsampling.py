@@ -0,0 +1,98 @@
+from typing import Dict, List, Any
+import re
+import numpy as np
+from .sensor_store import SeriesView, READING_STATUSES, epoch_us_to_datetimes
+
+# Interval strings such as "30s", "5m", "1h" or "1d"
+INTERVAL_PATTERN = re.compile(r"^(\d+)\s*([smhd])$")
+INTERVAL_UNITS_US = {"s": 1_000_000, "m": 60_000_000, "h": 3_600_000_000, "d": 86_400_000_000}
+
+
+def parse_interval(interval: str) -> int:
+    """Parse an interval string into microseconds"""
+    match = INTERVAL_PATTERN.match(interval.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError("Interval must look like 30s, 5m, 1h or 1d")
+    return int(match.group(1)) * INTERVAL_UNITS_US[match.group(2)]
+
+
+def bucket_starts(timestamps: np.ndarray, interval_us: int) -> np.ndarray:
+    """Return the index where each time bucket begins; timestamps must be sorted"""
+    bucket_ids = timestamps // interval_us
+    return np.flatnonzero(np.concatenate(([True], bucket_ids[1:] != bucket_ids[:-1])))
+
+
+def aggregate_buckets(view: SeriesView, interval_us: int) -> Dict[str, np.ndarray]:
+    """Reduce a series view to min/max/mean/count/last per interval aligned to the epoch"""
+    if len(view) == 0:
+        empty = np.empty(0)
+        return {"timestamp": empty.astype(np.int64), "min": empty, "max": empty, "mean": empty,
+                "count": empty.astype(np.int64), "last": empty, "last_status": empty.astype(np.uint8)}
+
+    starts = bucket_starts(view.timestamps, interval_us)
+    ends = np.append(starts[1:], len(view))
+    counts = ends - starts
+    last = ends - 1
+
+    return {
+        "timestamp": (view.timestamps[starts] // interval_us) * interval_us,
+        "min": np.minimum.reduceat(view.values, starts),
+        "max": np.maximum.reduceat(view.values, starts),
+        "mean": np.add.reduceat(view.values, starts) / counts,
+        "count": counts,
+        "last": view.values[last],
+        "last_status": view.statuses[last]
+    }
+
+
+def serialize_buckets(buckets: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Materialise aggregated buckets as dicts, converting each column in bulk"""
+    columns = {name: column.tolist() for name, column in buckets.items() if name != "timestamp"}
+    columns["last_status"] = [READING_STATUSES[code] for code in columns["last_status"]]
+    timestamps = epoch_us_to_datetimes(buckets["timestamp"])
+    names = list(columns)
+    return [
+        dict(zip(["timestamp"] + names, row))
+        for row in zip(timestamps, *(columns[name] for name in names))
+    ]
+
+
+def lttb_indices(timestamps: np.ndarray, values: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    Returns the indices of the points to keep; first and last points are always kept.
+    """
+    count = len(values)
+    if threshold >= count:
+        return np.arange(count)
+    if threshold < 3:
+        raise ValueError("LTTB needs a threshold of at least 3 points")
+
+    x = (timestamps - timestamps[0]).astype(np.float64)
+    y = values
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = count - 1
+
+    # Bucket edges for the points between the first and the last
+    edges = np.floor(np.linspace(1, count - 1, threshold - 1)).astype(np.int64)
+    previous = 0
+
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+
+        # Average of the next bucket (or the last point for the final bucket)
+        next_start = end
+        next_end = edges[i + 2] if i + 2 < len(edges) else count
+        if next_end <= next_start:
+            next_end = next_start + 1
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Pick the point forming the largest triangle with the previous pick and the next average
+        px, py = x[previous], y[previous]
+        areas = np.abs((px - avg_x) * (y[start:end] - py) - (px - x[start:end]) * (avg_y - py))
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+
+    return selected
@@ -0,0 +1,546 @@
+from typing import AsyncIterator, Callable, ContextManager, Deque, Dict, List, Optional, Any, Tuple
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime
+import asyncio
+import csv
+import json
+import math
+import time
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from .sensor_store import SensorStore, STATUS_CODES, to_epoch_us
+
+# Content types accepted by the ingestion endpoint
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/json"}
+CSV_CONTENT_TYPES = {"text/csv", "application/csv"}
+
+# Status code used while a row is waiting to be classified
+UNCLASSIFIED = -1
+
+# Timestamps the store can hold and convert back to datetimes (years 1-9999)
+MIN_TIMESTAMP_US = to_epoch_us(datetime.min)
+MAX_TIMESTAMP_US = to_epoch_us(datetime.max)
+
+
+def parse_timestamp(raw: Any) -> int:
+    """Parse an ISO 8601 string or epoch seconds into epoch microseconds, rejecting out-of-range times"""
+    if isinstance(raw, (int, float)) and not isinstance(raw, bool):
+        if not math.isfinite(raw):
+            raise ValueError("timestamp is not finite")
+        if not MIN_TIMESTAMP_US <= raw * 1_000_000 <= MAX_TIMESTAMP_US:
+            raise ValueError(f"timestamp {raw!r} is out of range")
+        return int(round(raw * 1_000_000))
+    if isinstance(raw, str) and raw:
+        text = raw.strip()
+        if text.endswith("Z"):
+            text = text[:-1] + "+00:00"
+        try:
+            parsed = datetime.fromisoformat(text)
+        except ValueError:
+            pass
+        else:
+            try:
+                return to_epoch_us(parsed)
+            except OverflowError:
+                raise ValueError(f"timestamp {raw!r} is out of range")
+        try:
+            seconds = float(text)
+        except ValueError:
+            raise ValueError(f"Invalid timestamp {raw!r}")
+        return parse_timestamp(seconds)
+    raise ValueError("timestamp is missing")
+
+
+def parse_value(raw: Any) -> float:
+    """Parse a reading value, rejecting non-numeric and non-finite input"""
+    if isinstance(raw, bool) or raw is None or raw == "":
+        raise ValueError("value is missing")
+    try:
+        value = float(raw)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid value {raw!r}")
+    if not math.isfinite(value):
+        raise ValueError("value is not finite")
+    return value
+
+
+class LineTooLong(Exception):
+    """A streamed line grew past the maximum line length"""
+
+    def __init__(self, line_number: int, limit: int):
+        super().__init__(f"Line {line_number} is longer than {limit} bytes")
+        self.line_number = line_number
+        self.limit = limit
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = 65_536) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Split a streamed body into numbered, non-empty text lines without buffering it whole.
+    Only each new chunk is split; a partial line is carried over in pieces and joined once
+    complete. Raises LineTooLong as soon as a line passes max_line_bytes.
+    """
+    pending: List[bytes] = []
+    pending_bytes = 0
+    line_number = 0
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        lines = chunk.split(b"\n")
+        tail = lines.pop()
+        if lines and pending:
+            lines[0] = b"".join(pending) + lines[0]
+            pending, pending_bytes = [], 0
+        for line in lines:
+            line_number += 1
+            if len(line) > max_line_bytes:
+                raise LineTooLong(line_number, max_line_bytes)
+            text = line.decode("utf-8", errors="replace").strip()
+            if text:
+                yield line_number, text
+        if tail:
+            pending.append(tail)
+            pending_bytes += len(tail)
+            if pending_bytes > max_line_bytes:
+                raise LineTooLong(line_number + 1, max_line_bytes)
+    text = b"".join(pending).decode("utf-8", errors="replace").strip()
+    if text:
+        yield line_number + 1, text
+
+
+# Ingestion queue settings; each worker owns a shard of the sensors so a sensor's batches are written in order
+default_ingestion_config = {
+    "workers": 2,
+    "queue_rows": 200_000,  # Rows queued across all shards before requests are turned away
+    "batch_rows": 10_000,  # A worker writes as soon as this many rows are queued...
+    "batch_wait_ms": 10.0,  # ...or once the first queued batch has waited this long
+    "put_timeout_seconds": 5.0,  # How long a streaming request waits for queue space before giving up
+    "max_line_bytes": 65_536  # Longest row a request may send
+}
+
+# New requests are refused (429) once the queue is this full; requests already streaming may fill the rest
+ADMISSION_FILL = 0.8
+
+# Rows per sensor: sensor_id -> (timestamps, values, status codes)
+PendingRows = Dict[str, Tuple[List[int], List[float], List[int]]]
+
+
+def ingestion_config_from_env(environ: Dict[str, str]) -> Dict[str, float]:
+    """Queue settings from TAILINGSIQ_INGEST_* variables"""
+    config = dict(default_ingestion_config)
+    for key, variable, parse in (
+        ("workers", "TAILINGSIQ_INGEST_WORKERS", int),
+        ("queue_rows", "TAILINGSIQ_INGEST_QUEUE_ROWS", int),
+        ("batch_rows", "TAILINGSIQ_INGEST_BATCH_ROWS", int),
+        ("batch_wait_ms", "TAILINGSIQ_INGEST_BATCH_WAIT_MS", float),
+        ("put_timeout_seconds", "TAILINGSIQ_INGEST_PUT_TIMEOUT_SECONDS", float),
+        ("max_line_bytes", "TAILINGSIQ_INGEST_MAX_LINE_BYTES", int)
+    ):
+        if environ.get(variable):
+            config[key] = parse(environ[variable])
+    return config
+
+
+class QueueFull(Exception):
+    """The ingestion queue has no room; retry_after is a drain-time estimate in seconds"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Ingestion queue is full")
+        self.retry_after = retry_after
+
+
+class QueuedBatch:
+    def __init__(self, rows: PendingRows, count: int, future: asyncio.Future):
+        self.rows = rows
+        self.count = count
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+class QueueShard:
+    def __init__(self):
+        self.batches: Deque[QueuedBatch] = deque()
+        self.rows = 0
+        self.has_batches = asyncio.Event()
+        self.batch_ready = asyncio.Event()
+        self.has_space = asyncio.Event()
+        self.has_space.set()
+
+
+class IngestionQueue:
+    """
+    Bounded queue between ingestion requests and the store.
+    Requests enqueue validated rows; worker tasks drain them in micro-batches, classify them
+    and write them in the threadpool, so listeners (rules, alerting, logging) run off the event loop.
+    """
+
+    def __init__(
+        self,
+        store: SensorStore,
+        classify: Callable[[Dict[str, Any], np.ndarray], np.ndarray],
+        config: Optional[Dict[str, float]] = None,
+        flush_context: Callable[[], ContextManager] = nullcontext
+    ):
+        self.store = store
+        self.classify = classify
+        self.config = dict(default_ingestion_config, **(config or {}))
+        self.flush_context = flush_context  # Wraps each write, e.g. to group-commit its log records
+        self.workers = max(1, int(self.config["workers"]))
+        self.shard_rows = max(1, int(self.config["queue_rows"]) // self.workers)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.shards: List[QueueShard] = []
+        self.tasks: List[asyncio.Task] = []
+        self.batches_written = 0
+        self.rows_written = 0
+        self.last_batch_rows = 0
+        self.max_batch_rows = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self.last_write_seconds = 0.0
+        self.rows_per_second = 0.0  # Moving average of write throughput, for Retry-After
+        self.refused = 0
+        self.timed_out = 0
+
+    def start(self):
+        """Start the workers on the running loop (again, if they belong to a loop that has gone)"""
+        loop = asyncio.get_running_loop()
+        if self.loop is loop:
+            return
+        self.loop = loop
+        self.shards = [QueueShard() for _ in range(self.workers)]
+        self.tasks = [loop.create_task(self._work(shard)) for shard in self.shards]
+
+    async def stop(self):
+        """Let the workers finish what is queued, then stop them"""
+        if self.loop is not asyncio.get_running_loop():
+            return
+        for shard in self.shards:
+            while shard.batches:
+                await asyncio.sleep(self.config["batch_wait_ms"] / 1000)
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.loop = None
+        self.tasks = []
+
+    def depth(self) -> int:
+        return sum(shard.rows for shard in self.shards)
+
+    def retry_after(self) -> int:
+        """Seconds until the queued rows should have drained, between 1 and 60"""
+        if self.rows_per_second <= 0:
+            return 1
+        return int(min(60, max(1, math.ceil(self.depth() / self.rows_per_second))))
+
+    def admit(self):
+        """Refuse a new request while the queue is nearly full"""
+        self.start()
+        if self.depth() >= ADMISSION_FILL * self.shard_rows * self.workers:
+            self.refused += 1
+            raise QueueFull(self.retry_after())
+
+    async def submit(self, rows: PendingRows) -> List[asyncio.Future]:
+        """
+        Queue rows for writing, split by shard; returns futures resolving to rows written.
+        Waits for space up to put_timeout_seconds, then raises QueueFull.
+        """
+        self.start()
+        by_shard: Dict[int, PendingRows] = {}
+        for sensor_id, columns in rows.items():
+            by_shard.setdefault(hash(sensor_id) % self.workers, {})[sensor_id] = columns
+
+        deadline = time.monotonic() + self.config["put_timeout_seconds"]
+        futures = []
+        for index, shard_rows in by_shard.items():
+            shard = self.shards[index]
+            count = sum(len(columns[0]) for columns in shard_rows.values())
+
+            # An oversized batch still goes into an empty shard rather than waiting forever
+            while shard.rows and shard.rows + count > self.shard_rows:
+                shard.has_space.clear()
+                try:
+                    await asyncio.wait_for(shard.has_space.wait(), max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    self.timed_out += 1
+                    raise QueueFull(self.retry_after())
+
+            batch = QueuedBatch(shard_rows, count, self.loop.create_future())
+            shard.batches.append(batch)
+            shard.rows += count
+            shard.has_batches.set()
+            if shard.rows >= self.config["batch_rows"]:
+                shard.batch_ready.set()
+            futures.append(batch.future)
+        return futures
+
+    async def _take(self, shard: QueueShard) -> List[QueuedBatch]:
+        """Wait for queued rows, then for a full micro-batch or the batch wait, whichever comes first"""
+        while not shard.batches:
+            shard.has_batches.clear()
+            await shard.has_batches.wait()
+        if shard.rows < self.config["batch_rows"]:
+            try:
+                await asyncio.wait_for(shard.batch_ready.wait(), self.config["batch_wait_ms"] / 1000)
+            except asyncio.TimeoutError:
+                pass
+
+        taken = [shard.batches.popleft()]
+        count = taken[0].count
+        while shard.batches and count + shard.batches[0].count <= self.config["batch_rows"]:
+            taken.append(shard.batches.popleft())
+            count += taken[-1].count
+        shard.rows -= count
+        if shard.rows < self.config["batch_rows"]:
+            shard.batch_ready.clear()
+        shard.has_space.set()
+        return taken
+
+    async def _work(self, shard: QueueShard):
+        while True:
+            taken = await self._take(shard)
+            merged: PendingRows = {}
+            for batch in taken:
+                for sensor_id, (timestamps, values, statuses) in batch.rows.items():
+                    target = merged.setdefault(sensor_id, ([], [], []))
+                    target[0].extend(timestamps)
+                    target[1].extend(values)
+                    target[2].extend(statuses)
+
+            count = sum(batch.count for batch in taken)
+            started = time.monotonic()
+            errors = await self._write_batches(taken, merged)
+
+            finished = time.monotonic()
+            for position, batch in enumerate(taken):
+                if batch.future.done():
+                    continue
+                if position in errors:
+                    batch.future.set_exception(errors[position])
+                else:
+                    batch.future.set_result(batch.count)
+            lag = finished - taken[0].enqueued
+            elapsed = max(finished - started, 1e-6)
+            self.batches_written += 1
+            self.rows_written += count
+            self.last_batch_rows = count
+            self.max_batch_rows = max(self.max_batch_rows, count)
+            self.last_lag_seconds = lag
+            self.max_lag_seconds = max(self.max_lag_seconds, lag)
+            self.last_write_seconds = elapsed
+            rate = count / elapsed
+            self.rows_per_second = rate if not self.rows_per_second else 0.8 * self.rows_per_second + 0.2 * rate
+
+    async def _write_batches(self, taken: List[QueuedBatch], merged: PendingRows) -> Dict[int, Exception]:
+        """
+        Write a micro-batch; returns the error for each queued batch (by position) that failed.
+        Only the requests with rows for a failing sensor fail. If the sensor failed before anything
+        was stored, each request's rows for it are retried alone, so one request's bad rows do not
+        fail the others.
+        """
+        errors: Dict[int, Exception] = {}
+        try:
+            unstored, stored = await run_in_threadpool(self.write, merged)
+        except Exception as e:
+            return {position: e for position in range(len(taken))}
+
+        for sensor_id, error in stored.items():
+            for position, batch in enumerate(taken):
+                if sensor_id in batch.rows:
+                    errors.setdefault(position, error)
+
+        for sensor_id, error in unstored.items():
+            contributors = [position for position, batch in enumerate(taken) if sensor_id in batch.rows]
+            if len(contributors) == 1:
+                errors.setdefault(contributors[0], error)
+                continue
+            for position in contributors:
+                try:
+                    retry_unstored, retry_stored = await run_in_threadpool(self.write, {sensor_id: taken[position].rows[sensor_id]})
+                except Exception as e:
+                    retry_unstored, retry_stored = {sensor_id: e}, {}
+                for retry_error in list(retry_unstored.values()) + list(retry_stored.values()):
+                    errors.setdefault(position, retry_error)
+        return errors
+
+    def write(self, rows: PendingRows) -> Tuple[Dict[str, Exception], Dict[str, Exception]]:
+        """
+        Classify and write a micro-batch to the store (runs in the threadpool), one sensor at a time.
+        Returns the sensors that failed before their rows were stored, and those that failed after
+        (in a listener such as the log), each with its error.
+        """
+        unstored: Dict[str, Exception] = {}
+        stored: Dict[str, Exception] = {}
+        with self.flush_context():
+            for sensor_id, (timestamps, values, statuses) in rows.items():
+                try:
+                    timestamp_array = np.asarray(timestamps, dtype=np.int64)
+                    value_array = np.asarray(values, dtype=np.float64)
+                    status_array = np.asarray(statuses, dtype=np.int16)
+
+                    # Rows without a logger-supplied status are classified here
+                    missing = status_array == UNCLASSIFIED
+                    if missing.any():
+                        classified = self.classify(self.store.get_sensor(sensor_id), value_array)
+                        status_array = np.where(missing, classified, status_array)
+                except Exception as e:
+                    unstored[sensor_id] = e
+                    continue
+
+                try:
+                    self.store.extend(sensor_id, timestamp_array, value_array, status_array)
+                except Exception as e:
+                    stored[sensor_id] = e
+        return unstored, stored
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.config,
+            "queued_rows": self.depth(),
+            "queued_batches": sum(len(shard.batches) for shard in self.shards),
+            "shard_rows": [shard.rows for shard in self.shards],
+            "batches_written": self.batches_written,
+            "rows_written": self.rows_written,
+            "mean_batch_rows": round(self.rows_written / self.batches_written, 1) if self.batches_written else 0.0,
+            "last_batch_rows": self.last_batch_rows,
+            "max_batch_rows": self.max_batch_rows,
+            "last_lag_seconds": round(self.last_lag_seconds, 6),
+            "max_lag_seconds": round(self.max_lag_seconds, 6),
+            "last_write_seconds": round(self.last_write_seconds, 6),
+            "rows_per_second": round(self.rows_per_second, 1),
+            "refused": self.refused,
+            "timed_out": self.timed_out
+        }
+
+
+class IngestionBatcher:
+    """Collects one request's parsed rows per sensor and hands them to the ingestion queue in batches"""
+
+    def __init__(
+        self,
+        store: SensorStore,
+        queue: IngestionQueue,
+        batch_size: int = 5000,
+        max_errors: int = 100
+    ):
+        self.store = store
+        self.queue = queue
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.pending: PendingRows = {}
+        self.pending_count = 0
+        self.submitted: List[asyncio.Future] = []
+        self.accepted = 0
+        self.rejected = 0
+        self.batches = 0
+        self.sensor_ids = set()
+        self.errors: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+
+    def reject(self, line: int, reason: str):
+        """Record a rejected row"""
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "reason": reason})
+
+    async def add(self, line: int, sensor_id: Any, timestamp: Any, value: Any, status: Optional[str] = None):
+        """Validate a row and queue it for the next batch"""
+        if not sensor_id or not isinstance(sensor_id, str):
+            self.reject(line, "sensor_id is missing")
+            return
+        if self.store.get_sensor(sensor_id) is None:
+            self.reject(line, f"Unknown sensor {sensor_id}")
+            return
+        try:
+            timestamp_us = parse_timestamp(timestamp)
+            reading_value = parse_value(value)
+        except (TypeError, ValueError) as e:
+            self.reject(line, str(e))
+            return
+        if status:
+            if not isinstance(status, str) or status not in STATUS_CODES:
+                self.reject(line, f"Invalid status {status}")
+                return
+            status_code = STATUS_CODES[status]
+        else:
+            status_code = UNCLASSIFIED
+
+        timestamps, values, statuses = self.pending.setdefault(sensor_id, ([], [], []))
+        timestamps.append(timestamp_us)
+        values.append(reading_value)
+        statuses.append(status_code)
+        self.pending_count += 1
+
+        if self.pending_count >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        """Hand all pending rows to the ingestion queue, waiting for space if it is full"""
+        if not self.pending_count:
+            return
+        pending = self.pending
+        self.pending = {}
+        self.pending_count = 0
+        self.sensor_ids.update(pending)
+        self.submitted.extend(await self.queue.submit(pending))
+        self.batches += 1
+
+    async def wait(self) -> int:
+        """Wait until every submitted row is written; returns the number accepted"""
+        for count in await asyncio.gather(*self.submitted):
+            self.accepted += count
+        self.submitted = []
+        return self.accepted
+
+    def report(self) -> Dict[str, Any]:
+        """Summarise the ingestion run"""
+        elapsed = time.perf_counter() - self.started
+        return {
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "sensors": len(self.sensor_ids),
+            "batches": self.batches,
+            "elapsed_seconds": round(elapsed, 6),
+            "rows_per_second": round(self.accepted / elapsed, 1) if elapsed > 0 else 0.0,
+            "errors": self.errors
+        }
+
+
+async def ingest_ndjson(lines: AsyncIterator[Tuple[int, str]], batcher: IngestionBatcher):
+    """Feed NDJSON rows ({"sensor_id", "timestamp", "value", "status"?}) into a batcher"""
+    async for line, text in lines:
+        try:
+            row = json.loads(text)
+        except ValueError:
+            batcher.reject(line, "Malformed JSON")
+            continue
+        if not isinstance(row, dict):
+            batcher.reject(line, "Row must be a JSON object")
+            continue
+        await batcher.add(line, row.get("sensor_id"), row.get("timestamp"), row.get("value"), row.get("status"))
+    await batcher.flush()
+
+
+async def ingest_csv(lines: AsyncIterator[Tuple[int, str]], batcher: IngestionBatcher):
+    """Feed CSV rows with a sensor_id,timestamp,value[,status] header into a batcher"""
+    columns = None
+    async for line, text in lines:
+        fields = next(csv.reader([text]))
+        if columns is None:
+            columns = {name.strip(): index for index, name in enumerate(fields)}
+            missing = [name for name in ("sensor_id", "timestamp", "value") if name not in columns]
+            if missing:
+                batcher.reject(line, f"CSV header is missing columns: {', '.join(missing)}")
+                return
+            continue
+        if len(fields) < len(columns):
+            batcher.reject(line, "Row has too few columns")
+            continue
+        status_index = columns.get("status")
+        await batcher.add(
+            line,
+            fields[columns["sensor_id"]].strip(),
+            fields[columns["timestamp"]],
+            fields[columns["value"]],
+            fields[status_index].strip() if status_index is not None else None
+        )
+    await batcher.flush()
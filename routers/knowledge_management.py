@@ -7,6 +7,7 @@ import os
 import random
 import uuid
 from .auth import get_current_user
+from .document_index import DocumentIndex
 
 # Create router for Knowledge Management
 router = APIRouter(prefix="/api/documents", tags=["documents"])
@@ -309,6 +310,37 @@ def generate_more_documents(count: int = 20):
     
     return documents
 
+# Documents by ID, alongside the sample_documents list
+documents_by_id = {doc["id"]: doc for doc in sample_documents}
+
+# Text extracted from uploaded files, by document ID; only plain-text formats are extracted
+TEXT_FILE_TYPES = {"TXT", "CSV", "MD", "JSON", "XML"}
+MAX_CONTENT_BYTES = 5_000_000
+document_content: Dict[str, str] = {}
+
+# Extract searchable text from an uploaded file, if it is a plain-text format
+def extract_content(file_ext: str, file_content: bytes) -> Optional[str]:
+    if file_ext not in TEXT_FILE_TYPES:
+        return None
+    return file_content[:MAX_CONTENT_BYTES].decode("utf-8", errors="ignore")
+
+# Full-text search index over document metadata and extracted content
+document_index = DocumentIndex()
+
+# (Re)index a document after it is added or changed
+def index_document(doc: Dict[str, Any]):
+    document_index.add(doc["id"], {
+        "title": doc["title"],
+        "tags": " ".join(doc["tags"]),
+        "category": doc["category"],
+        "facility_name": doc["facility_name"],
+        "description": doc["description"],
+        "content": document_content.get(doc["id"])
+    })
+
+for doc in sample_documents:
+    index_document(doc)
+
 # API Endpoints
 
 @router.get("/categories", response_model=List[str])
@@ -328,18 +360,24 @@ async def list_documents(
     category: Optional[str] = Query(None),
     facility_id: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
-    sort_by: str = Query("upload_date"),
+    sort_by: Optional[str] = Query(None),  # relevance (default when searching), upload_date, title, category or file_size
     sort_order: str = Query("desc"),
     current_user: dict = Depends(get_current_user)
 ):
     """
-    List documents with pagination, filtering, and sorting
+    List documents with pagination, filtering, and sorting.
+    search is a full-text query over title, tags, description and content: every word must match
+    (stemmed), "quoted words" match as a phrase and word* as a prefix, as does the last word typed.
     """
     # Get all documents (in a real implementation, this would query a database)
     all_documents = sample_documents
     
-    # Apply filters
+    # Apply filters; a search narrows to the matching documents, best match first
     filtered_docs = all_documents
+    hits = document_index.search(search) if search else None
+    
+    if hits is not None:
+        filtered_docs = [documents_by_id[document_id] for document_id, _ in hits]
     
     if category:
         filtered_docs = [doc for doc in filtered_docs if doc["category"] == category]
@@ -347,17 +385,12 @@ async def list_documents(
     if facility_id:
         filtered_docs = [doc for doc in filtered_docs if doc["facility_id"] == facility_id]
     
-    if search:
-        search_lower = search.lower()
-        filtered_docs = [
-            doc for doc in filtered_docs 
-            if search_lower in doc["title"].lower() 
-            or (doc["description"] and search_lower in doc["description"].lower())
-            or any(search_lower in tag.lower() for tag in doc["tags"])
-        ]
-    
     # Sort documents
-    if sort_by == "title":
+    sort_by = sort_by or ("relevance" if hits is not None else "upload_date")
+    if sort_by == "relevance":
+        if hits is not None and sort_order == "asc":
+            filtered_docs.reverse()
+    elif sort_by == "title":
         filtered_docs.sort(key=lambda x: x["title"], reverse=(sort_order == "desc"))
     elif sort_by == "category":
         filtered_docs.sort(key=lambda x: x["category"], reverse=(sort_order == "desc"))
@@ -460,6 +493,11 @@ async def upload_document(
     
     # In a real implementation, save to database
     sample_documents.append(new_doc)
+    documents_by_id[doc_id] = new_doc
+    content = extract_content(file_ext, file_content)
+    if content is not None:
+        document_content[doc_id] = content
+    index_document(new_doc)
     
     return DocumentMetadata(**new_doc)
 
@@ -509,6 +547,7 @@ async def update_document(
             
             # In a real implementation, update in database
             sample_documents[i] = doc
+            index_document(doc)
             
             return DocumentMetadata(**doc)
     
@@ -525,8 +564,11 @@ async def delete_document(
         if doc["id"] == document_id:
             # In a real implementation, delete file from storage
             
-            # Remove from list
+            # Remove from list and search index
             sample_documents.pop(i)
+            documents_by_id.pop(document_id, None)
+            document_content.pop(document_id, None)
+            document_index.remove(document_id)
             return
     
     raise HTTPException(status_code=404, detail="Document not found")
@@ -569,7 +611,7 @@ async def upload_new_version(
                 file_ext = "BIN"  # Default for files without extension
             
             # In a real implementation, save the file to storage
-            file_path = f"/storage/documents/{doc_id}.{file_ext.lower()}"
+            file_path = f"/storage/documents/{document_id}.{file_ext.lower()}"
             
             # Update document metadata
             doc["last_modified"] = datetime.now()
@@ -585,6 +627,12 @@ async def upload_new_version(
             
             # In a real implementation, update in database
             sample_documents[i] = doc
+            content = extract_content(file_ext, file_content)
+            if content is not None:
+                document_content[document_id] = content
+            else:
+                document_content.pop(document_id, None)
+            index_document(doc)
             
             return DocumentMetadata(**doc)
     
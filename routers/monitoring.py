@@ -1,9 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, Body, Query
+from fastapi import APIRouter, Depends, HTTPException, Body, Header, Query, Request, WebSocket
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional, Union
 from datetime import datetime, timedelta
+from contextlib import nullcontext
+import asyncio
+import heapq
+import logging
+import os
 import random
+import numpy as np
 from .auth import get_current_user
+from .sensor_store import SensorStore, SeriesView, READING_STATUSES, to_epoch_us, epoch_us_to_datetimes, serialize_readings
+from .broadcast import BroadcastHub
+from .alert_store import AlertStore, alert_id_for
+from .anomaly_detection import AnomalyDetector
+from .dashboard_counters import DashboardCounters, ALERT_SEVERITIES, build_facility_counters, compare_counters
+from .downsampling import parse_interval, serialize_buckets, lttb_indices
+from .threshold_rules import ThresholdRuleSet, default_threshold_rules, reclassify_history
+from .binary_export import (
+    ARROW_STREAM_MEDIA_TYPE, PACKED_MEDIA_TYPE, arrow_available, negotiate_export_format, iter_arrow, iter_packed
+)
+from .pagination import encode_cursor, decode_cursor
+from .projection import SENSOR_SHAPES, parse_fields, project, serialize_columns, json_response
+from .response_cache import TTLCache
+from .monitoring_log import LogWriter, MonitoringLog, RecoveredState
+from .rollups import RollupStore
+from .alert_coalescing import AlertCoalescer, coalescing_config_from_env
+from .telemetry_simulator import TelemetrySimulator, default_simulation_config, simulation_config_from_env, fill_store
+from .ingestion import IngestionBatcher, IngestionQueue, QueueFull, ingestion_config_from_env, NDJSON_CONTENT_TYPES, CSV_CONTENT_TYPES, LineTooLong, iter_lines, ingest_ndjson, ingest_csv
 
 # Create router for Monitoring
 router = APIRouter(prefix="/api/monitoring", tags=["monitoring"])
@@ -21,9 +47,63 @@ class SensorData(BaseModel):
     sensor_type: str
     location: str
     readings: List[SensorReading]
-    last_reading: SensorReading
+    last_reading: Optional[SensorReading] = None
     status: str  # Online, Offline, Maintenance
 
+class SensorSummary(BaseModel):
+    sensor_id: str
+    sensor_name: str
+    sensor_type: str
+    location: str
+    last_reading: Optional[SensorReading] = None
+    status: str  # Online, Offline, Maintenance
+
+class ReadingColumns(BaseModel):
+    timestamps: List[datetime]
+    values: List[float]
+    statuses: List[str]  # Normal, Warning, Alert
+
+class LatestReading(BaseModel):
+    timestamp: datetime
+    value: float
+    status: str  # Normal, Warning, Alert
+
+class SensorColumnarData(BaseModel):
+    sensor_id: str
+    sensor_name: str
+    sensor_type: str
+    location: str
+    unit: str  # Shared by every reading
+    readings: ReadingColumns
+    last_reading: Optional[LatestReading] = None
+    status: str  # Online, Offline, Maintenance
+
+# Model describing each sensor response shape, also used to validate fields= projections
+sensor_shape_models = {"full": SensorData, "summary": SensorSummary, "columnar": SensorColumnarData}
+
+class AggregateBucket(BaseModel):
+    timestamp: datetime  # Start of the interval
+    min: float
+    max: float
+    mean: float
+    count: int
+    last: float
+    last_status: str  # Normal, Warning, Alert
+
+class SensorAggregateResponse(BaseModel):
+    sensor_id: str
+    unit: str
+    interval_seconds: float
+    raw_count: int
+    tier: str  # Rollup tier the buckets were built from, or raw
+    buckets: List[AggregateBucket]
+
+class SensorDownsampleResponse(BaseModel):
+    sensor_id: str
+    unit: str
+    raw_count: int
+    readings: Union[List[SensorReading], ReadingColumns]  # Columns when shape=columnar
+
 class MonitoringAlert(BaseModel):
     alert_id: str
     facility_id: str
@@ -36,6 +116,9 @@ class MonitoringAlert(BaseModel):
     acknowledged_by: Optional[str] = None
     resolved_by: Optional[str] = None
     resolution_notes: Optional[str] = None
+    occurrence_count: int = 1  # Repeats coalesced into this alert, including the first
+    first_seen: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
 
 class MonitoringDashboardResponse(BaseModel):
     facility_id: str
@@ -43,9 +126,80 @@ class MonitoringDashboardResponse(BaseModel):
     overall_status: str  # Normal, Warning, Alert
     sensors_count: Dict[str, int]  # Count by status
     alerts_count: Dict[str, int]  # Count by severity
+    alerts_by_status: Dict[str, int]  # Count by alert status
     recent_alerts: List[MonitoringAlert]
     last_updated: datetime
 
+class FleetFacilitySummary(BaseModel):
+    facility_id: str
+    facility_name: str
+    overall_status: str  # Normal, Warning, Alert
+    sensors_count: Dict[str, int]  # Count by status
+    alerts_count: Dict[str, int]  # Count by severity
+    active_alerts: int
+
+class FleetDashboardResponse(BaseModel):
+    facilities_count: int
+    status_counts: Dict[str, int]  # Facilities by overall status
+    sensors_count: Dict[str, int]  # Fleet-wide count by sensor status
+    alerts_count: Dict[str, int]  # Fleet-wide count by severity
+    facilities: List[FleetFacilitySummary]
+    top_alerts: List[MonitoringAlert]  # Most severe active alerts, newest first within a severity
+    generated_at: datetime
+    cached: bool
+
+class DashboardConsistencyResponse(BaseModel):
+    facility_id: str
+    consistent: bool
+    mismatches: Dict[str, Dict[str, Any]]  # Counter -> incremental vs rebuilt value
+    repaired: bool
+    counters: Dict[str, Any]  # Counters rebuilt from scratch
+
+class IngestionError(BaseModel):
+    line: int
+    reason: str
+
+class IngestionResponse(BaseModel):
+    accepted: int
+    rejected: int
+    sensors: int
+    batches: int
+    elapsed_seconds: float
+    rows_per_second: float
+    errors: List[IngestionError]  # First rejected rows with reasons
+
+class ThresholdRule(BaseModel):
+    sensor_type: str
+    facility_id: Optional[str] = None  # Applies to one facility's sensors of this type
+    sensor_id: Optional[str] = None  # Applies to a single sensor
+    warning_low: Optional[float] = None
+    warning_high: Optional[float] = None
+    alert_low: Optional[float] = None
+    alert_high: Optional[float] = None
+
+class ReclassifyResponse(BaseModel):
+    sensors: int
+    readings: int
+    changed: int
+
+class RetentionPolicy(BaseModel):
+    # How long to keep each tier, as an interval string such as 7d; null keeps it forever
+    raw: Optional[str] = None
+    minute: Optional[str] = None
+    hour: Optional[str] = None
+    day: Optional[str] = None
+
+class RetentionPolicies(BaseModel):
+    default: RetentionPolicy
+    sensor_types: Dict[str, RetentionPolicy] = {}  # Unset tiers fall back to the default
+
+class CompactionResponse(BaseModel):
+    sensors: int
+    rolled_up: int  # Raw readings added to the rollup tiers
+    dropped_raw: int
+    dropped_buckets: int
+    elapsed_seconds: float
+
 # Sample sensor types and their units
 sensor_types = {
     "piezometer": "kPa",
@@ -62,123 +216,176 @@ sensor_types = {
 
 # Sample facilities
 sample_facilities = {
-    "FAC001": {"name": "North Basin Facility", "status": "Normal"},
-    "FAC002": {"name": "South Basin Facility", "status": "Warning"},
-    "FAC003": {"name": "East Basin Facility", "status": "Normal"},
-    "FAC004": {"name": "West Basin Facility", "status": "Alert"}
+    "FAC001": {"name": "North Basin Facility"},
+    "FAC002": {"name": "South Basin Facility"},
+    "FAC003": {"name": "East Basin Facility"},
+    "FAC004": {"name": "West Basin Facility"}
 }
 
-# Generate sample sensor data
-def generate_sample_sensors(facility_id: str, count: int = 10):
+# Name of the user making a request
+def current_username(current_user: dict) -> str:
+    return current_user.get("username") or current_user.get("user", "unknown")
+
+# Threshold rules used to classify readings; replaced wholesale via the thresholds API
+threshold_rules = ThresholdRuleSet(default_threshold_rules)
+
+# Classify a batch of readings for one sensor into status codes
+def classify_readings(sensor: Dict[str, Any], values: np.ndarray) -> np.ndarray:
+    return threshold_rules.classify(sensor, values)
+
+# Time-series store holding sensor metadata and readings
+sensor_store = SensorStore()
+
+# Generate sample sensor data and load it into the sensor store
+def generate_sample_sensors(facility_id: str, count: int = 10, rng: Optional[random.Random] = None):
+    rng = rng or random
     sensors = []
     locations = ["Dam Crest", "Upstream Slope", "Downstream Slope", "Foundation", "Spillway", "Decant Pond"]
     statuses = ["Online", "Online", "Online", "Online", "Maintenance", "Offline"]
     
     for i in range(count):
-        sensor_type = random.choice(list(sensor_types.keys()))
+        sensor_type = rng.choice(list(sensor_types.keys()))
         unit = sensor_types[sensor_type]
-        status = random.choice(statuses)
+        status = rng.choice(statuses)
         
         # Generate readings for the past 24 hours
         now = datetime.now()
-        readings = []
+        timestamps = []
+        values = []
         
         for hour in range(24, 0, -1):
             timestamp = now - timedelta(hours=hour)
             
             # Base value depends on sensor type
             if sensor_type == "piezometer":
-                base_value = random.uniform(50, 150)
+                base_value = rng.uniform(50, 150)
             elif sensor_type == "inclinometer":
-                base_value = random.uniform(0, 5)
+                base_value = rng.uniform(0, 5)
             elif sensor_type == "water_level":
-                base_value = random.uniform(10, 20)
+                base_value = rng.uniform(10, 20)
             elif sensor_type == "flow_rate":
-                base_value = random.uniform(5, 15)
+                base_value = rng.uniform(5, 15)
             elif sensor_type == "rainfall":
-                base_value = random.uniform(0, 10)
+                base_value = rng.uniform(0, 10)
             elif sensor_type == "temperature":
-                base_value = random.uniform(15, 25)
+                base_value = rng.uniform(15, 25)
             elif sensor_type == "ph":
-                base_value = random.uniform(6.5, 8.5)
+                base_value = rng.uniform(6.5, 8.5)
             elif sensor_type == "conductivity":
-                base_value = random.uniform(200, 800)
+                base_value = rng.uniform(200, 800)
             elif sensor_type == "turbidity":
-                base_value = random.uniform(0, 20)
+                base_value = rng.uniform(0, 20)
             elif sensor_type == "settlement":
-                base_value = random.uniform(0, 10)
+                base_value = rng.uniform(0, 10)
             else:
-                base_value = random.uniform(0, 100)
+                base_value = rng.uniform(0, 100)
             
             # Add some random variation
-            value = base_value + random.uniform(-2, 2)
-            
-            # Determine status based on value
-            if sensor_type == "piezometer" and value > 140:
-                reading_status = "Alert"
-            elif sensor_type == "inclinometer" and value > 4:
-                reading_status = "Warning"
-            elif sensor_type == "water_level" and value > 18:
-                reading_status = "Warning"
-            elif sensor_type == "ph" and (value < 6.8 or value > 8.2):
-                reading_status = "Warning"
-            else:
-                reading_status = "Normal"
+            value = round(base_value + rng.uniform(-2, 2), 2)
             
-            readings.append(SensorReading(
-                timestamp=timestamp,
-                value=round(value, 2),
-                unit=unit,
-                status=reading_status
-            ))
+            timestamps.append(to_epoch_us(timestamp))
+            values.append(value)
         
         # Latest reading
-        latest_value = readings[-1].value + random.uniform(-0.5, 0.5)
+        latest_value = round(values[-1] + rng.uniform(-0.5, 0.5), 2)
+        timestamps.append(to_epoch_us(now))
+        values.append(latest_value)
         
-        if sensor_type == "piezometer" and latest_value > 140:
-            latest_status = "Alert"
-        elif sensor_type == "inclinometer" and latest_value > 4:
-            latest_status = "Warning"
-        elif sensor_type == "water_level" and latest_value > 18:
-            latest_status = "Warning"
-        elif sensor_type == "ph" and (latest_value < 6.8 or latest_value > 8.2):
-            latest_status = "Warning"
-        else:
-            latest_status = "Normal"
-        
-        latest_reading = SensorReading(
-            timestamp=now,
-            value=round(latest_value, 2),
-            unit=unit,
-            status=latest_status
-        )
-        
-        sensors.append(SensorData(
-            sensor_id=f"SEN{facility_id[-3:]}{i+1:03d}",
+        sensor = sensor_store.register_sensor(
+            sensor_id=f"SEN{facility_id[3:]}{i+1:03d}",
+            facility_id=facility_id,
             sensor_name=f"{sensor_type.capitalize()} {i+1}",
             sensor_type=sensor_type,
-            location=random.choice(locations),
-            readings=readings,
-            last_reading=latest_reading,
+            location=rng.choice(locations),
+            unit=unit,
             status=status
-        ))
+        )
+        
+        # Determine reading statuses from the threshold rules in one pass
+        values = np.array(values)
+        sensor_store.extend(sensor["sensor_id"], timestamps, values, classify_readings(sensor, values))
+        sensors.append(sensor)
     
     return sensors
 
+# Build a sensor payload in the requested shape from the store; readings are materialised only here
+def build_sensor_data(
+    sensor: Dict[str, Any],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    include_readings: bool = True,
+    shape: str = "full",
+    fields: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    sensor_id = sensor["sensor_id"]
+    unit = sensor["unit"]
+    data = {
+        "sensor_id": sensor_id,
+        "sensor_name": sensor["sensor_name"],
+        "sensor_type": sensor["sensor_type"],
+        "location": sensor["location"]
+    }
+    
+    if shape == "columnar":
+        data["unit"] = unit
+    if shape != "summary" and (fields is None or "readings" in fields):
+        if shape == "columnar":
+            if include_readings:
+                data["readings"] = serialize_columns(sensor_store.read(sensor_id, start, end))
+            else:
+                data["readings"] = {"timestamps": [], "values": [], "statuses": []}
+        else:
+            data["readings"] = serialize_readings(sensor_store.read(sensor_id, start, end), unit) if include_readings else []
+    if fields is None or "last_reading" in fields:
+        latest = sensor_store.last(sensor_id)
+        last_reading = serialize_readings(latest, unit)[0] if latest is not None else None
+        if last_reading is not None and shape == "columnar":
+            del last_reading["unit"]
+        data["last_reading"] = last_reading
+    data["status"] = sensor["status"]
+    
+    return project(data, fields)
+
+# Parse the shape and fields= query parameters of a sensor endpoint
+def parse_sensor_projection(shape: str, fields: Optional[str]) -> Optional[List[str]]:
+    if shape not in SENSOR_SHAPES:
+        raise HTTPException(status_code=400, detail=f"Shape must be one of {', '.join(SENSOR_SHAPES)}")
+    try:
+        return parse_fields(fields, sensor_shape_models[shape].model_fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Stream sensors' readings in a columnar binary format straight from the stored arrays
+def export_readings_response(
+    sensors: List[Dict[str, Any]],
+    export_format: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> StreamingResponse:
+    if export_format == "arrow" and not arrow_available():
+        raise HTTPException(status_code=406, detail="Arrow export requires pyarrow on the server")
+    
+    series = [(sensor, sensor_store.read(sensor["sensor_id"], start, end)) for sensor in sensors]
+    
+    if export_format == "arrow":
+        return StreamingResponse(iter_arrow(series), media_type=ARROW_STREAM_MEDIA_TYPE)
+    return StreamingResponse(iter_packed(series), media_type=PACKED_MEDIA_TYPE)
+
 # Generate sample alerts
-def generate_sample_alerts(facility_id: str, count: int = 5):
+def generate_sample_alerts(facility_id: str, count: int = 5, rng: Optional[random.Random] = None):
+    rng = rng or random
     alerts = []
-    alert_types = ["High Reading", "Sensor Offline", "Rapid Change", "Threshold Exceeded", "Communication Error"]
+    alert_types = ["High Reading", "Sensor Offline", "Threshold Exceeded", "Communication Error"]
     severities = ["Low", "Medium", "High", "Critical"]
     statuses = ["Active", "Acknowledged", "Resolved"]
     
     for i in range(count):
-        alert_type = random.choice(alert_types)
-        severity = random.choice(severities)
-        status = random.choice(statuses)
+        alert_type = rng.choice(alert_types)
+        severity = rng.choice(severities)
+        status = rng.choice(statuses)
         
         # Generate timestamp within the past week
-        hours_ago = random.randint(1, 168)  # Up to 1 week ago
+        hours_ago = rng.randint(1, 168)  # Up to 1 week ago
         timestamp = datetime.now() - timedelta(hours=hours_ago)
         
         # Generate message based on alert type
@@ -186,8 +393,6 @@ def generate_sample_alerts(facility_id: str, count: int = 5):
             message = "Sensor reading exceeds threshold value"
         elif alert_type == "Sensor Offline":
             message = "Sensor has gone offline and is not reporting data"
-        elif alert_type == "Rapid Change":
-            message = "Rapid change in sensor readings detected"
         elif alert_type == "Threshold Exceeded":
             message = "Monitoring threshold has been exceeded"
         elif alert_type == "Communication Error":
@@ -206,9 +411,9 @@ def generate_sample_alerts(facility_id: str, count: int = 5):
                 resolution_notes = "Issue investigated and resolved. No further action required."
         
         alerts.append(MonitoringAlert(
-            alert_id=f"ALT{facility_id[-3:]}{i+1:03d}",
+            alert_id=alert_id_for(facility_id, i + 1),
             facility_id=facility_id,
-            sensor_id=f"SEN{facility_id[-3:]}{random.randint(1, 10):03d}",
+            sensor_id=f"SEN{facility_id[3:]}{rng.randint(1, 10):03d}",
             timestamp=timestamp,
             alert_type=alert_type,
             severity=severity,
@@ -224,6 +429,364 @@ def generate_sample_alerts(facility_id: str, count: int = 5):
     
     return alerts
 
+# Hub pushing live readings, status changes and alerts to facility subscribers
+broadcast_hub = BroadcastHub()
+
+# Publish newly stored readings, and any change in a sensor's latest status
+def publish_readings(sensor: Dict[str, Any], timestamps: np.ndarray, values: np.ndarray, statuses: np.ndarray, previous_status: Optional[int]):
+    facility_id = sensor["facility_id"]
+    if not broadcast_hub.has_subscribers(facility_id):
+        return
+    
+    sensor_id = sensor["sensor_id"]
+    broadcast_hub.publish(facility_id, "readings", {
+        "sensor_id": sensor_id,
+        "unit": sensor["unit"],
+        "timestamps": epoch_us_to_datetimes(timestamps),
+        "values": values.tolist(),
+        "statuses": [READING_STATUSES[code] for code in statuses.tolist()]
+    })
+    
+    latest = sensor_store.last(sensor_id)
+    latest_status = int(latest.statuses[0])
+    if previous_status is not None and latest_status != previous_status:
+        broadcast_hub.publish(facility_id, "status_change", {
+            "sensor_id": sensor_id,
+            "previous_status": READING_STATUSES[previous_status],
+            "status": READING_STATUSES[latest_status],
+            "timestamp": epoch_us_to_datetimes(latest.timestamps)[0],
+            "value": float(latest.values[0])
+        })
+
+sensor_store.add_listener(publish_readings)
+
+# Publish a new or updated alert to the facility's subscribers
+def publish_alert(alert: MonitoringAlert, event_type: str = "alert"):
+    broadcast_hub.publish(alert.facility_id, event_type, alert.model_dump(mode="json"))
+
+# Persistent alert repository
+alert_store = AlertStore()
+
+# Dashboard counts kept up to date as sensors, readings and alerts change
+dashboard_counters = DashboardCounters()
+
+# Track changes in each sensor's latest reading status
+def update_latest_status_counters(sensor: Dict[str, Any], timestamps: np.ndarray, values: np.ndarray, statuses: np.ndarray, previous_status: Optional[int]):
+    latest_status = int(sensor_store.last(sensor["sensor_id"]).statuses[0])
+    if latest_status != previous_status:
+        dashboard_counters.latest_status_changed(sensor["facility_id"], previous_status, latest_status)
+
+sensor_store.add_sensor_listener(dashboard_counters.sensor_changed)
+sensor_store.add_listener(update_latest_status_counters)
+alert_store.add_listener(dashboard_counters.alert_changed)
+
+# Deduplicates raised alerts per (sensor, alert type) and latches threshold alerts, configured through TAILINGSIQ_ALERT_* variables
+alert_coalescer = AlertCoalescer(coalescing_config_from_env(os.environ))
+alert_store.add_listener(alert_coalescer.alert_changed)
+
+# Rebuild a facility's dashboard counters from the stored sensors and alerts
+def rebuild_facility_counters(facility_id: str):
+    sensors = sensor_store.get_facility_sensors(facility_id)
+    latest_statuses = []
+    for sensor in sensors:
+        latest = sensor_store.last(sensor["sensor_id"])
+        if latest is not None:
+            latest_statuses.append(int(latest.statuses[0]))
+    return build_facility_counters(sensors, latest_statuses, alert_store.facility_alerts(facility_id))
+
+# Seed for the startup data, so every start serves the same sensors, readings and alerts
+SAMPLE_SEED = int(os.environ.get("TAILINGSIQ_SEED", default_simulation_config["seed"]))
+
+# Optional simulated fleet for capacity testing, configured through TAILINGSIQ_SIM_* variables
+simulation_config = simulation_config_from_env(os.environ)
+
+# Optional durable log of monitoring data, configured through TAILINGSIQ_WAL_* variables
+monitoring_log = MonitoringLog.from_env(os.environ)
+recovered_state = monitoring_log.recover() if monitoring_log else None
+
+# Ingestion requests queue rows for worker tasks that write them in micro-batches, configured through TAILINGSIQ_INGEST_* variables
+ingestion_queue = IngestionQueue(
+    sensor_store,
+    classify_readings,
+    ingestion_config_from_env(os.environ),
+    flush_context=monitoring_log.group_commit if monitoring_log else nullcontext
+)
+router.add_event_handler("startup", ingestion_queue.start)
+# Registered before the log's shutdown handler so queued rows are written before it closes
+router.add_event_handler("shutdown", ingestion_queue.stop)
+
+# Minute/hour/day rollups of every sensor, with per-sensor-type retention
+rollup_store = RollupStore(sensor_store)
+sensor_store.add_write_hook(rollup_store.readings_written)
+
+# Rebuild facilities, sensors, series, rollups and alert indexes from the log, applying retention as it goes
+def restore_from_log(state: RecoveredState):
+    now_us = to_epoch_us(datetime.now())
+    sample_facilities.clear()
+    sample_facilities.update({facility_id: {"name": facility["name"]} for facility_id, facility in state.facilities.items()})
+    for sensor_id, sensor in state.sensors.items():
+        sensor = sensor_store.register_sensor(**sensor)
+        checkpointed = 0
+        if sensor_id in state.rollups:
+            (watermark, tiers), checkpointed = state.rollups[sensor_id]
+            # Readings logged before the rollups are in them already; once past raw retention they are skipped
+            timestamps, values, statuses = state.sensor_readings(sensor_id, 0, checkpointed)
+            raw_us = rollup_store.policy_us(sensor["sensor_type"])["raw"]
+            if raw_us is not None:
+                keep = timestamps >= min(watermark, now_us - raw_us)
+                timestamps, values, statuses = timestamps[keep], values[keep], statuses[keep]
+            sensor_store.extend(sensor_id, timestamps, values, statuses)
+            rollup_store.restore(sensor_id, watermark, tiers)
+        timestamps, values, statuses = state.sensor_readings(sensor_id, checkpointed)
+        sensor_store.extend(sensor_id, timestamps, values, statuses)
+        # Roll up readings logged since, and drop what retention no longer keeps
+        rollup_store.compact_sensor(sensor, now_us)
+    for alert in state.alerts.values():
+        alert_store.add(MonitoringAlert(**alert))
+
+# Take a snapshot of the stores for the log. Under the store lock only references are taken,
+# since series and rollup buffers are replaced rather than rewritten; the returned function writes it.
+def capture_snapshot() -> Callable[[LogWriter], None]:
+    facilities = {facility_id: (dict(facility), sensor_store.get_facility_sensors(facility_id)) for facility_id, facility in sample_facilities.items()}
+    views = {sensor_id: sensor_store.read(sensor_id) for sensor_id in sensor_store.sensors}
+    rollups = {sensor_id: rollup_store.snapshot(sensor_id) for sensor_id in views}
+    
+    def write(log: LogWriter):
+        for facility_id, (facility, sensors) in facilities.items():
+            log.append_facility(facility_id, facility)
+            for sensor in sensors:
+                view = views[sensor["sensor_id"]]
+                log.append_sensor(sensor)
+                log.append_readings(sensor["sensor_id"], view.timestamps, view.values, view.statuses)
+                if rollups[sensor["sensor_id"]] is not None:
+                    log.append_rollups(sensor["sensor_id"], rollups[sensor["sensor_id"]])
+            for alert in reversed(alert_store.facility_alerts(facility_id)):
+                log.append_alert(alert.model_dump(mode="json"))
+    return write
+
+# Load the logged state, or sample sensors and alerts (or the simulated fleet's history), once at startup
+if recovered_state and recovered_state.records:
+    restore_from_log(recovered_state)
+elif simulation_config:
+    simulator = TelemetrySimulator(simulation_config)
+    sample_facilities.clear()
+    sample_facilities.update({facility_id: simulator.facility(facility_id) for facility_id in simulator.facility_ids()})
+    simulation_end = datetime.now()
+    fill_store(
+        simulator,
+        sensor_store,
+        classify_readings,
+        simulation_end - timedelta(days=float(simulator.config["days"])),
+        simulation_end
+    )
+else:
+    sample_rng = random.Random(SAMPLE_SEED)
+    for sample_facility_id in sample_facilities:
+        generate_sample_sensors(sample_facility_id, rng=sample_rng)
+        for sample_alert in generate_sample_alerts(sample_facility_id, 20, rng=sample_rng):
+            alert_store.add(sample_alert)
+
+# From here on every sensor change, reading batch and alert change is appended to the log
+if monitoring_log:
+    monitoring_log.open()
+    if not recovered_state.records:
+        with monitoring_log.group_commit():
+            capture_snapshot()(monitoring_log)
+    
+    # Readings are appended under the store lock, which lets a checkpoint snapshot the stores
+    # at an exact point in the log; their fsync waits until the store lock is released
+    def log_readings(sensor_id: str, timestamps: np.ndarray, values: np.ndarray, statuses: np.ndarray):
+        with monitoring_log.deferred():
+            monitoring_log.append_readings(sensor_id, timestamps, values, statuses)
+    
+    sensor_store.add_sensor_listener(lambda sensor, previous_status: monitoring_log.append_sensor(sensor))
+    sensor_store.add_write_hook(log_readings)
+    sensor_store.add_listener(lambda sensor, timestamps, values, statuses, previous_status: monitoring_log.commit())
+    alert_store.add_listener(lambda alert, previous_status: monitoring_log.append_alert(alert.model_dump(mode="json")))
+    
+    # fsync and close the log when the app shuts down
+    router.add_event_handler("shutdown", monitoring_log.close)
+
+# Background compaction rolls new readings up and applies retention every TAILINGSIQ_COMPACTION_SECONDS (0 disables it)
+COMPACTION_SECONDS = float(os.environ.get("TAILINGSIQ_COMPACTION_SECONDS", 60))
+compaction_tasks: List[asyncio.Task] = []
+
+# Compact in the threadpool so requests keep being served, then checkpoint the log once it has outgrown the retained data
+async def compact_rollups() -> Dict[str, Any]:
+    result = await run_in_threadpool(rollup_store.compact, to_epoch_us(datetime.now()))
+    if monitoring_log and monitoring_log.checkpoint_due():
+        await run_in_threadpool(monitoring_log.checkpoint, capture_snapshot, sensor_store.lock)
+    return result
+
+async def run_compaction():
+    while True:
+        await asyncio.sleep(COMPACTION_SECONDS)
+        try:
+            await compact_rollups()
+        except Exception:
+            logging.getLogger(__name__).exception("Rollup compaction failed")
+
+def start_compaction():
+    if COMPACTION_SECONDS > 0:
+        compaction_tasks.append(asyncio.get_running_loop().create_task(run_compaction()))
+
+def stop_compaction():
+    while compaction_tasks:
+        compaction_tasks.pop().cancel()
+
+router.add_event_handler("startup", start_compaction)
+router.add_event_handler("shutdown", stop_compaction)
+
+# Create, store and publish a new active alert, or fold a repeat into the sensor's open alert of that type
+def raise_alert(
+    sensor: Dict[str, Any],
+    alert_type: str,
+    severity: str,
+    message: str,
+    timestamp: Optional[datetime] = None
+) -> MonitoringAlert:
+    facility_id = sensor["facility_id"]
+    timestamp = timestamp or datetime.now()
+    with alert_coalescer.lock:
+        open_alert_id = alert_coalescer.match(sensor["sensor_id"], alert_type, to_epoch_us(timestamp))
+        if open_alert_id is not None:
+            alert = alert_store.get(open_alert_id)
+            alert = alert_store.update(
+                open_alert_id,
+                message=message,
+                occurrence_count=alert.occurrence_count + 1,
+                last_seen=max(alert.last_seen or alert.timestamp, timestamp)
+            )
+            publish_alert(alert, "alert_updated")
+            return alert
+        
+        alert = MonitoringAlert(
+            alert_id=alert_store.next_alert_id(facility_id),
+            facility_id=facility_id,
+            sensor_id=sensor["sensor_id"],
+            timestamp=timestamp,
+            alert_type=alert_type,
+            severity=severity,
+            message=message,
+            status="Active",
+            first_seen=timestamp,
+            last_seen=timestamp
+        )
+        alert_store.add(alert)
+    publish_alert(alert)
+    return alert
+
+# Online rate-of-change and anomaly detectors, fed by every new reading
+anomaly_detector = AnomalyDetector()
+
+# Describe a detector firing for the alert message
+def describe_detection(sensor: Dict[str, Any], detection: Dict[str, Any]) -> str:
+    unit = sensor["unit"]
+    if detection["kind"] == "slope":
+        direction = "rising" if detection["statistic"] > 0 else "falling"
+        return f"Rapid change in sensor readings detected: {direction} {abs(detection['statistic']):.2f} {unit}/h"
+    if detection["kind"] == "zscore":
+        return f"Rapid change in sensor readings detected: reading {detection['value']:.2f} {unit} is {abs(detection['statistic']):.1f} standard deviations from the recent mean"
+    direction = "upward" if detection["statistic"] > 0 else "downward"
+    return f"Rapid change in sensor readings detected: sustained {direction} shift in readings"
+
+# Raise "Rapid Change" alerts for detector output on newly stored readings
+def detect_rapid_changes(sensor: Dict[str, Any], timestamps: np.ndarray, values: np.ndarray, statuses: np.ndarray, previous_status: Optional[int]):
+    detections = anomaly_detector.process(sensor, timestamps, values)
+    if not detections:
+        return
+    
+    reading_times = epoch_us_to_datetimes(timestamps[[d["index"] for d in detections]])
+    for detection, timestamp in zip(detections, reading_times):
+        raise_alert(
+            sensor,
+            "Rapid Change",
+            "High" if detection["ratio"] >= 2 else "Medium",
+            describe_detection(sensor, detection),
+            timestamp
+        )
+
+# Raise "Threshold Exceeded" alerts when readings cross a sensor's alert bounds
+def detect_threshold_crossings(sensor: Dict[str, Any], timestamps: np.ndarray, values: np.ndarray, statuses: np.ndarray, previous_status: Optional[int]):
+    bounds = threshold_rules.thresholds(sensor)
+    crossings = alert_coalescer.threshold_crossings(sensor["sensor_id"], values, statuses, bounds["alert_low"], bounds["alert_high"])
+    if not len(crossings):
+        return
+    
+    reading_times = epoch_us_to_datetimes(timestamps[crossings])
+    for value, timestamp in zip(values[crossings].tolist(), reading_times):
+        raise_alert(
+            sensor,
+            "Threshold Exceeded",
+            "High",
+            f"Reading {value:.2f} {sensor['unit']} is outside the alert threshold",
+            timestamp
+        )
+
+# Registered after the sample data is loaded so detectors only see live readings
+sensor_store.add_listener(detect_rapid_changes)
+sensor_store.add_listener(detect_threshold_crossings)
+
+# Fleet rollups are cached briefly; concurrent requests for the same view share one computation
+FLEET_CACHE_SECONDS = 5.0
+FLEET_CHUNK_SIZE = 100
+fleet_cache = TTLCache(FLEET_CACHE_SECONDS)
+
+# Summarise a chunk of facilities from their counters and collect candidate top alerts
+def summarise_facilities(facility_ids: List[str], top_alerts: int):
+    summaries = []
+    candidates = []
+    for facility_id in facility_ids:
+        counters = dashboard_counters.facility(facility_id)
+        alerts_by_status = counters.alerts_by_status()
+        summaries.append({
+            "facility_id": facility_id,
+            "facility_name": sample_facilities[facility_id]["name"],
+            "overall_status": counters.overall_status(),
+            "sensors_count": counters.sensors_count(),
+            "alerts_count": counters.alerts_count(),
+            "active_alerts": alerts_by_status["Active"]
+        })
+        
+        # Only the most severe active alerts can make the fleet-wide top list
+        remaining = top_alerts
+        for rank, severity in enumerate(ALERT_SEVERITIES):
+            if remaining <= 0:
+                break
+            for alert in alert_store.query(facility_id, status="Active", severity=severity, limit=remaining):
+                candidates.append((rank, -to_epoch_us(alert.timestamp), alert.alert_id, alert))
+                remaining -= 1
+    return summaries, candidates
+
+# Aggregate the fleet view, summarising chunks of facilities concurrently off the event loop
+async def build_fleet_dashboard(facility_ids: List[str], top_alerts: int) -> Dict[str, Any]:
+    chunks = [facility_ids[i:i + FLEET_CHUNK_SIZE] for i in range(0, len(facility_ids), FLEET_CHUNK_SIZE)]
+    results = await asyncio.gather(*(run_in_threadpool(summarise_facilities, chunk, top_alerts) for chunk in chunks))
+    
+    facilities = [summary for summaries, _ in results for summary in summaries]
+    status_counts = {status: 0 for status in READING_STATUSES}
+    sensors_count: Dict[str, int] = {}
+    alerts_count: Dict[str, int] = {}
+    for summary in facilities:
+        status_counts[summary["overall_status"]] += 1
+        for status, count in summary["sensors_count"].items():
+            sensors_count[status] = sensors_count.get(status, 0) + count
+        for severity, count in summary["alerts_count"].items():
+            alerts_count[severity] = alerts_count.get(severity, 0) + count
+    
+    candidates = [candidate for _, chunk_candidates in results for candidate in chunk_candidates]
+    top = heapq.nsmallest(top_alerts, candidates, key=lambda candidate: candidate[:3])
+    
+    return {
+        "facilities_count": len(facilities),
+        "status_counts": status_counts,
+        "sensors_count": sensors_count,
+        "alerts_count": alerts_count,
+        "facilities": facilities,
+        "top_alerts": [candidate[3].model_dump() for candidate in top],
+        "generated_at": datetime.now()
+    }
+
 @router.get("/facilities", response_model=List[Dict[str, Any]])
 async def get_facilities(current_user: dict = Depends(get_current_user)):
     """Get list of facilities with monitoring status summary"""
@@ -232,10 +795,37 @@ async def get_facilities(current_user: dict = Depends(get_current_user)):
         facilities_list.append({
             "id": facility_id,
             "name": facility_data["name"],
-            "status": facility_data["status"]
+            "status": dashboard_counters.facility(facility_id).overall_status()
         })
     return facilities_list
 
+@router.get("/fleet", response_model=FleetDashboardResponse)
+async def get_fleet_dashboard(
+    facility_ids: Optional[str] = Query(None),  # Comma-separated; defaults to every facility
+    status: Optional[str] = Query(None),  # Only facilities with this overall status
+    top_alerts: int = Query(10, ge=0, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get status, sensor counts and top alerts across many facilities in one response"""
+    if facility_ids:
+        selected = [facility_id.strip() for facility_id in facility_ids.split(",") if facility_id.strip()]
+        unknown = [facility_id for facility_id in selected if facility_id not in sample_facilities]
+        if unknown:
+            raise HTTPException(status_code=404, detail=f"Facility not found: {', '.join(unknown)}")
+    else:
+        selected = list(sample_facilities)
+    if status and status not in READING_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Status must be one of {', '.join(READING_STATUSES)}")
+    
+    key = (tuple(selected), top_alerts)
+    fleet, cached = await fleet_cache.get_or_compute(key, lambda: build_fleet_dashboard(selected, top_alerts))
+    
+    if status:
+        # Filter the cached rollup; the fleet-wide totals still describe the selected facilities
+        fleet = dict(fleet, facilities=[summary for summary in fleet["facilities"] if summary["overall_status"] == status])
+    
+    return json_response(dict(fleet, cached=cached))
+
 @router.get("/dashboard/{facility_id}", response_model=MonitoringDashboardResponse)
 async def get_monitoring_dashboard(
     facility_id: str,
@@ -247,108 +837,535 @@ async def get_monitoring_dashboard(
     
     facility = sample_facilities[facility_id]
     
-    # Generate sample sensors and alerts
-    sensors = generate_sample_sensors(facility_id)
-    alerts = generate_sample_alerts(facility_id)
+    # Counts are maintained incrementally, so this is a constant-time read
+    counters = dashboard_counters.facility(facility_id)
     
-    # Count sensors by status
-    sensors_count = {
-        "Online": sum(1 for s in sensors if s.status == "Online"),
-        "Offline": sum(1 for s in sensors if s.status == "Offline"),
-        "Maintenance": sum(1 for s in sensors if s.status == "Maintenance"),
-        "Total": len(sensors)
+    return {
+        "facility_id": facility_id,
+        "facility_name": facility["name"],
+        "overall_status": counters.overall_status(),
+        "sensors_count": counters.sensors_count(),
+        "alerts_count": counters.alerts_count(),
+        "alerts_by_status": counters.alerts_by_status(),
+        "recent_alerts": alert_store.facility_alerts(facility_id, 5),  # Only return 5 most recent alerts
+        "last_updated": datetime.now()
     }
+
+@router.get("/dashboard/{facility_id}/consistency", response_model=DashboardConsistencyResponse)
+async def check_dashboard_consistency(
+    facility_id: str,
+    repair: bool = Query(False),
+    current_user: dict = Depends(get_current_user)
+):
+    """Rebuild a facility's dashboard counters from scratch and compare them with the incremental ones"""
+    if facility_id not in sample_facilities:
+        raise HTTPException(status_code=404, detail="Facility not found")
     
-    # Count alerts by severity
-    alerts_count = {
-        "Critical": sum(1 for a in alerts if a.severity == "Critical"),
-        "High": sum(1 for a in alerts if a.severity == "High"),
-        "Medium": sum(1 for a in alerts if a.severity == "Medium"),
-        "Low": sum(1 for a in alerts if a.severity == "Low"),
-        "Total": len(alerts)
-    }
+    rebuilt = rebuild_facility_counters(facility_id)
+    mismatches = compare_counters(dashboard_counters.facility(facility_id), rebuilt)
+    
+    if mismatches and repair:
+        dashboard_counters.replace(facility_id, rebuilt)
     
     return {
         "facility_id": facility_id,
-        "facility_name": facility["name"],
-        "overall_status": facility["status"],
-        "sensors_count": sensors_count,
-        "alerts_count": alerts_count,
-        "recent_alerts": alerts[:5],  # Only return 5 most recent alerts
-        "last_updated": datetime.now()
+        "consistent": not mismatches,
+        "mismatches": mismatches,
+        "repaired": bool(mismatches and repair),
+        "counters": rebuilt.snapshot()
     }
 
-@router.get("/sensors/{facility_id}", response_model=List[SensorData])
+@router.get("/sensors/{facility_id}", response_model=Union[List[SensorData], List[SensorSummary], List[SensorColumnarData]])
 async def get_facility_sensors(
     facility_id: str,
+    request: Request,
     sensor_type: Optional[str] = Query(None),
     location: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    include_readings: bool = Query(True),
+    shape: str = Query("full"),  # full, summary (no readings) or columnar (parallel arrays, unit hoisted)
+    fields: Optional[str] = Query(None),  # Comma-separated top-level fields to return
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get sensors for a specific facility with optional filtering"""
+    """
+    Get sensors for a specific facility with optional filtering.
+    start/end bound the embedded readings; pages are ordered by sensor ID and
+    the cursor for the next page is returned in the X-Next-Cursor header.
+    Send an Arrow or packed readings Accept header for a binary export of the page.
+    """
     if facility_id not in sample_facilities:
         raise HTTPException(status_code=404, detail="Facility not found")
     
-    # Generate sample sensors
-    sensors = generate_sample_sensors(facility_id)
+    projection = parse_sensor_projection(shape, fields)
     
-    # Apply filters if provided
-    if sensor_type:
-        sensors = [s for s in sensors if s.sensor_type == sensor_type]
+    after = None
+    if cursor:
+        try:
+            after, = decode_cursor(cursor, (str,))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     
-    if location:
-        sensors = [s for s in sensors if s.location == location]
+    # Read sensors from the store, resuming after the cursor
+    sensors = []
+    next_cursor = None
+    for sensor in sensor_store.get_facility_sensors(facility_id, after=after):
+        # Apply filters if provided
+        if sensor_type and sensor["sensor_type"] != sensor_type:
+            continue
+        if location and sensor["location"] != location:
+            continue
+        if status and sensor["status"] != status:
+            continue
+        
+        if len(sensors) == limit:
+            next_cursor = encode_cursor(sensors[-1]["sensor_id"])
+            break
+        sensors.append(sensor)
     
-    if status:
-        sensors = [s for s in sensors if s.status == status]
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
     
-    return sensors
+    export_format = negotiate_export_format(request.headers.get("accept"))
+    if export_format:
+        export = export_readings_response(sensors, export_format, start, end)
+        export.headers.update(headers or {})
+        return export
+    
+    # Payloads are built from our own store, so they are serialized without model validation
+    return json_response(
+        [build_sensor_data(s, start, end, include_readings, shape, projection) for s in sensors],
+        headers
+    )
 
-@router.get("/sensor/{sensor_id}", response_model=SensorData)
+@router.get("/sensor/{sensor_id}", response_model=Union[SensorData, SensorSummary, SensorColumnarData])
 async def get_sensor_data(
     sensor_id: str,
+    request: Request,
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    shape: str = Query("full"),  # full, summary (no readings) or columnar (parallel arrays, unit hoisted)
+    fields: Optional[str] = Query(None),  # Comma-separated top-level fields to return
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get detailed data for a specific sensor.
+    Send an Arrow or packed readings Accept header for a binary export of the readings.
+    """
+    # Find the requested sensor
+    sensor = sensor_store.get_sensor(sensor_id)
+    if sensor is None:
+        raise HTTPException(status_code=404, detail="Sensor not found")
+    
+    projection = parse_sensor_projection(shape, fields)
+    
+    export_format = negotiate_export_format(request.headers.get("accept"))
+    if export_format:
+        return export_readings_response([sensor], export_format, start, end)
+    
+    return json_response(build_sensor_data(sensor, start, end, shape=shape, fields=projection))
+
+@router.get("/export")
+async def export_sensor_readings(
+    facility_id: Optional[str] = Query(None),
+    sensor_ids: Optional[str] = Query(None),  # Comma-separated sensor IDs
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    format: Optional[str] = Query(None),  # arrow or packed; defaults to the Accept header, then packed
+    accept: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream readings for one or many sensors as an Arrow IPC stream or packed little-endian columns"""
+    if format is not None and format not in ("arrow", "packed"):
+        raise HTTPException(status_code=400, detail="Format must be arrow or packed")
+    if not facility_id and not sensor_ids:
+        raise HTTPException(status_code=400, detail="Provide facility_id or sensor_ids")
+    
+    if sensor_ids:
+        sensors = []
+        for sensor_id in sensor_ids.split(","):
+            sensor = sensor_store.get_sensor(sensor_id.strip())
+            if sensor is None:
+                raise HTTPException(status_code=404, detail=f"Sensor {sensor_id.strip()} not found")
+            if facility_id and sensor["facility_id"] != facility_id:
+                continue
+            sensors.append(sensor)
+    else:
+        if facility_id not in sample_facilities:
+            raise HTTPException(status_code=404, detail="Facility not found")
+        sensors = sensor_store.get_facility_sensors(facility_id)
+    
+    export_format = format or negotiate_export_format(accept) or "packed"
+    return export_readings_response(sensors, export_format, start, end)
+
+@router.get("/sensor/{sensor_id}/aggregate", response_model=SensorAggregateResponse)
+async def get_sensor_aggregate(
+    sensor_id: str,
+    interval: str = Query("1h"),
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get min/max/mean/count/last per time interval for a sensor's readings"""
+    sensor = sensor_store.get_sensor(sensor_id)
+    if sensor is None:
+        raise HTTPException(status_code=404, detail="Sensor not found")
+    
+    try:
+        interval_us = parse_interval(interval)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Whole buckets come from the coarsest rollup tier that divides the interval
+    buckets, tier = rollup_store.aggregate(
+        sensor_id,
+        interval_us,
+        to_epoch_us(start) if start is not None else None,
+        to_epoch_us(end) if end is not None else None
+    )
+    
+    return {
+        "sensor_id": sensor_id,
+        "unit": sensor["unit"],
+        "interval_seconds": interval_us / 1_000_000,
+        "raw_count": int(buckets["count"].sum()),
+        "tier": tier,
+        "buckets": serialize_buckets(buckets)
+    }
+
+@router.get("/sensor/{sensor_id}/downsample", response_model=SensorDownsampleResponse)
+async def get_sensor_downsample(
+    sensor_id: str,
+    points: int = Query(500, ge=3, le=10000),
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    shape: str = Query("full"),  # full or columnar (parallel arrays)
+    current_user: dict = Depends(get_current_user)
+):
+    """Get a sensor's readings downsampled to a target point count with LTTB"""
+    sensor = sensor_store.get_sensor(sensor_id)
+    if sensor is None:
+        raise HTTPException(status_code=404, detail="Sensor not found")
+    if shape not in ("full", "columnar"):
+        raise HTTPException(status_code=400, detail="Shape must be one of full, columnar")
+    
+    view = sensor_store.read(sensor_id, start, end)
+    keep = lttb_indices(view.timestamps, view.values, points)
+    sampled = SeriesView(view.timestamps[keep], view.values[keep], view.statuses[keep])
+    
+    return json_response({
+        "sensor_id": sensor_id,
+        "unit": sensor["unit"],
+        "raw_count": len(view),
+        "readings": serialize_columns(sampled) if shape == "columnar" else serialize_readings(sampled, sensor["unit"])
+    })
+
+@router.post("/ingest", response_model=IngestionResponse)
+async def ingest_readings(
+    request: Request,
+    batch_size: int = Query(5000, ge=1, le=100000),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Bulk ingest sensor readings streamed as NDJSON or CSV.
+    Each row needs sensor_id, timestamp (ISO 8601 or epoch seconds) and value;
+    status is optional and is derived from the sensor thresholds when omitted.
+    """
+    content_type = request.headers.get("content-type", "application/x-ndjson").split(";")[0].strip().lower()
+    
+    if content_type in NDJSON_CONTENT_TYPES:
+        parse = ingest_ndjson
+    elif content_type in CSV_CONTENT_TYPES:
+        parse = ingest_csv
+    else:
+        raise HTTPException(status_code=415, detail="Unsupported content type, use application/x-ndjson or text/csv")
+    
+    # Turn new requests away while the queue is nearly full rather than buffering their rows
+    try:
+        ingestion_queue.admit()
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail="Ingestion queue is full", headers={"Retry-After": str(e.retry_after)})
+    
+    # Rows are parsed as the body streams in and queued in batches; the response waits until they are written
+    batcher = IngestionBatcher(sensor_store, ingestion_queue, batch_size=batch_size)
+    try:
+        await parse(iter_lines(request.stream(), int(ingestion_queue.config["max_line_bytes"])), batcher)
+    except QueueFull as e:
+        await batcher.wait()
+        raise HTTPException(
+            status_code=503,
+            detail=f"Ingestion queue stayed full; {batcher.accepted} rows were stored before the request was stopped",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except LineTooLong as e:
+        await batcher.wait()
+        raise HTTPException(status_code=413, detail=f"{e}; {batcher.accepted} rows were stored before the request was stopped")
+    await batcher.wait()
+    
+    return batcher.report()
+
+@router.get("/ingest/metrics", response_model=Dict[str, Any])
+async def get_ingestion_metrics(current_user: dict = Depends(get_current_user)):
+    """Get ingestion queue depth, micro-batch sizes, write lag and throughput"""
+    return ingestion_queue.stats()
+
+@router.get("/thresholds", response_model=List[ThresholdRule])
+async def get_threshold_rules(current_user: dict = Depends(get_current_user)):
+    """Get the threshold rules used to classify readings"""
+    return threshold_rules.rules
+
+@router.put("/thresholds", response_model=List[ThresholdRule])
+async def update_threshold_rules(
+    rules: List[ThresholdRule] = Body(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """Replace the threshold rules; stored history keeps its status until reclassified"""
+    global threshold_rules
+    
+    for rule in rules:
+        if rule.sensor_type not in sensor_types:
+            raise HTTPException(status_code=400, detail=f"Invalid sensor type {rule.sensor_type}")
+        if rule.facility_id and rule.facility_id not in sample_facilities:
+            raise HTTPException(status_code=400, detail=f"Invalid facility ID {rule.facility_id}")
+    
+    try:
+        threshold_rules = ThresholdRuleSet(rule.model_dump() for rule in rules)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Latches were set against the old bounds
+    alert_coalescer.reset()
+    
+    return threshold_rules.rules
+
+@router.post("/thresholds/reclassify", response_model=ReclassifyResponse)
+async def reclassify_readings(
+    facility_id: Optional[str] = Query(None),
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Re-evaluate stored readings against the current threshold rules"""
+    if facility_id:
+        if facility_id not in sample_facilities:
+            raise HTTPException(status_code=404, detail="Facility not found")
+        sensors = sensor_store.get_facility_sensors(facility_id)
+    else:
+        sensors = list(sensor_store.sensors.values())
+    
+    # Log each sensor's changed statuses, so a restart recovers the new classification
+    if monitoring_log:
+        with monitoring_log.group_commit():
+            result = reclassify_history(
+                sensor_store, threshold_rules, sensors, start, end,
+                listener=lambda sensor, timestamps, values, statuses:
+                    monitoring_log.append_statuses(sensor["sensor_id"], timestamps, values, statuses)
+            )
+    else:
+        result = reclassify_history(sensor_store, threshold_rules, sensors, start, end)
+    
+    # Rollup buckets carry the status of their last reading, which the new rules may change too
+    start_us = to_epoch_us(start) if start is not None else None
+    end_us = to_epoch_us(end) if end is not None else None
+    for sensor in sensors:
+        rollup_store.reclassify(sensor, classify_readings, start_us, end_us)
+    
+    # Latest statuses may have changed in place, so rebuild the affected dashboard counters
+    for affected_facility_id in {s["facility_id"] for s in sensors}:
+        dashboard_counters.replace(affected_facility_id, rebuild_facility_counters(affected_facility_id))
+    
+    return result
+
+@router.websocket("/ws/{facility_id}")
+async def monitoring_websocket(
+    websocket: WebSocket,
+    facility_id: str,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get detailed data for a specific sensor"""
-    # Extract facility ID from sensor ID
-    facility_id = f"FAC{sensor_id[3:6]}"
+    """Push live readings, status changes and alerts for a facility over a WebSocket"""
+    if facility_id not in sample_facilities:
+        await websocket.close(code=4404)
+        return
     
+    await websocket.accept()
+    subscription = broadcast_hub.subscribe(facility_id)
+    
+    # Watch the socket for a disconnect while waiting for events
+    receiver = asyncio.ensure_future(websocket.receive())
+    getter = asyncio.ensure_future(subscription.get())
+    
+    try:
+        while True:
+            done, _ = await asyncio.wait({receiver, getter}, return_when=asyncio.FIRST_COMPLETED)
+            
+            if receiver in done:
+                if receiver.result()["type"] == "websocket.disconnect":
+                    break
+                receiver = asyncio.ensure_future(websocket.receive())
+            
+            if getter in done:
+                event = getter.result()
+                if event is None:
+                    # Dropped for falling behind
+                    await websocket.close(code=1013)
+                    break
+                await websocket.send_text(event.payload)
+                getter = asyncio.ensure_future(subscription.get())
+    finally:
+        receiver.cancel()
+        getter.cancel()
+        broadcast_hub.unsubscribe(subscription)
+
+@router.get("/stream/{facility_id}")
+async def stream_monitoring_events(
+    facility_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """Push live readings, status changes and alerts for a facility as Server-Sent Events"""
     if facility_id not in sample_facilities:
         raise HTTPException(status_code=404, detail="Facility not found")
     
-    # Generate sample sensors
-    sensors = generate_sample_sensors(facility_id)
+    subscription = broadcast_hub.subscribe(facility_id)
     
-    # Find the requested sensor
-    for sensor in sensors:
-        if sensor.sensor_id == sensor_id:
-            return sensor
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield event.sse
+        finally:
+            broadcast_hub.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/wal", response_model=Dict[str, Any])
+async def get_monitoring_log_stats(current_user: dict = Depends(get_current_user)):
+    """Get write-ahead log settings, write and fsync counts, and what the last startup recovered"""
+    if monitoring_log is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        **monitoring_log.stats(),
+        "recovery": {
+            "segments": recovered_state.segments,
+            "records": recovered_state.records,
+            "bytes": recovered_state.bytes,
+            "discarded_segments": recovered_state.discarded_segments,
+            "truncated_bytes": recovered_state.truncated_bytes,
+            "elapsed_seconds": round(recovered_state.elapsed_seconds, 6)
+        }
+    }
+
+@router.get("/retention", response_model=RetentionPolicies, response_model_exclude_unset=True)
+async def get_retention_policies(current_user: dict = Depends(get_current_user)):
+    """Get how long raw readings and each rollup tier are kept"""
+    return {"default": rollup_store.default_policy, "sensor_types": rollup_store.policies}
+
+@router.put("/retention", response_model=RetentionPolicies, response_model_exclude_unset=True)
+async def update_retention_policies(
+    policies: RetentionPolicies = Body(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """Replace the retention policies; they take effect at the next compaction"""
+    for sensor_type in policies.sensor_types:
+        if sensor_type not in sensor_types:
+            raise HTTPException(status_code=400, detail=f"Invalid sensor type {sensor_type}")
+    
+    try:
+        rollup_store.set_policies(
+            policies.default.model_dump(),
+            {sensor_type: policy.model_dump(exclude_unset=True) for sensor_type, policy in policies.sensor_types.items()}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    raise HTTPException(status_code=404, detail="Sensor not found")
+    return {"default": rollup_store.default_policy, "sensor_types": rollup_store.policies}
+
+@router.post("/retention/compact", response_model=CompactionResponse)
+async def run_retention_compaction(current_user: dict = Depends(get_current_user)):
+    """Roll new readings into the rollup tiers and apply retention now"""
+    return await compact_rollups()
+
+@router.get("/retention/stats", response_model=Dict[str, Any])
+async def get_rollup_stats(current_user: dict = Depends(get_current_user)):
+    """Get rollup bucket counts per tier and the last compaction's results"""
+    return rollup_store.stats()
+
+@router.get("/coalescing", response_model=Dict[str, Any])
+async def get_alert_coalescing_stats(current_user: dict = Depends(get_current_user)):
+    """Get alert deduplication settings and raised, coalesced and suppressed counts"""
+    return alert_coalescer.stats()
+
+@router.get("/subscriptions", response_model=Dict[str, Any])
+async def get_subscription_stats(current_user: dict = Depends(get_current_user)):
+    """Get live subscriber counts and delivery totals"""
+    return broadcast_hub.stats()
 
 @router.get("/alerts/{facility_id}", response_model=List[MonitoringAlert])
 async def get_facility_alerts(
     facility_id: str,
     severity: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    fields: Optional[str] = Query(None),  # Comma-separated alert fields to return
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get alerts for a specific facility with optional filtering"""
+    """
+    Get alerts for a specific facility with optional filtering, most recent first.
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    """
     if facility_id not in sample_facilities:
         raise HTTPException(status_code=404, detail="Facility not found")
     
-    # Generate sample alerts
-    alerts = generate_sample_alerts(facility_id, 20)  # Generate more alerts for filtering
+    try:
+        projection = parse_fields(fields, MonitoringAlert.model_fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Apply filters if provided
-    if severity:
-        alerts = [a for a in alerts if a.severity == severity]
+    before = None
+    if cursor:
+        try:
+            before = decode_cursor(cursor, (int, str))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     
-    if status:
-        alerts = [a for a in alerts if a.status == status]
+    # Filters and paging are answered from the alert store's (facility, status) and (facility, severity) indexes
+    alerts = alert_store.query(
+        facility_id,
+        status=status,
+        severity=severity,
+        limit=limit + 1,
+        start_us=to_epoch_us(start) if start else None,
+        end_us=to_epoch_us(end) if end else None,
+        before=before
+    )
     
-    return alerts
+    headers = None
+    if len(alerts) > limit:
+        alerts = alerts[:limit]
+        headers = {"X-Next-Cursor": encode_cursor(*alert_store.sort_key(alerts[-1].alert_id))}
+    
+    # Stored alerts were validated when created; dump them without re-validating
+    include = set(projection) if projection else None
+    return json_response([alert.model_dump(include=include) for alert in alerts], headers)
 
 @router.post("/alerts/{alert_id}/acknowledge", response_model=MonitoringAlert)
 async def acknowledge_alert(
@@ -356,28 +1373,18 @@ async def acknowledge_alert(
     current_user: dict = Depends(get_current_user)
 ):
     """Acknowledge an alert"""
-    # Extract facility ID from alert ID
-    facility_id = f"FAC{alert_id[3:6]}"
+    alert = alert_store.get(alert_id)
+    if alert is None:
+        raise HTTPException(status_code=404, detail="Alert not found")
     
-    if facility_id not in sample_facilities:
-        raise HTTPException(status_code=404, detail="Facility not found")
+    if alert.status != "Active":
+        raise HTTPException(status_code=400, detail="Alert is not active")
     
-    # Generate sample alerts
-    alerts = generate_sample_alerts(facility_id)
+    # Update alert status
+    alert = alert_store.transition(alert_id, "Acknowledged", acknowledged_by=current_username(current_user))
+    publish_alert(alert, "alert_updated")
     
-    # Find the requested alert
-    for alert in alerts:
-        if alert.alert_id == alert_id:
-            if alert.status != "Active":
-                raise HTTPException(status_code=400, detail="Alert is not active")
-            
-            # Update alert status
-            alert.status = "Acknowledged"
-            alert.acknowledged_by = f"{current_user['username']}"
-            
-            return alert
-    
-    raise HTTPException(status_code=404, detail="Alert not found")
+    return alert
 
 @router.post("/alerts/{alert_id}/resolve", response_model=MonitoringAlert)
 async def resolve_alert(
@@ -386,26 +1393,20 @@ async def resolve_alert(
     current_user: dict = Depends(get_current_user)
 ):
     """Resolve an alert with resolution notes"""
-    # Extract facility ID from alert ID
-    facility_id = f"FAC{alert_id[3:6]}"
-    
-    if facility_id not in sample_facilities:
-        raise HTTPException(status_code=404, detail="Facility not found")
+    alert = alert_store.get(alert_id)
+    if alert is None:
+        raise HTTPException(status_code=404, detail="Alert not found")
     
-    # Generate sample alerts
-    alerts = generate_sample_alerts(facility_id)
+    if alert.status == "Resolved":
+        raise HTTPException(status_code=400, detail="Alert is already resolved")
     
-    # Find the requested alert
-    for alert in alerts:
-        if alert.alert_id == alert_id:
-            if alert.status == "Resolved":
-                raise HTTPException(status_code=400, detail="Alert is already resolved")
-            
-            # Update alert status
-            alert.status = "Resolved"
-            alert.resolved_by = f"{current_user['username']}"
-            alert.resolution_notes = notes
-            
-            return alert
+    # Update alert status
+    alert = alert_store.transition(
+        alert_id,
+        "Resolved",
+        resolved_by=current_username(current_user),
+        resolution_notes=notes
+    )
+    publish_alert(alert, "alert_updated")
     
-    raise HTTPException(status_code=404, detail="Alert not found")
+    return alert
@@ -0,0 +1,521 @@
+"""
+Append-only segment log for monitoring data.
+
+Segments are files named wal-00000001.log, wal-00000002.log, ... in one directory.
+Each record is
+    u32 payload length
+    u32 CRC-32 of the type byte and payload
+    u8  record type
+    payload
+with all integers little-endian. Record payloads:
+    facility  JSON {"facility_id", "name"}
+    sensor    JSON sensor metadata as registered
+    readings  u16 sensor_id length, sensor_id (UTF-8), u32 count n,
+              i64[n] epoch microseconds, f64[n] values, u8[n] status codes
+    alert     JSON alert state after it was added or changed; the last record for an ID wins
+    statuses  same layout as readings: new statuses from a reclassification, applied to the
+              sensor's earlier logged readings with the same timestamp and value
+    rollups   u16 sensor_id length, sensor_id (UTF-8), i64 watermark, then per tier (minute,
+              hour, day) u32 count n and each rollup column as n little-endian values
+    checkpoint JSON {"created"}; only ever the first record of a segment
+
+Recovery memory-maps each segment, stops a segment at the first record that is
+truncated or fails its checksum (a torn write from a crash) and truncates it there.
+A new segment is started every time the log is opened.
+
+A checkpoint writes a snapshot of the stores (only the readings and rollups retention
+kept) to a temporary file, renames it into place as a segment starting with a checkpoint
+record, and deletes the segments before it. Recovery starts at the newest checkpoint
+segment, so a crash part way through leaves either the old segments or the new one.
+"""
+from typing import Callable, ContextManager, Dict, Iterator, List, Optional, Any, Tuple
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+import numpy as np
+from .rollups import ROLLUP_COLUMNS, TIERS
+
+RECORD_FACILITY = 1
+RECORD_SENSOR = 2
+RECORD_READINGS = 3
+RECORD_ALERT = 4
+RECORD_STATUSES = 5
+RECORD_ROLLUPS = 6
+RECORD_CHECKPOINT = 7
+
+HEADER = struct.Struct("<IIB")
+FSYNC_MODES = ("batch", "periodic")
+
+
+# Rollup buckets of one sensor: watermark, then each tier's columns
+Rollups = Tuple[int, Dict[str, Dict[str, np.ndarray]]]
+
+
+class RecoveredState:
+    """Latest facilities, sensors and alerts, and every sensor's readings and rollups, read back from the log"""
+
+    def __init__(self):
+        self.facilities: Dict[str, Dict[str, Any]] = {}
+        self.sensors: Dict[str, Dict[str, Any]] = {}
+        self.readings: Dict[str, List[Tuple[np.ndarray, np.ndarray, np.ndarray]]] = {}
+        self.rollups: Dict[str, Tuple[Rollups, int]] = {}  # sensor -> (rollups, reading batches logged before them)
+        self.alerts: Dict[str, Dict[str, Any]] = {}
+        self.records = 0
+        self.bytes = 0
+        self.segments = 0
+        self.discarded_segments = 0
+        self.truncated_bytes = 0
+        self.elapsed_seconds = 0.0
+
+    def sensor_readings(self, sensor_id: str, start: int = 0, stop: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """A sensor's logged reading batches start to stop (default: all), concatenated in log order"""
+        batches = self.readings.get(sensor_id, [])[start:stop]
+        if len(batches) == 1:
+            return batches[0]
+        return (
+            np.concatenate([batch[0] for batch in batches]) if batches else np.empty(0, dtype=np.int64),
+            np.concatenate([batch[1] for batch in batches]) if batches else np.empty(0),
+            np.concatenate([batch[2] for batch in batches]) if batches else np.empty(0, dtype=np.uint8)
+        )
+
+    def apply_statuses(self, sensor_id: str, timestamps: np.ndarray, values: np.ndarray, statuses: np.ndarray):
+        """Give the readings recovered so far the reclassified status of the same timestamp and value"""
+        changes = dict(zip(zip(timestamps.tolist(), values.tolist()), statuses.tolist()))
+        for batch_timestamps, batch_values, batch_statuses in self.readings.get(sensor_id, []):
+            for i in np.flatnonzero(np.isin(batch_timestamps, timestamps)).tolist():
+                status = changes.get((int(batch_timestamps[i]), float(batch_values[i])))
+                if status is not None:
+                    batch_statuses[i] = status
+
+
+def encode_readings(sensor_id: str, timestamps: np.ndarray, values: np.ndarray, statuses: np.ndarray) -> bytes:
+    raw_id = sensor_id.encode("utf-8")
+    return b"".join((
+        struct.pack("<H", len(raw_id)), raw_id, struct.pack("<I", len(timestamps)),
+        np.asarray(timestamps, dtype="<i8").tobytes(),
+        np.asarray(values, dtype="<f8").tobytes(),
+        np.asarray(statuses, dtype=np.uint8).tobytes()
+    ))
+
+
+def decode_readings(payload) -> Tuple[str, np.ndarray, np.ndarray, np.ndarray]:
+    """Decode a readings payload; the arrays are copies, so the segment can be unmapped afterwards"""
+    length, = struct.unpack_from("<H", payload, 0)
+    sensor_id = bytes(payload[2:2 + length]).decode("utf-8")
+    offset = 2 + length
+    count, = struct.unpack_from("<I", payload, offset)
+    offset += 4
+    timestamps = np.frombuffer(payload, dtype="<i8", count=count, offset=offset).astype(np.int64)
+    offset += 8 * count
+    values = np.frombuffer(payload, dtype="<f8", count=count, offset=offset).astype(np.float64)
+    offset += 8 * count
+    statuses = np.frombuffer(payload, dtype=np.uint8, count=count, offset=offset).copy()
+    return sensor_id, timestamps, values, statuses
+
+
+def encode_rollups(sensor_id: str, rollups: Rollups) -> bytes:
+    raw_id = sensor_id.encode("utf-8")
+    watermark, tiers = rollups
+    parts = [struct.pack("<H", len(raw_id)), raw_id, struct.pack("<q", watermark)]
+    for tier, _ in TIERS:
+        columns = tiers[tier]
+        parts.append(struct.pack("<I", len(columns["timestamp"])))
+        parts.extend(np.asarray(columns[name], dtype=np.dtype(dtype).newbyteorder("<")).tobytes() for name, dtype in ROLLUP_COLUMNS.items())
+    return b"".join(parts)
+
+
+def decode_rollups(payload) -> Tuple[str, Rollups]:
+    """Decode a rollups payload into copies, like decode_readings"""
+    length, = struct.unpack_from("<H", payload, 0)
+    sensor_id = bytes(payload[2:2 + length]).decode("utf-8")
+    offset = 2 + length
+    watermark, = struct.unpack_from("<q", payload, offset)
+    offset += 8
+    tiers = {}
+    for tier, _ in TIERS:
+        count, = struct.unpack_from("<I", payload, offset)
+        offset += 4
+        columns = {}
+        for name, dtype in ROLLUP_COLUMNS.items():
+            stored = np.dtype(dtype).newbyteorder("<")
+            columns[name] = np.frombuffer(payload, dtype=stored, count=count, offset=offset).astype(dtype)
+            offset += stored.itemsize * count
+        tiers[tier] = columns
+    return sensor_id, (watermark, tiers)
+
+
+def encode_record(record_type: int, payload: bytes) -> bytes:
+    checksum = zlib.crc32(payload, zlib.crc32(bytes((record_type,))))
+    return HEADER.pack(len(payload), checksum, record_type) + payload
+
+
+class LogWriter:
+    """Typed appends over _append, shared by the live log and checkpoint files"""
+
+    def _append(self, record_type: int, payload: bytes) -> int:
+        raise NotImplementedError
+
+    def append_facility(self, facility_id: str, facility: Dict[str, Any]) -> int:
+        return self._append(RECORD_FACILITY, json.dumps(dict(facility, facility_id=facility_id)).encode("utf-8"))
+
+    def append_sensor(self, sensor: Dict[str, Any]) -> int:
+        return self._append(RECORD_SENSOR, json.dumps(sensor).encode("utf-8"))
+
+    def append_readings(self, sensor_id: str, timestamps: np.ndarray, values: np.ndarray, statuses: np.ndarray) -> int:
+        return self._append(RECORD_READINGS, encode_readings(sensor_id, timestamps, values, statuses))
+
+    def append_statuses(self, sensor_id: str, timestamps: np.ndarray, values: np.ndarray, statuses: np.ndarray) -> int:
+        return self._append(RECORD_STATUSES, encode_readings(sensor_id, timestamps, values, statuses))
+
+    def append_rollups(self, sensor_id: str, rollups: Rollups) -> int:
+        return self._append(RECORD_ROLLUPS, encode_rollups(sensor_id, rollups))
+
+    def append_alert(self, alert: Dict[str, Any]) -> int:
+        return self._append(RECORD_ALERT, json.dumps(alert).encode("utf-8"))
+
+
+class CheckpointFile(LogWriter):
+    """A checkpoint segment, written to a temporary file and renamed into place once complete"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path + ".tmp", "wb")
+        self.size = 0
+        self._append(RECORD_CHECKPOINT, json.dumps({"created": datetime.now().isoformat()}).encode("utf-8"))
+
+    def _append(self, record_type: int, payload: bytes) -> int:
+        record = encode_record(record_type, payload)
+        self.file.write(record)
+        self.size += len(record)
+        return self.size
+
+    def commit(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.path + ".tmp")
+
+
+class MonitoringLog(LogWriter):
+    """
+    Durable log of facilities, sensors, readings and alert changes.
+    Appends go straight to the segment file; fsync is group-committed, so one fsync covers
+    every record written before it. In "batch" mode each append (or each group_commit block)
+    returns once its records are on disk; in "periodic" mode a background thread fsyncs every
+    fsync_interval seconds, so a crash can lose up to that much acknowledged data.
+    checkpoint() bounds the log: it is due once the log has grown past twice the last
+    checkpoint (and past one segment).
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        fsync_mode: str = "batch",
+        fsync_interval: float = 0.1,
+        segment_bytes: int = 64 * 1024 * 1024
+    ):
+        if fsync_mode not in FSYNC_MODES:
+            raise ValueError(f"fsync mode must be one of {', '.join(FSYNC_MODES)}")
+        self.directory = directory
+        self.fsync_mode = fsync_mode
+        self.fsync_interval = fsync_interval
+        self.segment_bytes = segment_bytes
+        self.lock = threading.Lock()        # Guards the file position and segment switches
+        self.sync_lock = threading.Lock()   # One fsync at a time; waiters piggyback on it
+        self.fd: Optional[int] = None
+        self.segment = 0
+        self.segment_size = 0
+        self.retired_fds: List[int] = []
+        self.written_lsn = 0   # Bytes appended since open
+        self.durable_lsn = 0   # Bytes known to be on disk
+        self.records = 0
+        self.fsyncs = 0
+        self.log_bytes = 0          # Bytes in the segments on disk
+        self.checkpoint_bytes = 0   # Size of the last checkpoint
+        self.checkpoints = 0
+        self.checkpoint_lock = threading.Lock()
+        self.closed = threading.Event()
+        self.flusher: Optional[threading.Thread] = None
+        self.local = threading.local()  # Per-thread group commit depth and highest pending LSN
+
+    @classmethod
+    def from_env(cls, environ: Dict[str, str]) -> Optional["MonitoringLog"]:
+        """Configure from TAILINGSIQ_WAL_* variables, or None when TAILINGSIQ_WAL_DIR is unset"""
+        directory = environ.get("TAILINGSIQ_WAL_DIR")
+        if not directory:
+            return None
+        return cls(
+            directory,
+            fsync_mode=environ.get("TAILINGSIQ_WAL_FSYNC", "batch"),
+            fsync_interval=float(environ.get("TAILINGSIQ_WAL_FSYNC_INTERVAL_MS", "100")) / 1000,
+            segment_bytes=int(float(environ.get("TAILINGSIQ_WAL_SEGMENT_MB", "64")) * 1024 * 1024)
+        )
+
+    def segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"wal-{segment:08d}.log")
+
+    def segments(self) -> List[int]:
+        """Segment numbers present on disk, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith("wal-") and name.endswith(".log") and name[4:-4].isdigit():
+                numbers.append(int(name[4:-4]))
+        return sorted(numbers)
+
+    def starts_checkpoint(self, segment: int) -> bool:
+        with open(self.segment_path(segment), "rb") as f:
+            header = f.read(HEADER.size)
+        return len(header) == HEADER.size and HEADER.unpack(header)[2] == RECORD_CHECKPOINT
+
+    def recover(self) -> RecoveredState:
+        """
+        Read the segments back from the newest checkpoint on, truncating any torn tail, before
+        the log is opened for writing. Segments before that checkpoint and unfinished checkpoint
+        files are deleted.
+        """
+        started = time.perf_counter()
+        state = RecoveredState()
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.startswith("wal-") and name.endswith(".log.tmp"):
+                    os.remove(os.path.join(self.directory, name))
+        segments = self.segments()
+        first = next((i for i in reversed(range(len(segments))) if self.starts_checkpoint(segments[i])), 0)
+        for segment in segments[:first]:
+            os.remove(self.segment_path(segment))
+            state.discarded_segments += 1
+
+        for segment in segments[first:]:
+            path = self.segment_path(segment)
+            size = os.path.getsize(path)
+            if size == 0:
+                # Nothing was appended before the process stopped
+                os.remove(path)
+                continue
+            state.segments += 1
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                valid = self._replay_segment(data, size, state)
+            if valid < size:
+                state.truncated_bytes += size - valid
+                with open(path, "r+b") as f:
+                    f.truncate(valid)
+            state.bytes += valid
+        self.log_bytes = state.bytes
+        state.elapsed_seconds = time.perf_counter() - started
+        return state
+
+    def _replay_segment(self, data: mmap.mmap, size: int, state: RecoveredState) -> int:
+        view = memoryview(data)
+        offset = 0
+        try:
+            while offset + HEADER.size <= size:
+                length, checksum, record_type = HEADER.unpack_from(view, offset)
+                end = offset + HEADER.size + length
+                if end > size:
+                    break
+                payload = view[offset + HEADER.size:end]
+                if zlib.crc32(payload, zlib.crc32(bytes((record_type,)))) != checksum:
+                    break
+
+                if record_type == RECORD_READINGS:
+                    sensor_id, timestamps, values, statuses = decode_readings(payload)
+                    state.readings.setdefault(sensor_id, []).append((timestamps, values, statuses))
+                elif record_type == RECORD_STATUSES:
+                    state.apply_statuses(*decode_readings(payload))
+                elif record_type == RECORD_ROLLUPS:
+                    sensor_id, rollups = decode_rollups(payload)
+                    state.rollups[sensor_id] = (rollups, len(state.readings.get(sensor_id, [])))
+                elif record_type == RECORD_SENSOR:
+                    sensor = json.loads(bytes(payload))
+                    state.sensors[sensor["sensor_id"]] = sensor
+                elif record_type == RECORD_ALERT:
+                    alert = json.loads(bytes(payload))
+                    state.alerts[alert["alert_id"]] = alert
+                elif record_type == RECORD_FACILITY:
+                    facility = json.loads(bytes(payload))
+                    state.facilities[facility["facility_id"]] = facility
+                state.records += 1
+                offset = end
+        finally:
+            view.release()
+        return offset
+
+    def open(self):
+        """Start a new segment for appends and, in periodic mode, the fsync thread"""
+        os.makedirs(self.directory, exist_ok=True)
+        existing = self.segments()
+        self._open_segment(existing[-1] + 1 if existing else 1)
+        if self.fsync_mode == "periodic":
+            self.flusher = threading.Thread(target=self._flush_periodically, name="monitoring-log-fsync", daemon=True)
+            self.flusher.start()
+
+    def _open_segment(self, segment: int):
+        self.segment = segment
+        self.segment_size = 0
+        self.fd = os.open(self.segment_path(segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._sync_directory()
+
+    def _sync_directory(self):
+        """Make new or renamed files' directory entries durable too"""
+        directory_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(directory_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(directory_fd)
+
+    def _append(self, record_type: int, payload: bytes) -> int:
+        record = encode_record(record_type, payload)
+        with self.lock:
+            if self.fd is None:
+                raise RuntimeError("Monitoring log is not open")
+            if self.segment_size and self.segment_size + len(record) > self.segment_bytes:
+                # Rotate; the old segment is fsynced and closed by the next sync
+                self.retired_fds.append(self.fd)
+                self._open_segment(self.segment + 1)
+            os.write(self.fd, record)
+            self.segment_size += len(record)
+            self.log_bytes += len(record)
+            self.written_lsn += len(record)
+            self.records += 1
+            lsn = self.written_lsn
+        if self.fsync_mode == "batch":
+            if getattr(self.local, "depth", 0):
+                self.local.pending = lsn
+            else:
+                self.sync(lsn)
+        return lsn
+
+    @contextmanager
+    def deferred(self) -> Iterator[None]:
+        """In batch mode, leave the fsync of this thread's appends inside the block to a later commit()"""
+        self.local.depth = getattr(self.local, "depth", 0) + 1
+        try:
+            yield
+        finally:
+            self.local.depth -= 1
+
+    def commit(self):
+        """fsync this thread's deferred appends, unless it is still inside a group_commit block"""
+        pending = getattr(self.local, "pending", 0)
+        if not getattr(self.local, "depth", 0) and pending:
+            self.local.pending = 0
+            self.sync(pending)
+
+    @contextmanager
+    def group_commit(self) -> Iterator[None]:
+        """In batch mode, defer this thread's fsyncs to one covering every append made inside the block"""
+        try:
+            with self.deferred():
+                yield
+        finally:
+            self.commit()
+
+    def sync(self, lsn: Optional[int] = None):
+        """Make everything up to lsn (default: everything written) durable"""
+        if lsn is None:
+            lsn = self.written_lsn
+        if self.durable_lsn >= lsn:
+            return
+        with self.sync_lock:
+            # Another caller's fsync may already have covered this record
+            if self.durable_lsn >= lsn:
+                return
+            with self.lock:
+                target = self.written_lsn
+                fd = self.fd
+                retired, self.retired_fds = self.retired_fds, []
+            for old_fd in retired:
+                os.fsync(old_fd)
+                os.close(old_fd)
+            if fd is not None:
+                os.fsync(fd)
+            self.durable_lsn = target
+            self.fsyncs += 1
+
+    def _flush_periodically(self):
+        while not self.closed.wait(self.fsync_interval):
+            self.sync()
+
+    def checkpoint_due(self) -> bool:
+        return self.log_bytes > max(2 * self.checkpoint_bytes, self.segment_bytes)
+
+    def checkpoint(self, capture: Callable[[], Callable[[LogWriter], None]], store_lock: ContextManager) -> int:
+        """
+        Replace the log with a snapshot. Under store_lock, appends move to a new segment and
+        capture() takes the snapshot, returning the function that writes its records; holding
+        the lock that covers appends makes every logged change either part of the snapshot or
+        appended after it. The snapshot goes into the segment before the new one. Returns its size.
+        """
+        with self.checkpoint_lock:
+            with store_lock:
+                with self.lock:
+                    if self.fd is None:
+                        raise RuntimeError("Monitoring log is not open")
+                    self.retired_fds.append(self.fd)
+                    segment = self.segment + 1
+                    self._open_segment(segment + 1)
+                    appended = self.log_bytes
+                write = capture()
+
+            checkpoint = CheckpointFile(self.segment_path(segment))
+            try:
+                write(checkpoint)
+                checkpoint.commit()
+            except BaseException:
+                checkpoint.abort()
+                raise
+            self._sync_directory()
+
+            # Close the retired segments, then drop everything before the checkpoint
+            self.sync()
+            for old in self.segments():
+                if old < segment:
+                    os.remove(self.segment_path(old))
+            with self.lock:
+                self.log_bytes += checkpoint.size - appended
+            self.checkpoint_bytes = checkpoint.size
+            self.checkpoints += 1
+            return checkpoint.size
+
+    def close(self):
+        """fsync everything written and close the current segment"""
+        self.closed.set()
+        if self.flusher is not None:
+            self.flusher.join()
+        if self.fd is None:
+            return
+        self.sync()
+        with self.lock:
+            os.close(self.fd)
+            self.fd = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "fsync_mode": self.fsync_mode,
+            "fsync_interval_seconds": self.fsync_interval if self.fsync_mode == "periodic" else None,
+            "segment": self.segment,
+            "segments": len(self.segments()),
+            "segment_bytes": self.segment_bytes,
+            "records_written": self.records,
+            "bytes_written": self.written_lsn,
+            "bytes_durable": self.durable_lsn,
+            "fsyncs": self.fsyncs,
+            "log_bytes": self.log_bytes,
+            "checkpoints": self.checkpoints,
+            "last_checkpoint_bytes": self.checkpoint_bytes
+        }
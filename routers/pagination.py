@@ -0,0 +1,24 @@
+from typing import Any, Tuple
+import base64
+import json
+
+
+def encode_cursor(*key: Any) -> str:
+    """Encode a keyset position as an opaque URL-safe cursor"""
+    raw = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Tuple[type, ...]) -> Tuple[Any, ...]:
+    """Decode a cursor produced by encode_cursor whose elements have the given types, raising ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list) or len(key) != len(types):
+        raise ValueError("Invalid cursor")
+    # bool is an int to isinstance, but never a valid cursor element
+    if any(isinstance(element, bool) or not isinstance(element, expected) for element, expected in zip(key, types)):
+        raise ValueError("Invalid cursor")
+    return tuple(key)
@@ -0,0 +1,47 @@
+from typing import Dict, Iterable, List, Optional, Any
+import json
+from fastapi.responses import Response
+from .broadcast import json_default
+from .sensor_store import SeriesView, READING_STATUSES, epoch_us_to_datetimes
+
+# Response shapes for sensor payloads
+SENSOR_SHAPES = ("full", "summary", "columnar")
+
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> Optional[List[str]]:
+    """Parse a comma-separated fields= projection, raising ValueError for unknown fields"""
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def project(item: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """Keep only the requested top-level fields of a payload"""
+    if fields is None:
+        return item
+    return {field: item[field] for field in fields if field in item}
+
+
+def serialize_columns(view: SeriesView) -> Dict[str, List[Any]]:
+    """
+    Readings as parallel timestamp/value/status arrays, converted column by column.
+    Timestamps stay datetimes, so they serialize exactly like serialize_readings' do.
+    """
+    return {
+        "timestamps": epoch_us_to_datetimes(view.timestamps),
+        "values": view.values.tolist(),
+        "statuses": [READING_STATUSES[code] for code in view.statuses.tolist()]
+    }
+
+
+def json_response(content: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Serialize a payload we built ourselves straight to JSON.
+    Returning a Response skips FastAPI's response_model validation of every nested object.
+    """
+    body = json.dumps(content, default=json_default, ensure_ascii=False, separators=(",", ":"))
+    return Response(body, media_type="application/json", headers=headers)
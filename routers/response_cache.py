@@ -0,0 +1,76 @@
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Any, Tuple
+import asyncio
+import time
+
+
+class TTLCache:
+    """
+    Short-lived cache for computed responses.
+    Concurrent misses for the same key share one computation instead of each running it.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self.pending: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a fresh cached value, or None"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= time.monotonic():
+            del self.entries[key]
+            return None
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        if len(self.entries) >= self.max_entries and key not in self.entries:
+            # Drop expired entries first, then the oldest
+            now = time.monotonic()
+            for stale in [k for k, (expires, _) in self.entries.items() if expires <= now]:
+                del self.entries[stale]
+            if len(self.entries) >= self.max_entries:
+                del self.entries[next(iter(self.entries))]
+        self.entries[key] = (time.monotonic() + self.ttl_seconds, value)
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return (value, cached); computes at most once per key at a time"""
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value, True
+
+        pending = self.pending.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending), True
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            self.pending.pop(key, None)
+        self.put(key, value)
+        future.set_result(value)
+        return value, False
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses, "ttl_seconds": self.ttl_seconds}
@@ -1,8 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Body, Header, Query
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime, timezone
+from email.utils import format_datetime
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
 from .auth import get_current_user
+from .broadcast import json_default
+from .risk_scoring import RiskEngine, MAX_SCENARIOS
+from .risk_history import AssessmentHistory, FactorState
+from .risk_simulation import RiskSimulator, default_factor_correlations
+from .risk_signals import RiskSignalLink, signal_config_from_env
+from .monitoring import sensor_store, alert_store
 
 # Create router for Risk Assessment
 router = APIRouter(prefix="/api/risk-assessment", tags=["risk-assessment"])
@@ -13,12 +29,14 @@ class RiskFactor(BaseModel):
     name: str
     description: str
     category: str
-    impact_level: str  # Low, Medium, High, Critical
-    probability: str   # Low, Medium, High, Very High
-    risk_score: int    # Calculated score (1-25)
+    impact_level: str  # Negligible, Low, Medium, High, Critical
+    probability: str   # Very Low, Low, Medium, High, Very High
+    risk_score: int    # Impact x probability (1-25)
     mitigation_status: str  # Not Started, In Progress, Completed
     mitigation_actions: List[str]
     last_assessment: datetime
+    monitoring_probability: Optional[str] = None  # Set when live monitoring raises the probability used in risk_score
+    monitoring_alerts: List[str] = []  # Open alerts behind monitoring_probability
 
 class RiskAssessmentRequest(BaseModel):
     facility_id: str
@@ -34,6 +52,120 @@ class RiskAssessmentResponse(BaseModel):
     recommendations: List[str]
     last_updated: datetime
 
+class ScoringConfig(BaseModel):
+    aggregation: str = "max"  # max, mean or rms of the factor scores
+    category_thresholds: Dict[str, int] = {"Medium": 6, "High": 12, "Critical": 20}  # Lowest score in each category
+    priority_threshold: int = 12  # Unmitigated factors scoring this high get their own recommendation
+
+class BatchRiskAssessmentRequest(BaseModel):
+    facility_ids: Optional[List[str]] = None  # Defaults to every facility
+    risk_categories: Optional[List[str]] = None  # Only facilities in these categories
+    min_score: Optional[int] = None  # Only facilities scoring at least this
+
+class FactorDistribution(BaseModel):
+    distribution: str = "triangular"  # triangular, uniform or fixed, on the 1-5 matrix scale
+    low: Optional[float] = None  # Unset values default to one level either side of the assessed level
+    mode: Optional[float] = None
+    high: Optional[float] = None
+
+class FactorSimulation(BaseModel):
+    impact: Optional[FactorDistribution] = None
+    probability: Optional[FactorDistribution] = None
+
+class FactorCorrelation(BaseModel):
+    factor_a: str
+    factor_b: str
+    correlation: float  # Between the two factors' likelihoods
+
+class RiskSimulationRequest(BaseModel):
+    trials: int = Field(100_000, ge=1000, le=10_000_000)
+    seed: Optional[int] = None  # Random when unset; returned for reproducing the run
+    factors: Dict[str, FactorSimulation] = {}  # Distribution overrides by factor id
+    correlations: Optional[List[FactorCorrelation]] = None  # Replaces the default correlations
+    percentiles: List[float] = [5, 10, 50, 90, 95, 99]
+
+class FactorContribution(BaseModel):
+    id: str
+    name: str
+    mean_score: float
+    percentiles: Dict[str, float]
+    driver_share: float  # Share of trials where this factor had the highest score
+    correlation: float  # Correlation of the factor's score with the facility score
+
+class RiskSimulationResponse(BaseModel):
+    facility_id: str
+    trials: int
+    seed: int
+    aggregation: str
+    mean: float
+    percentiles: Dict[str, float]  # Facility score percentiles
+    exceedance: Dict[str, float]  # Probability of reaching each category
+    factors: List[FactorContribution]  # Largest contributors first
+    elapsed_seconds: float
+
+class ScenarioFactorOverride(BaseModel):
+    impact_level: Optional[str] = None
+    probability: Optional[str] = None
+    mitigation_status: Optional[str] = None  # Completed factors no longer count as open priorities
+
+class RiskScenario(BaseModel):
+    name: Optional[str] = None
+    factors: Dict[str, ScenarioFactorOverride]  # Overrides by factor id; other factors keep their current values
+
+class RiskScenarioRequest(BaseModel):
+    scenarios: List[RiskScenario] = Field(..., min_length=1, max_length=MAX_SCENARIOS)
+    include_monitoring: bool = True  # Keep probabilities raised by live monitoring as floors
+
+class ScenarioBaseline(BaseModel):
+    overall_risk_score: int
+    risk_category: str
+    open_priority_factors: int  # Unmitigated factors at or above the priority threshold
+
+class ScenarioResult(BaseModel):
+    index: int  # Position in the request
+    name: Optional[str] = None
+    rank: int  # 1 is the largest score reduction
+    overall_risk_score: int
+    risk_category: str
+    score_delta: int  # Against the baseline
+    open_priority_factors: int
+    factor_deltas: Dict[str, int]  # Factors whose score changed
+
+class RiskScenarioResponse(BaseModel):
+    facility_id: str
+    baseline: ScenarioBaseline
+    scenarios: List[ScenarioResult]  # Ranked
+    elapsed_seconds: float
+
+class RiskAssessmentVersionSummary(BaseModel):
+    facility_id: str
+    version: int
+    assessment_date: datetime
+    recorded_at: datetime
+    recorded_by: str
+    overall_risk_score: int
+    risk_category: str
+    changed_factors: List[str]  # Factors added or changed by this version
+
+class RiskAssessmentVersion(BaseModel):
+    facility_id: str
+    facility_name: str
+    version: int
+    assessment_date: datetime
+    recorded_at: datetime
+    recorded_by: str
+    overall_risk_score: int
+    risk_category: str
+    factors: List[RiskFactor]  # As assessed at the time, with the scores of the time
+
+class RiskAssessmentDiff(BaseModel):
+    facility_id: str
+    from_version: int
+    to_version: int
+    overall_risk_score: Dict[str, int]  # from, to
+    risk_category: Dict[str, str]  # from, to
+    factors: Dict[str, Any]  # Factor id -> {field: {from, to}}, or {from, to} for added/removed factors
+
 # Sample risk assessment data
 sample_risk_factors = [
     {
@@ -43,7 +175,6 @@ sample_risk_factors = [
         "category": "Structural",
         "impact_level": "Critical",
         "probability": "Low",
-        "risk_score": 15,
         "mitigation_status": "In Progress",
         "mitigation_actions": [
             "Regular structural inspections",
@@ -59,7 +190,6 @@ sample_risk_factors = [
         "category": "Hydrological",
         "impact_level": "High",
         "probability": "Medium",
-        "risk_score": 12,
         "mitigation_status": "In Progress",
         "mitigation_actions": [
             "Installation of additional piezometers",
@@ -75,7 +205,6 @@ sample_risk_factors = [
         "category": "Environmental",
         "impact_level": "High",
         "probability": "Medium",
-        "risk_score": 12,
         "mitigation_status": "In Progress",
         "mitigation_actions": [
             "Increase freeboard capacity",
@@ -91,7 +220,6 @@ sample_risk_factors = [
         "category": "Geological",
         "impact_level": "High",
         "probability": "Low",
-        "risk_score": 8,
         "mitigation_status": "Completed",
         "mitigation_actions": [
             "Seismic hazard assessment",
@@ -107,7 +235,6 @@ sample_risk_factors = [
         "category": "Operational",
         "impact_level": "Medium",
         "probability": "Medium",
-        "risk_score": 9,
         "mitigation_status": "In Progress",
         "mitigation_actions": [
             "Regular water balance assessments",
@@ -120,14 +247,34 @@ sample_risk_factors = [
 
 # Sample facility data
 sample_facilities = {
-    "FAC001": {"name": "North Basin Facility", "risk_score": 12, "risk_category": "High"},
-    "FAC002": {"name": "South Basin Facility", "risk_score": 8, "risk_category": "Medium"},
-    "FAC003": {"name": "East Basin Facility", "risk_score": 15, "risk_category": "High"},
-    "FAC004": {"name": "West Basin Facility", "risk_score": 5, "risk_category": "Low"}
+    "FAC001": {"name": "North Basin Facility"},
+    "FAC002": {"name": "South Basin Facility"},
+    "FAC003": {"name": "East Basin Facility"},
+    "FAC004": {"name": "West Basin Facility"}
+}
+
+# Where each facility's assessment differs from the sample factors: factor id -> (impact_level, probability)
+sample_facility_levels = {
+    "FAC001": {},
+    "FAC002": {"RF001": ("Critical", "Very Low"), "RF002": ("High", "Low"), "RF003": ("High", "Low"), "RF005": ("Medium", "Low")},
+    "FAC003": {"RF001": ("Critical", "Medium")},
+    "FAC004": {
+        "RF001": ("Critical", "Very Low"),
+        "RF002": ("Low", "Low"),
+        "RF003": ("Medium", "Very Low"),
+        "RF004": ("High", "Very Low"),
+        "RF005": ("Low", "Low")
+    }
 }
 
 # Sample recommendations
 sample_recommendations = {
+    "Critical": [
+        "Notify the engineer of record and escalate to the accountable executive",
+        "Implement interim risk reduction measures immediately",
+        "Review emergency preparedness and response plans with downstream stakeholders",
+        "Commission an independent dam safety review"
+    ],
     "High": [
         "Conduct comprehensive third-party review of dam design and construction",
         "Increase monitoring frequency for critical parameters",
@@ -148,45 +295,206 @@ sample_recommendations = {
     ]
 }
 
+# Immutable assessment versions per facility, persisted to TAILINGSIQ_RISK_HISTORY_FILE when it is set
+risk_history = AssessmentHistory(os.environ.get("TAILINGSIQ_RISK_HISTORY_FILE"))
+
+# Each facility's factors: its latest recorded version, or the sample factors at its sample levels
+initial_risk_factors = {}
+for sample_facility_id, levels in sample_facility_levels.items():
+    recorded = risk_history.latest_state(sample_facility_id)
+    initial_risk_factors[sample_facility_id] = list(recorded.values()) if recorded is not None else [
+        dict(factor, **dict(zip(("impact_level", "probability"), levels.get(factor["id"], ()))))
+        for factor in sample_risk_factors
+    ]
+
+# Risk engine scoring every facility's factors; results are cached per facility
+risk_engine = RiskEngine(sample_facilities, initial_risk_factors, sample_recommendations)
+
+# Live alerts and readings raise factor probabilities; bursts of events are debounced per facility
+risk_signal_link = RiskSignalLink(risk_engine, sensor_store, alert_store, config=signal_config_from_env(os.environ))
+for sample_facility_id in sample_facilities:
+    risk_signal_link.mark_facility(sample_facility_id)
+risk_signal_link.flush()
+alert_store.add_listener(risk_signal_link.alert_changed)
+sensor_store.add_listener(risk_signal_link.readings_written)
+rescore_tasks: List[asyncio.Task] = []
+
+async def run_rescoring():
+    while True:
+        await asyncio.sleep(max(risk_signal_link.config["quiet_ms"] / 2000, 0.05))
+        facility_ids = risk_signal_link.due()
+        if not facility_ids:
+            continue
+        try:
+            await run_in_threadpool(risk_signal_link.flush, facility_ids)
+        except Exception:
+            logging.getLogger(__name__).exception("Risk re-scoring failed")
+
+def start_rescoring():
+    rescore_tasks.append(asyncio.get_running_loop().create_task(run_rescoring()))
+
+def stop_rescoring():
+    while rescore_tasks:
+        rescore_tasks.pop().cancel()
+
+router.add_event_handler("startup", start_rescoring)
+router.add_event_handler("shutdown", stop_rescoring)
+
+# Record the starting assessment of facilities that have no history yet
+for sample_facility_id in sample_facilities:
+    if risk_history.latest_state(sample_facility_id) is None:
+        initial_result, _ = risk_engine.assess(sample_facility_id)
+        risk_history.record(
+            sample_facility_id,
+            initial_result["factors"],
+            {"overall_risk_score": initial_result["overall_risk_score"], "risk_category": initial_result["risk_category"]},
+            datetime.now(),
+            "system"
+        )
+
+# Monte Carlo simulations; runs of more than one chunk use a process pool of TAILINGSIQ_RISK_SIM_WORKERS (default: CPU count)
+risk_simulator = RiskSimulator(int(os.environ.get("TAILINGSIQ_RISK_SIM_WORKERS", 0)) or None)
+router.add_event_handler("shutdown", risk_simulator.shutdown)
+
+# Name of the user making a request
+def current_username(current_user: dict) -> str:
+    return current_user.get("username") or current_user.get("user", "unknown")
+
+# Build a point-in-time response from a stored version
+def version_response(record: Dict[str, Any], state: FactorState) -> Dict[str, Any]:
+    return {
+        "facility_id": record["facility_id"],
+        "facility_name": sample_facilities[record["facility_id"]]["name"],
+        **{key: value for key, value in record.items() if key not in ("facility_id", "changes")},
+        "factors": list(state.values())
+    }
+
+# Build the response for a facility from its (possibly cached) result
+def assessment_response(facility_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "facility_id": facility_id,
+        "facility_name": sample_facilities[facility_id]["name"],
+        **result
+    }
+
+# Facilities per NDJSON chunk when streaming a batch
+BATCH_STREAM_CHUNK = 50
+
+# Serialized assessments with their ETags, reused for as long as the engine keeps returning the same cached result
+assessment_json: Dict[str, Tuple[Dict[str, Any], bytes, str]] = {}
+
+# Serialize a facility's assessment once per scoring; returns (body, strong ETag of the body)
+def serialize_assessment(facility_id: str, result: Dict[str, Any]) -> Tuple[bytes, str]:
+    entry = assessment_json.get(facility_id)
+    if entry is not None and entry[0] is result:
+        return entry[1], entry[2]
+    body = json.dumps(assessment_response(facility_id, result), default=json_default, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    assessment_json[facility_id] = (result, body, etag)
+    return body, etag
+
+# Check an If-None-Match header against an ETag (weak comparison, as RFC 9110 specifies for this header)
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+# Serve a facility's cached assessment bytes, or 304 when the client already has them
+def cached_assessment_response(facility_id: str, result: Dict[str, Any], if_none_match: Optional[str]) -> Response:
+    body, etag = serialize_assessment(facility_id, result)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(result["last_updated"].astimezone(timezone.utc), usegmt=True),
+        "Cache-Control": "no-cache"  # Clients may store it but must revalidate
+    }
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+# Facilities a batch request selects, with their results, in request (or portfolio) order
+def select_assessments(request: BatchRiskAssessmentRequest) -> List[Tuple[str, Dict[str, Any]]]:
+    facility_ids = request.facility_ids if request.facility_ids is not None else list(sample_facilities)
+    results = risk_engine.assess_many(dict.fromkeys(facility_ids))
+    return [
+        (facility_id, result)
+        for facility_id, result in results.items()
+        if (not request.risk_categories or result["risk_category"] in request.risk_categories)
+        and (request.min_score is None or result["overall_risk_score"] >= request.min_score)
+    ]
+
 @router.get("/facilities", response_model=List[Dict[str, Any]])
 async def get_facilities(current_user: dict = Depends(get_current_user)):
     """Get list of facilities with risk summary"""
     facilities_list = []
-    for facility_id, facility_data in sample_facilities.items():
+    for facility_id, result in risk_engine.portfolio().items():
         facilities_list.append({
             "id": facility_id,
-            "name": facility_data["name"],
-            "risk_score": facility_data["risk_score"],
-            "risk_category": facility_data["risk_category"]
+            "name": sample_facilities[facility_id]["name"],
+            "risk_score": result["overall_risk_score"],
+            "risk_category": result["risk_category"]
         })
     return facilities_list
 
+@router.get("/scoring", response_model=ScoringConfig)
+async def get_scoring_config(current_user: dict = Depends(get_current_user)):
+    """Get how factor scores are aggregated and categorised"""
+    return risk_engine.config
+
+@router.put("/scoring", response_model=ScoringConfig)
+async def update_scoring_config(
+    config: ScoringConfig = Body(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """Change the scoring config; every facility is rescored on its next read"""
+    try:
+        return risk_engine.set_config(config.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/monitoring-signals", response_model=Dict[str, Any])
+async def get_monitoring_signals(current_user: dict = Depends(get_current_user)):
+    """Monitoring signals raising factor probabilities, per facility, and re-scoring counts"""
+    return {**risk_signal_link.stats(), "signals": risk_engine.signals}
+
+@router.post("/batch", response_model=List[RiskAssessmentResponse])
+async def get_risk_assessments_batch(
+    request: BatchRiskAssessmentRequest = Body(...),
+    accept: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get many facilities' risk assessments in one request, selected by ID and/or filtered by category or score.
+    With Accept: application/x-ndjson the assessments stream one per line as they are serialized.
+    """
+    if request.facility_ids is not None:
+        unknown = [facility_id for facility_id in request.facility_ids if facility_id not in sample_facilities]
+        if unknown:
+            raise HTTPException(status_code=404, detail=f"Facilities not found: {', '.join(unknown)}")
+    
+    # Stale facilities are rescored together in one vectorised pass, off the event loop
+    selected = await run_in_threadpool(select_assessments, request)
+    
+    if accept and "application/x-ndjson" in accept:
+        async def assessment_lines():
+            for start in range(0, len(selected), BATCH_STREAM_CHUNK):
+                chunk = selected[start:start + BATCH_STREAM_CHUNK]
+                yield b"".join(serialize_assessment(facility_id, result)[0] + b"\n" for facility_id, result in chunk)
+        return StreamingResponse(assessment_lines(), media_type="application/x-ndjson")
+    
+    body = b"[" + b",".join(serialize_assessment(facility_id, result)[0] for facility_id, result in selected) + b"]"
+    return Response(body, media_type="application/json")
+
 @router.get("/{facility_id}", response_model=RiskAssessmentResponse)
 async def get_risk_assessment(
     facility_id: str,
+    if_none_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get detailed risk assessment for a specific facility"""
+    """Get detailed risk assessment for a specific facility; answers 304 when If-None-Match has the current ETag"""
     if facility_id not in sample_facilities:
         raise HTTPException(status_code=404, detail="Facility not found")
     
-    facility = sample_facilities[facility_id]
-    
-    # Convert sample risk factors to RiskFactor objects
-    risk_factors = [RiskFactor(**factor) for factor in sample_risk_factors]
-    
-    # Get recommendations based on risk category
-    recommendations = sample_recommendations.get(facility["risk_category"], [])
-    
-    return {
-        "facility_id": facility_id,
-        "facility_name": facility["name"],
-        "overall_risk_score": facility["risk_score"],
-        "risk_category": facility["risk_category"],
-        "factors": risk_factors,
-        "recommendations": recommendations,
-        "last_updated": datetime.now()
-    }
+    result, _ = risk_engine.assess(facility_id)
+    return cached_assessment_response(facility_id, result, if_none_match)
 
 @router.post("/{facility_id}", response_model=RiskAssessmentResponse)
 async def update_risk_assessment(
@@ -197,24 +505,155 @@ async def update_risk_assessment(
     """Update risk assessment for a specific facility"""
     if facility_id not in sample_facilities:
         raise HTTPException(status_code=404, detail="Facility not found")
+    if assessment.facility_id != facility_id:
+        raise HTTPException(status_code=400, detail="Facility ID does not match the URL")
+    
+    # Factors are matched by id and merged; their scores are always recalculated
+    assessment_date = assessment.assessment_date or datetime.now()
+    try:
+        risk_history.check_date(facility_id, assessment_date)
+        if assessment.factors:
+            risk_engine.update_factors(
+                facility_id,
+                assessment.factors,
+                assessment_date,
+                validate=lambda factor: RiskFactor(**factor)
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Every assessment becomes a new version, even when nothing changed
+    result, _ = risk_engine.assess(facility_id)
+    risk_history.record(
+        facility_id,
+        result["factors"],
+        {"overall_risk_score": result["overall_risk_score"], "risk_category": result["risk_category"]},
+        assessment_date,
+        current_username(current_user)
+    )
+    return cached_assessment_response(facility_id, result, None)
+
+@router.post("/{facility_id}/simulate", response_model=RiskSimulationResponse)
+async def simulate_risk(
+    facility_id: str,
+    simulation: RiskSimulationRequest = Body(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """Simulate a facility's risk score distribution by sampling its factors' impacts and probabilities"""
+    if facility_id not in sample_facilities:
+        raise HTTPException(status_code=404, detail="Facility not found")
+    if any(not 0 < percentile < 100 for percentile in simulation.percentiles):
+        raise HTTPException(status_code=400, detail="Percentiles must be between 0 and 100")
     
-    # In a real implementation, this would update the database
-    # For now, we'll just return the existing assessment
+    result, _ = risk_engine.assess(facility_id)
+    if not result["factors"]:
+        raise HTTPException(status_code=400, detail="Facility has no risk factors to simulate")
+    unknown = [factor_id for factor_id in simulation.factors if factor_id not in {f["id"] for f in result["factors"]}]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown factors: {', '.join(unknown)}")
     
-    facility = sample_facilities[facility_id]
+    correlations = default_factor_correlations if simulation.correlations is None else [
+        (c.factor_a, c.factor_b, c.correlation) for c in simulation.correlations
+    ]
+    seed = simulation.seed if simulation.seed is not None else random.SystemRandom().randrange(2 ** 32)
+    # Simulate around the probabilities actually scored, including any raised by monitoring
+    factors = [dict(factor, probability=factor["monitoring_probability"] or factor["probability"]) for factor in result["factors"]]
+    try:
+        simulated = await risk_simulator.run(
+            factors,
+            {factor_id: override.model_dump() for factor_id, override in simulation.factors.items()},
+            correlations,
+            risk_engine.config["aggregation"],
+            simulation.trials,
+            seed,
+            simulation.percentiles,
+            risk_engine.config["category_thresholds"]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Convert sample risk factors to RiskFactor objects
-    risk_factors = [RiskFactor(**factor) for factor in sample_risk_factors]
+    return {"facility_id": facility_id, **simulated}
+
+@router.post("/{facility_id}/scenarios", response_model=RiskScenarioResponse)
+async def evaluate_risk_scenarios(
+    facility_id: str,
+    request: RiskScenarioRequest = Body(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """Score what-if overrides of a facility's current factors, all in one pass, ranked by score reduction"""
+    if facility_id not in sample_facilities:
+        raise HTTPException(status_code=404, detail="Facility not found")
     
-    # Get recommendations based on risk category
-    recommendations = sample_recommendations.get(facility["risk_category"], [])
+    started = time.perf_counter()
+    try:
+        evaluated = risk_engine.evaluate_scenarios(
+            facility_id,
+            [
+                {factor_id: override.model_dump() for factor_id, override in scenario.factors.items()}
+                for scenario in request.scenarios
+            ],
+            monitoring=request.include_monitoring
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
+    for result in evaluated["scenarios"]:
+        result["name"] = request.scenarios[result["index"]].name
     return {
         "facility_id": facility_id,
-        "facility_name": facility["name"],
-        "overall_risk_score": facility["risk_score"],
-        "risk_category": facility["risk_category"],
-        "factors": risk_factors,
-        "recommendations": recommendations,
-        "last_updated": datetime.now()
+        **evaluated,
+        "elapsed_seconds": round(time.perf_counter() - started, 6)
     }
+
+@router.get("/{facility_id}/history", response_model=List[RiskAssessmentVersionSummary])
+async def get_risk_assessment_history(
+    facility_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get a facility's assessment versions, oldest first"""
+    if facility_id not in sample_facilities:
+        raise HTTPException(status_code=404, detail="Facility not found")
+    return risk_history.versions(facility_id)
+
+@router.get("/{facility_id}/history/{version}", response_model=RiskAssessmentVersion)
+async def get_risk_assessment_version(
+    facility_id: str,
+    version: int,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get a facility's assessment as recorded in one version"""
+    if facility_id not in sample_facilities:
+        raise HTTPException(status_code=404, detail="Facility not found")
+    found = risk_history.at_version(facility_id, version)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return version_response(*found)
+
+@router.get("/{facility_id}/as-of", response_model=RiskAssessmentVersion)
+async def get_risk_assessment_as_of(
+    facility_id: str,
+    date: datetime = Query(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get a facility's assessment as it stood at a point in time"""
+    if facility_id not in sample_facilities:
+        raise HTTPException(status_code=404, detail="Facility not found")
+    found = risk_history.as_of(facility_id, date)
+    if found is None:
+        raise HTTPException(status_code=404, detail="No assessment on or before that date")
+    return version_response(*found)
+
+@router.get("/{facility_id}/diff", response_model=RiskAssessmentDiff)
+async def get_risk_assessment_diff(
+    facility_id: str,
+    from_version: int = Query(...),
+    to_version: int = Query(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get what changed between two assessment versions"""
+    if facility_id not in sample_facilities:
+        raise HTTPException(status_code=404, detail="Facility not found")
+    diff = risk_history.diff(facility_id, from_version, to_version)
+    if diff is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return diff
@@ -0,0 +1,203 @@
+from typing import Dict, List, Optional, Any, Tuple
+from datetime import datetime
+import bisect
+import copy
+import json
+import os
+import threading
+from .broadcast import json_default
+from .sensor_store import to_epoch_us
+
+# A full copy of the state is kept every this many versions, so a lookup applies at most this many deltas
+CHECKPOINT_INTERVAL = 32
+
+# Factor state: factor id -> factor fields (JSON types only)
+FactorState = Dict[str, Dict[str, Any]]
+
+
+def to_json_types(value: Any) -> Any:
+    """Round-trip through JSON so stored state compares and serialises the same after a reload"""
+    return json.loads(json.dumps(value, default=json_default))
+
+
+def factor_delta(before: FactorState, after: FactorState) -> FactorState:
+    """The fields that differ per factor; a factor missing from before appears whole, a removed one as None"""
+    delta = {}
+    for factor_id, factor in after.items():
+        previous = before.get(factor_id)
+        if previous is None:
+            delta[factor_id] = factor
+            continue
+        changed = {field: value for field, value in factor.items() if previous.get(field) != value}
+        if changed:
+            delta[factor_id] = changed
+    for factor_id in before:
+        if factor_id not in after:
+            delta[factor_id] = None
+    return delta
+
+
+def apply_delta(state: FactorState, delta: FactorState) -> FactorState:
+    """Apply a delta to a copy of the state"""
+    state = {factor_id: dict(factor) for factor_id, factor in state.items()}
+    for factor_id, changes in delta.items():
+        if changes is None:
+            state.pop(factor_id, None)
+        else:
+            state.setdefault(factor_id, {}).update(changes)
+    return state
+
+
+class FacilityHistory:
+    """One facility's versions; dates are non-decreasing, so version order is date order"""
+
+    def __init__(self):
+        self.versions: List[Dict[str, Any]] = []
+        self.dates: List[int] = []  # assessment_date in epoch microseconds, aligned with versions
+        self.checkpoints: Dict[int, FactorState] = {}  # version index -> full state
+        self.latest: FactorState = {}
+
+
+class AssessmentHistory:
+    """
+    Immutable, versioned risk assessments per facility.
+    Each version stores only the factor fields that changed, plus the scores at the time.
+    Point-in-time lookups bisect the (facility, assessment_date) index and replay from the
+    nearest checkpoint. With a path, versions are appended to a JSON lines file and reloaded on start.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.lock = threading.RLock()
+        self.facilities: Dict[str, FacilityHistory] = {}
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def _load(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    break
+                self._add(record)
+
+    def _add(self, record: Dict[str, Any]):
+        history = self.facilities.setdefault(record["facility_id"], FacilityHistory())
+        index = len(history.versions)
+        history.latest = apply_delta(history.latest, record["changes"])
+        history.versions.append(record)
+        history.dates.append(to_epoch_us(datetime.fromisoformat(record["assessment_date"])))
+        if index % CHECKPOINT_INTERVAL == 0:
+            history.checkpoints[index] = history.latest
+
+    def latest_state(self, facility_id: str) -> Optional[FactorState]:
+        history = self.facilities.get(facility_id)
+        return copy.deepcopy(history.latest) if history and history.versions else None
+
+    def check_date(self, facility_id: str, assessment_date: datetime):
+        """Raise ValueError if an assessment dated this would precede the facility's latest version"""
+        history = self.facilities.get(facility_id)
+        if history and history.dates and to_epoch_us(assessment_date) < history.dates[-1]:
+            raise ValueError(f"Assessment date is before the latest assessment ({history.versions[-1]['assessment_date']})")
+
+    def record(
+        self,
+        facility_id: str,
+        factors: List[Dict[str, Any]],
+        summary: Dict[str, Any],
+        assessment_date: datetime,
+        recorded_by: str
+    ) -> Dict[str, Any]:
+        """Store a new version from the assessed factors (with scores) and its overall score and category"""
+        with self.lock:
+            self.check_date(facility_id, assessment_date)
+            history = self.facilities.get(facility_id)
+            state = to_json_types({factor["id"]: factor for factor in factors})
+            record = {
+                "facility_id": facility_id,
+                "version": len(history.versions) + 1 if history else 1,
+                "assessment_date": assessment_date.isoformat(),
+                "recorded_at": datetime.now().isoformat(),
+                "recorded_by": recorded_by,
+                **to_json_types(summary),
+                "changes": factor_delta(history.latest if history else {}, state)
+            }
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._add(record)
+            return record
+
+    def versions(self, facility_id: str) -> List[Dict[str, Any]]:
+        """Version metadata without the deltas, oldest first"""
+        history = self.facilities.get(facility_id)
+        if history is None:
+            return []
+        return [
+            dict({key: value for key, value in record.items() if key != "changes"}, changed_factors=sorted(record["changes"]))
+            for record in history.versions
+        ]
+
+    def _state_at(self, history: FacilityHistory, index: int) -> FactorState:
+        checkpoint = index - index % CHECKPOINT_INTERVAL
+        state = history.checkpoints[checkpoint]
+        for record in history.versions[checkpoint + 1:index + 1]:
+            state = apply_delta(state, record["changes"])
+        return state
+
+    def at_version(self, facility_id: str, version: int) -> Optional[Tuple[Dict[str, Any], FactorState]]:
+        """(version record, factor state) for a version number, or None"""
+        with self.lock:
+            history = self.facilities.get(facility_id)
+            if history is None or not 1 <= version <= len(history.versions):
+                return None
+            return history.versions[version - 1], self._state_at(history, version - 1)
+
+    def as_of(self, facility_id: str, date: datetime) -> Optional[Tuple[Dict[str, Any], FactorState]]:
+        """(version record, factor state) of the latest assessment dated at or before date, or None"""
+        with self.lock:
+            history = self.facilities.get(facility_id)
+            if history is None:
+                return None
+            index = bisect.bisect_right(history.dates, to_epoch_us(date)) - 1
+            if index < 0:
+                return None
+            return history.versions[index], self._state_at(history, index)
+
+    def diff(self, facility_id: str, from_version: int, to_version: int) -> Optional[Dict[str, Any]]:
+        """Field-level changes between two versions, or None if either does not exist"""
+        start = self.at_version(facility_id, from_version)
+        end = self.at_version(facility_id, to_version)
+        if start is None or end is None:
+            return None
+        (start_record, before), (end_record, after) = start, end
+
+        factors = {}
+        for factor_id in sorted(set(before) | set(after)):
+            old, new = before.get(factor_id), after.get(factor_id)
+            if old is None or new is None:
+                factors[factor_id] = {"from": old, "to": new}
+                continue
+            changed = {
+                field: {"from": old.get(field), "to": new.get(field)}
+                for field in sorted(set(old) | set(new))
+                if old.get(field) != new.get(field)
+            }
+            if changed:
+                factors[factor_id] = changed
+
+        return {
+            "facility_id": facility_id,
+            "from_version": from_version,
+            "to_version": to_version,
+            "overall_risk_score": {"from": start_record["overall_risk_score"], "to": end_record["overall_risk_score"]},
+            "risk_category": {"from": start_record["risk_category"], "to": end_record["risk_category"]},
+            "factors": factors
+        }
@@ -0,0 +1,341 @@
+from typing import Callable, Dict, List, Optional, Any, Iterable, Tuple
+from datetime import datetime
+import threading
+import numpy as np
+
+# 5x5 risk matrix: a factor's score is impact x probability, 1-25
+IMPACT_LEVELS = {"Negligible": 1, "Low": 2, "Medium": 3, "High": 4, "Critical": 5}
+PROBABILITY_LEVELS = {"Very Low": 1, "Low": 2, "Medium": 3, "High": 4, "Very High": 5}
+
+# Risk categories from lowest to highest
+RISK_CATEGORIES = ["Low", "Medium", "High", "Critical"]
+
+# Probability names by level
+PROBABILITY_NAMES = {level: name for name, level in PROBABILITY_LEVELS.items()}
+
+# Fields a stored factor keeps; derived fields (risk_score, monitoring_*) and unknown keys are dropped
+FACTOR_FIELDS = ("id", "name", "description", "category", "impact_level", "probability", "mitigation_status", "mitigation_actions", "last_assessment")
+
+# How factor scores combine into a facility score
+AGGREGATIONS = ("max", "mean", "rms")
+
+# Most what-if scenarios evaluated in one request
+MAX_SCENARIOS = 1000
+
+# Facility scores at or above each threshold fall into that category; anything lower is Low
+default_scoring_config = {
+    "aggregation": "max",
+    "category_thresholds": {"Medium": 6, "High": 12, "Critical": 20},
+    "priority_threshold": 12  # Unmitigated factors scoring this high get their own recommendation
+}
+
+
+def validate_scoring_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge a scoring config over the defaults, raising ValueError for invalid settings"""
+    config = dict(default_scoring_config, **config)
+    if config["aggregation"] not in AGGREGATIONS:
+        raise ValueError(f"Aggregation must be one of {', '.join(AGGREGATIONS)}")
+    thresholds = config["category_thresholds"]
+    if set(thresholds) != set(RISK_CATEGORIES[1:]):
+        raise ValueError(f"Category thresholds are needed for {', '.join(RISK_CATEGORIES[1:])}")
+    values = [thresholds[category] for category in RISK_CATEGORIES[1:]]
+    if values != sorted(values) or values[0] < 1 or values[-1] > 25:
+        raise ValueError("Category thresholds must increase within 1-25")
+    return config
+
+
+def factor_score(impact_level: str, probability: str) -> int:
+    """Score one factor on the risk matrix, raising ValueError for unknown levels"""
+    if impact_level not in IMPACT_LEVELS:
+        raise ValueError(f"Invalid impact level {impact_level}")
+    if probability not in PROBABILITY_LEVELS:
+        raise ValueError(f"Invalid probability {probability}")
+    return IMPACT_LEVELS[impact_level] * PROBABILITY_LEVELS[probability]
+
+
+def aggregate_scores(scores: np.ndarray, starts: np.ndarray, method: str) -> np.ndarray:
+    """Combine factor scores grouped by facility (groups begin at starts) into rounded facility scores"""
+    counts = np.diff(np.append(starts, len(scores)))
+    scores = scores.astype(np.float64)
+    if method == "max":
+        combined = np.maximum.reduceat(scores, starts)
+    elif method == "mean":
+        combined = np.add.reduceat(scores, starts) / counts
+    else:
+        combined = np.sqrt(np.add.reduceat(scores * scores, starts) / counts)
+    return np.clip(np.rint(combined), 1, 25).astype(np.int64)
+
+
+def categorise(scores: np.ndarray, thresholds: Dict[str, int]) -> List[str]:
+    """Map facility scores to risk categories"""
+    bounds = [thresholds[category] for category in RISK_CATEGORIES[1:]]
+    return [RISK_CATEGORIES[index] for index in np.searchsorted(bounds, scores, side="right").tolist()]
+
+
+def factor_fields(factor: Dict[str, Any]) -> Dict[str, Any]:
+    """The FACTOR_FIELDS of a factor or factor update"""
+    return {key: value for key, value in factor.items() if key in FACTOR_FIELDS}
+
+
+class RiskEngine:
+    """
+    Scores each facility's risk factors and caches the result per facility.
+    A facility's cache entry is dropped only when its factors or monitoring signals change; a
+    scoring config change drops them all. portfolio() rescores every stale facility in one vectorised pass.
+    A monitoring signal raises a factor's probability to at least the level live alerts and readings imply.
+    """
+
+    def __init__(
+        self,
+        facilities: Dict[str, Dict[str, Any]],
+        factors: Dict[str, List[Dict[str, Any]]],
+        recommendations: Dict[str, List[str]],
+        config: Optional[Dict[str, Any]] = None
+    ):
+        self.facilities = facilities
+        self.factors = {facility_id: [factor_fields(factor) for factor in items] for facility_id, items in factors.items()}
+        self.recommendations = recommendations
+        self.config = validate_scoring_config(config or {})
+        self.lock = threading.RLock()
+        self.cache: Dict[str, Dict[str, Any]] = {}
+        self.signals: Dict[str, Dict[str, Dict[str, Any]]] = {}  # facility -> factor -> {"level", "alerts"}
+        started = datetime.now()
+        self.changed_at: Dict[str, datetime] = {facility_id: started for facility_id in facilities}  # Last change to each result
+        self.hits = 0
+        self.misses = 0
+
+    def set_config(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        config = validate_scoring_config(config)
+        with self.lock:
+            if config == self.config:
+                return config
+            self.config = config
+            self.cache.clear()
+            changed_at = datetime.now()
+            self.changed_at = {facility_id: changed_at for facility_id in self.facilities}
+        return config
+
+    def update_factors(
+        self,
+        facility_id: str,
+        updates: Iterable[Dict[str, Any]],
+        timestamp: Any,
+        validate: Optional[Callable[[Dict[str, Any]], Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Merge the FACTOR_FIELDS of factor updates (matched by id; unknown ids are added) into a facility's factors
+        and invalidate its cached result. Raises ValueError for invalid levels or incomplete
+        new factors, or whatever validate raises for a merged, scored factor; nothing changes then.
+        """
+        with self.lock:
+            factors = [dict(factor) for factor in self.factors.get(facility_id, [])]
+            by_id = {factor["id"]: factor for factor in factors}
+            for update in updates:
+                factor_id = update.get("id")
+                if not factor_id:
+                    raise ValueError("Each factor needs an id")
+                factor = by_id.get(factor_id)
+                if factor is None:
+                    factor = {"mitigation_status": "Not Started", "mitigation_actions": []}
+                    factors.append(factor)
+                    by_id[factor_id] = factor
+                factor.update(factor_fields(update))
+                missing = [key for key in ("name", "description", "category", "impact_level", "probability") if key not in factor]
+                if missing:
+                    raise ValueError(f"Factor {factor_id} is missing {', '.join(missing)}")
+                factor["last_assessment"] = timestamp
+                score = factor_score(factor["impact_level"], factor["probability"])
+                if validate is not None:
+                    validate(dict(factor, risk_score=score))
+            self.factors[facility_id] = factors
+            self.cache.pop(facility_id, None)
+            self.changed_at[facility_id] = datetime.now()
+            return factors
+
+    def set_signals(self, facility_id: str, signals: Dict[str, Optional[Dict[str, Any]]]) -> bool:
+        """
+        Replace the monitoring signals of the given factors (None clears one). The facility is
+        invalidated only if a signal changed; returns whether it was.
+        """
+        with self.lock:
+            current = self.signals.get(facility_id, {})
+            updated = dict(current)
+            for factor_id, signal in signals.items():
+                if signal is None:
+                    updated.pop(factor_id, None)
+                else:
+                    updated[factor_id] = signal
+            if updated == current:
+                return False
+            self.signals[facility_id] = updated
+            self.cache.pop(facility_id, None)
+            self.changed_at[facility_id] = datetime.now()
+            return True
+
+    def recommend(self, category: str, factors: List[Dict[str, Any]]) -> List[str]:
+        """Category-level recommendations plus one for each high, unmitigated factor"""
+        recommendations = list(self.recommendations.get(category, []))
+        priority = [
+            factor for factor in factors
+            if factor["risk_score"] >= self.config["priority_threshold"] and factor["mitigation_status"] != "Completed"
+        ]
+        for factor in sorted(priority, key=lambda f: -f["risk_score"]):
+            action = factor["mitigation_actions"][0] if factor["mitigation_actions"] else "define mitigation actions"
+            recommendations.append(f"Prioritise {factor['name']} (score {factor['risk_score']}): {action}")
+        return recommendations
+
+    def _score(self, facility_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Score the given facilities together: one matrix lookup and one grouped reduction for all factors"""
+        scored = [facility_id for facility_id in facility_ids if self.factors.get(facility_id)]
+        impacts, probabilities, raised, starts = [], [], [], []
+        for facility_id in scored:
+            starts.append(len(impacts))
+            signals = self.signals.get(facility_id, {})
+            for factor in self.factors[facility_id]:
+                impacts.append(IMPACT_LEVELS[factor["impact_level"]])
+                assessed = PROBABILITY_LEVELS[factor["probability"]]
+                signal = signals.get(factor["id"])
+                if signal is not None and signal["level"] > assessed:
+                    probabilities.append(signal["level"])
+                    raised.append({"monitoring_probability": PROBABILITY_NAMES[signal["level"]], "monitoring_alerts": signal["alerts"]})
+                else:
+                    probabilities.append(assessed)
+                    raised.append({"monitoring_probability": None, "monitoring_alerts": []})
+
+        results = {}
+        if scored:
+            factor_scores = np.array(impacts, dtype=np.int64) * np.array(probabilities, dtype=np.int64)
+            start_array = np.array(starts, dtype=np.int64)
+            facility_scores = aggregate_scores(factor_scores, start_array, self.config["aggregation"])
+            categories = categorise(facility_scores, self.config["category_thresholds"])
+            factor_scores = factor_scores.tolist()
+            ends = starts[1:] + [len(factor_scores)]
+            for index, facility_id in enumerate(scored):
+                factors = [
+                    dict(factor, risk_score=score, **monitoring)
+                    for factor, score, monitoring in zip(
+                        self.factors[facility_id],
+                        factor_scores[starts[index]:ends[index]],
+                        raised[starts[index]:ends[index]]
+                    )
+                ]
+                results[facility_id] = {
+                    "overall_risk_score": int(facility_scores[index]),
+                    "risk_category": categories[index],
+                    "factors": factors,
+                    "recommendations": self.recommend(categories[index], factors),
+                    "last_updated": self.changed_at[facility_id]
+                }
+
+        # A facility without factors has nothing to score: lowest score and category
+        for facility_id in facility_ids:
+            if facility_id not in results:
+                results[facility_id] = {
+                    "overall_risk_score": 1,
+                    "risk_category": RISK_CATEGORIES[0],
+                    "factors": [],
+                    "recommendations": list(self.recommendations.get(RISK_CATEGORIES[0], [])),
+                    "last_updated": self.changed_at[facility_id]
+                }
+        return results
+
+    def evaluate_scenarios(
+        self,
+        facility_id: str,
+        scenarios: List[Dict[str, Dict[str, Any]]],
+        monitoring: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Score what-if scenarios against a facility's current factors in one pass. Each scenario maps
+        factor ids to overrides of impact_level, probability and mitigation_status; row 0 of the
+        score matrix is the unchanged baseline. With monitoring, signals still raise probabilities.
+        Nothing is cached or changed. Raises ValueError for unknown factors or levels.
+        """
+        with self.lock:
+            factors = list(self.factors.get(facility_id, []))
+            signals = self.signals.get(facility_id, {}) if monitoring else {}
+            config = self.config
+        if not factors:
+            raise ValueError("Facility has no risk factors")
+
+        rows, columns = len(scenarios) + 1, len(factors)
+        positions = {factor["id"]: position for position, factor in enumerate(factors)}
+        impacts = np.tile([IMPACT_LEVELS[factor["impact_level"]] for factor in factors], (rows, 1))
+        probabilities = np.tile([PROBABILITY_LEVELS[factor["probability"]] for factor in factors], (rows, 1))
+        completed = np.tile([factor["mitigation_status"] == "Completed" for factor in factors], (rows, 1))
+        for row, scenario in enumerate(scenarios, 1):
+            for factor_id, override in scenario.items():
+                column = positions.get(factor_id)
+                if column is None:
+                    raise ValueError(f"Unknown factor {factor_id}")
+                if override.get("impact_level") is not None:
+                    if override["impact_level"] not in IMPACT_LEVELS:
+                        raise ValueError(f"Invalid impact level {override['impact_level']}")
+                    impacts[row, column] = IMPACT_LEVELS[override["impact_level"]]
+                if override.get("probability") is not None:
+                    if override["probability"] not in PROBABILITY_LEVELS:
+                        raise ValueError(f"Invalid probability {override['probability']}")
+                    probabilities[row, column] = PROBABILITY_LEVELS[override["probability"]]
+                if override.get("mitigation_status") is not None:
+                    completed[row, column] = override["mitigation_status"] == "Completed"
+
+        floors = np.array([signals.get(factor["id"], {}).get("level", 0) for factor in factors])
+        scores = impacts * np.maximum(probabilities, floors)
+        totals = aggregate_scores(scores.ravel(), np.arange(rows) * columns, config["aggregation"])
+        categories = categorise(totals, config["category_thresholds"])
+        priority = ((scores >= config["priority_threshold"]) & ~completed).sum(axis=1)
+        deltas = totals - totals[0]
+        factor_deltas = scores - scores[0]
+
+        # Largest reduction first, then fewest open priority factors, then request order
+        order = np.lexsort((np.arange(rows - 1), priority[1:], deltas[1:])) + 1
+        factor_ids = [factor["id"] for factor in factors]
+        results = []
+        for rank, row in enumerate(order.tolist(), 1):
+            changed = np.flatnonzero(factor_deltas[row]).tolist()
+            results.append({
+                "index": row - 1,
+                "rank": rank,
+                "overall_risk_score": int(totals[row]),
+                "risk_category": categories[row],
+                "score_delta": int(deltas[row]),
+                "open_priority_factors": int(priority[row]),
+                "factor_deltas": {factor_ids[column]: int(factor_deltas[row, column]) for column in changed}
+            })
+        return {
+            "baseline": {
+                "overall_risk_score": int(totals[0]),
+                "risk_category": categories[0],
+                "open_priority_factors": int(priority[0])
+            },
+            "scenarios": results
+        }
+
+    def assess(self, facility_id: str) -> Tuple[Dict[str, Any], bool]:
+        """Return (result, cached) for one facility"""
+        with self.lock:
+            result = self.cache.get(facility_id)
+            if result is not None:
+                self.hits += 1
+                return result, True
+            self.misses += 1
+            result = self.cache[facility_id] = self._score([facility_id])[facility_id]
+            return result, False
+
+    def assess_many(self, facility_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Results for the given facilities, rescoring all stale ones in a single pass"""
+        facility_ids = list(facility_ids)
+        with self.lock:
+            stale = [facility_id for facility_id in facility_ids if facility_id not in self.cache]
+            self.hits += len(facility_ids) - len(stale)
+            self.misses += len(stale)
+            if stale:
+                self.cache.update(self._score(stale))
+            return {facility_id: self.cache[facility_id] for facility_id in facility_ids}
+
+    def portfolio(self) -> Dict[str, Dict[str, Any]]:
+        """Results for every facility"""
+        return self.assess_many(self.facilities)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"config": self.config, "cached_facilities": len(self.cache), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,165 @@
+from typing import Dict, List, Optional, Any, Iterable, Set, Tuple
+import threading
+import time
+import numpy as np
+from .risk_scoring import PROBABILITY_LEVELS, RiskEngine
+from .sensor_store import STATUS_CODES
+
+# Risk factors each sensor type provides evidence for
+default_sensor_factors = {
+    "piezometer": ["RF001", "RF002"],
+    "inclinometer": ["RF001"],
+    "settlement": ["RF001"],
+    "water_level": ["RF002", "RF005"],
+    "flow_rate": ["RF002", "RF005"],
+    "turbidity": ["RF002"],
+    "rainfall": ["RF003", "RF005"],
+    "ph": ["RF005"],
+    "conductivity": ["RF005"]
+}
+
+# Alert types that say something about the monitored conditions (not about the sensor itself)
+RISK_ALERT_TYPES = {"High Reading", "Threshold Exceeded", "Rapid Change"}
+
+# Lowest probability an open alert of each severity, or a sensor's latest reading status, implies
+ALERT_SEVERITY_PROBABILITY = {"Medium": PROBABILITY_LEVELS["Medium"], "High": PROBABILITY_LEVELS["High"], "Critical": PROBABILITY_LEVELS["Very High"]}
+STATUS_PROBABILITY = {STATUS_CODES["Warning"]: PROBABILITY_LEVELS["Medium"], STATUS_CODES["Alert"]: PROBABILITY_LEVELS["High"]}
+
+# A facility is re-scored once its events have been quiet this long, or at the latest this long after its first event
+default_signal_config = {"quiet_ms": 500.0, "max_wait_ms": 5000.0}
+
+
+def signal_config_from_env(environ: Dict[str, str]) -> Dict[str, float]:
+    """Debounce settings from TAILINGSIQ_RISK_RESCORE_QUIET_MS and TAILINGSIQ_RISK_RESCORE_MAX_WAIT_MS"""
+    return {
+        "quiet_ms": float(environ.get("TAILINGSIQ_RISK_RESCORE_QUIET_MS", default_signal_config["quiet_ms"])),
+        "max_wait_ms": float(environ.get("TAILINGSIQ_RISK_RESCORE_MAX_WAIT_MS", default_signal_config["max_wait_ms"]))
+    }
+
+
+class RiskSignalLink:
+    """
+    Feeds monitoring state into risk scores.
+    Alert and reading listeners only mark (facility, factor) pairs dirty; flush() later recomputes
+    the marked factors' monitoring signals from the stores and hands them to the engine, which
+    re-scores a facility only if a signal actually changed. Bursts of events for a facility are
+    debounced into one recompute.
+    """
+
+    def __init__(
+        self,
+        engine: RiskEngine,
+        sensor_store: Any,
+        alert_store: Any,
+        sensor_factors: Optional[Dict[str, List[str]]] = None,
+        config: Optional[Dict[str, float]] = None
+    ):
+        self.engine = engine
+        self.sensor_store = sensor_store
+        self.alert_store = alert_store
+        self.sensor_factors = sensor_factors or default_sensor_factors
+        self.config = dict(default_signal_config, **(config or {}))
+        self.lock = threading.Lock()
+        self.pending: Dict[str, Tuple[Set[str], float, float]] = {}  # facility -> (factors, first event, last event)
+        self.events = 0
+        self.flushes = 0
+        self.rescored = 0
+
+    def mark(self, facility_id: str, factor_ids: Iterable[str], now: Optional[float] = None):
+        """Record that monitoring evidence for these factors may have changed"""
+        if facility_id not in self.engine.facilities:
+            return
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.events += 1
+            entry = self.pending.get(facility_id)
+            if entry is None:
+                self.pending[facility_id] = (set(factor_ids), now, now)
+            else:
+                entry[0].update(factor_ids)
+                self.pending[facility_id] = (entry[0], entry[1], now)
+
+    def mark_facility(self, facility_id: str):
+        """Mark every factor a facility's sensors can affect"""
+        self.mark(facility_id, {factor_id for factor_ids in self.sensor_factors.values() for factor_id in factor_ids})
+
+    def alert_changed(self, alert: Any, previous_status: Optional[str]):
+        """Alert store listener: new alerts, status changes and severity of coalesced repeats"""
+        if alert.alert_type not in RISK_ALERT_TYPES:
+            return
+        sensor = self.sensor_store.get_sensor(alert.sensor_id)
+        if sensor is not None and sensor["sensor_type"] in self.sensor_factors:
+            self.mark(alert.facility_id, self.sensor_factors[sensor["sensor_type"]])
+
+    def readings_written(self, sensor: Dict[str, Any], timestamps: np.ndarray, values: np.ndarray, statuses: np.ndarray, previous_status: Optional[int]):
+        """Sensor store listener: only a change in the sensor's latest status matters"""
+        factor_ids = self.sensor_factors.get(sensor["sensor_type"])
+        if not factor_ids:
+            return
+        latest = self.sensor_store.last(sensor["sensor_id"])
+        if latest is not None and int(latest.statuses[0]) != previous_status:
+            self.mark(sensor["facility_id"], factor_ids)
+
+    def signals(self, facility_id: str, factor_ids: Set[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Current monitoring signal per factor: the highest probability the evidence implies, and the alerts behind it"""
+        levels = {factor_id: 0 for factor_id in factor_ids}
+        alerts: Dict[str, List[str]] = {factor_id: [] for factor_id in factor_ids}
+        sensors = {}
+        for sensor in self.sensor_store.get_facility_sensors(facility_id):
+            relevant = [factor_id for factor_id in self.sensor_factors.get(sensor["sensor_type"], []) if factor_id in levels]
+            if not relevant:
+                continue
+            sensors[sensor["sensor_id"]] = relevant
+            latest = self.sensor_store.last(sensor["sensor_id"])
+            level = STATUS_PROBABILITY.get(int(latest.statuses[0]), 0) if latest is not None else 0
+            for factor_id in relevant:
+                levels[factor_id] = max(levels[factor_id], level)
+
+        for status in ("Active", "Acknowledged"):
+            for alert in self.alert_store.query(facility_id, status=status):
+                level = ALERT_SEVERITY_PROBABILITY.get(alert.severity, 0)
+                if alert.alert_type not in RISK_ALERT_TYPES or alert.sensor_id not in sensors or not level:
+                    continue
+                for factor_id in sensors[alert.sensor_id]:
+                    levels[factor_id] = max(levels[factor_id], level)
+                    alerts[factor_id].append(alert.alert_id)
+
+        return {
+            factor_id: {"level": level, "alerts": sorted(alerts[factor_id])} if level else None
+            for factor_id, level in levels.items()
+        }
+
+    def due(self, now: Optional[float] = None) -> List[str]:
+        """Facilities whose events have gone quiet, or that have waited the longest allowed"""
+        now = time.monotonic() if now is None else now
+        quiet, max_wait = self.config["quiet_ms"] / 1000, self.config["max_wait_ms"] / 1000
+        with self.lock:
+            return [
+                facility_id for facility_id, (_, first, last) in self.pending.items()
+                if now - last >= quiet or now - first >= max_wait
+            ]
+
+    def flush(self, facility_ids: Optional[Iterable[str]] = None) -> int:
+        """Apply the pending signals of the given facilities (default: all pending); returns how many were re-scored"""
+        with self.lock:
+            if facility_ids is None:
+                batch, self.pending = self.pending, {}
+            else:
+                batch = {facility_id: self.pending.pop(facility_id) for facility_id in facility_ids if facility_id in self.pending}
+            if batch:
+                self.flushes += 1
+        rescored = 0
+        for facility_id, (factor_ids, _, _) in batch.items():
+            if self.engine.set_signals(facility_id, self.signals(facility_id, factor_ids)):
+                rescored += 1
+        self.rescored += rescored
+        return rescored
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.config,
+            "pending_facilities": len(self.pending),
+            "events": self.events,
+            "flushes": self.flushes,
+            "rescored": self.rescored
+        }
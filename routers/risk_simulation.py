@@ -0,0 +1,263 @@
+from typing import Dict, List, Optional, Any, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import math
+import multiprocessing
+import os
+import time
+import numpy as np
+from .risk_scoring import IMPACT_LEVELS, PROBABILITY_LEVELS, RISK_CATEGORIES
+
+# Distributions a factor's impact or probability can be sampled from, on the 1-5 matrix scale
+DISTRIBUTIONS = ("triangular", "uniform", "fixed")
+DISTRIBUTION_CODES = {name: code for code, name in enumerate(DISTRIBUTIONS)}
+
+# Factors whose likelihoods move together: extreme weather drives seepage and water management
+default_factor_correlations = [
+    ("RF002", "RF003", 0.6),
+    ("RF003", "RF005", 0.5),
+    ("RF002", "RF005", 0.4)
+]
+
+# Trials per task; fixed so a seed gives the same result however many workers there are
+CHUNK_TRIALS = 250_000
+
+# Scores are histogrammed at this resolution, so chunks merge exactly and percentiles are within 0.01
+SCORE_BINS_PER_POINT = 100
+SCORE_BINS = 24 * SCORE_BINS_PER_POINT + 1
+
+# Start method for the process pool: forking a threaded server process can copy locks other threads hold
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def default_distribution(level: int) -> Dict[str, Any]:
+    """Triangular distribution one level either side of the assessed level"""
+    return {"distribution": "triangular", "low": max(1, level - 1), "mode": level, "high": min(5, level + 1)}
+
+
+def resolve_distribution(spec: Optional[Dict[str, Any]], level: int) -> Tuple[int, float, float, float]:
+    """(distribution code, low, mode, high) from an optional override, raising ValueError for bad specs"""
+    resolved = default_distribution(level)
+    if spec:
+        resolved.update({key: value for key, value in spec.items() if value is not None})
+    name = resolved["distribution"]
+    if name not in DISTRIBUTION_CODES:
+        raise ValueError(f"Distribution must be one of {', '.join(DISTRIBUTIONS)}")
+    if name == "fixed":
+        resolved["low"] = resolved["high"] = resolved["mode"]
+    low, mode, high = float(resolved["low"]), float(resolved["mode"]), float(resolved["high"])
+    if not 1 <= low <= mode <= high <= 5:
+        raise ValueError("Distributions need 1 <= low <= mode <= high <= 5")
+    return DISTRIBUTION_CODES[name], low, mode, high
+
+
+def correlation_cholesky(factor_ids: Sequence[str], correlations: Sequence[Tuple[str, str, float]]) -> Optional[np.ndarray]:
+    """Cholesky factor of the factors' likelihood correlation matrix, or None when they are independent"""
+    index = {factor_id: position for position, factor_id in enumerate(factor_ids)}
+    matrix = np.eye(len(factor_ids))
+    for factor_a, factor_b, correlation in correlations:
+        if factor_a not in index or factor_b not in index:
+            continue
+        if not -1 < correlation < 1 or factor_a == factor_b:
+            raise ValueError(f"Correlation between {factor_a} and {factor_b} must be strictly between -1 and 1")
+        matrix[index[factor_a], index[factor_b]] = matrix[index[factor_b], index[factor_a]] = correlation
+    if np.array_equal(matrix, np.eye(len(factor_ids))):
+        return None
+    try:
+        return np.linalg.cholesky(matrix)
+    except np.linalg.LinAlgError:
+        raise ValueError("Correlations are inconsistent (the matrix is not positive definite)")
+
+
+def normal_cdf(z: np.ndarray) -> np.ndarray:
+    """Standard normal CDF via the Abramowitz-Stegun erf approximation (error below 1.5e-7)"""
+    x = np.abs(z) / math.sqrt(2)
+    t = 1 / (1 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1 - poly * np.exp(-x * x)
+    return 0.5 * (1 + np.sign(z) * erf)
+
+
+def inverse_cdf(u: np.ndarray, params: np.ndarray) -> np.ndarray:
+    """Map uniforms (trials x factors) through each factor's distribution; params rows are (code, low, mode, high)"""
+    code, low, mode, high = params
+    span = high - low
+    uniform = low + u * span
+
+    # Triangular: two square-root branches either side of the mode
+    safe_span = np.where(span > 0, span, 1)
+    split = (mode - low) / safe_span
+    rising = low + np.sqrt(u * span * (mode - low))
+    falling = high - np.sqrt((1 - u) * span * (high - mode))
+    triangular = np.where(u < split, rising, falling)
+
+    return np.where(code == DISTRIBUTION_CODES["uniform"], uniform, np.where(span > 0, triangular, low))
+
+
+def simulate_chunk(
+    trials: int,
+    seed: np.random.SeedSequence,
+    impacts: np.ndarray,
+    probabilities: np.ndarray,
+    cholesky: Optional[np.ndarray],
+    aggregation: str
+) -> Dict[str, np.ndarray]:
+    """Run one chunk of trials; returns mergeable histograms, driver counts and moment sums"""
+    rng = np.random.default_rng(seed)
+    factors = impacts.shape[1]
+
+    impact = inverse_cdf(rng.random((trials, factors)), impacts)
+    if cholesky is None:
+        likelihood_u = rng.random((trials, factors))
+    else:
+        likelihood_u = normal_cdf(rng.standard_normal((trials, factors)) @ cholesky.T)
+    scores = impact * inverse_cdf(likelihood_u, probabilities)
+
+    if aggregation == "max":
+        total = scores.max(axis=1)
+    elif aggregation == "mean":
+        total = scores.mean(axis=1)
+    else:
+        total = np.sqrt((scores * scores).mean(axis=1))
+
+    def bins(values: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint((values - 1) * SCORE_BINS_PER_POINT), 0, SCORE_BINS - 1).astype(np.int64)
+
+    # Facility scores rounded as RiskEngine rounds them, for exceedance of the category thresholds
+    rounded = np.clip(np.rint(total), 1, 25).astype(np.int64)
+
+    factor_bins = bins(scores) + np.arange(factors) * SCORE_BINS
+    return {
+        "total_histogram": np.bincount(bins(total), minlength=SCORE_BINS),
+        "rounded_histogram": np.bincount(rounded, minlength=26),
+        "factor_histograms": np.bincount(factor_bins.ravel(), minlength=SCORE_BINS * factors).reshape(factors, SCORE_BINS),
+        "drivers": np.bincount(scores.argmax(axis=1), minlength=factors),
+        "total_sum": total.sum(),
+        "total_squares": (total * total).sum(),
+        "factor_sums": scores.sum(axis=0),
+        "factor_squares": (scores * scores).sum(axis=0),
+        "cross_sums": scores.T @ total
+    }
+
+
+def merge_chunks(chunks: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    return {key: sum(chunk[key] for chunk in chunks) for key in chunks[0]}
+
+
+def histogram_percentiles(histogram: np.ndarray, percentiles: Sequence[float]) -> List[float]:
+    """Percentiles of a score histogram (axis -1), accurate to the bin width"""
+    cumulative = np.cumsum(histogram, axis=-1)
+    total = cumulative[..., -1:]
+    results = []
+    for percentile in percentiles:
+        target = np.maximum(np.ceil(total * percentile / 100), 1)
+        index = (cumulative < target).sum(axis=-1)
+        results.append(1 + index / SCORE_BINS_PER_POINT)
+    return [np.round(result, 2).tolist() for result in results]
+
+
+class RiskSimulator:
+    """
+    Monte Carlo simulation of facility risk scores.
+    Trials are split into fixed-size chunks, each seeded from the request seed; large runs
+    go to a process pool, small ones run in a thread.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool: Optional[ProcessPoolExecutor] = None
+
+    def executor(self, chunks: int) -> Optional[ProcessPoolExecutor]:
+        """The process pool, started on first use; None when a run is too small to be worth it"""
+        if chunks < 2 or self.workers < 2:
+            return None
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(POOL_START_METHOD))
+        return self.pool
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = None
+
+    async def run(
+        self,
+        factors: List[Dict[str, Any]],
+        overrides: Dict[str, Dict[str, Any]],
+        correlations: Sequence[Tuple[str, str, float]],
+        aggregation: str,
+        trials: int,
+        seed: int,
+        percentiles: Sequence[float],
+        category_thresholds: Dict[str, int]
+    ) -> Dict[str, Any]:
+        """Simulate a facility's factors; raises ValueError for invalid distributions or correlations"""
+        started = time.perf_counter()
+        factor_ids = [factor["id"] for factor in factors]
+        impacts = np.array([
+            resolve_distribution(overrides.get(factor["id"], {}).get("impact"), IMPACT_LEVELS[factor["impact_level"]])
+            for factor in factors
+        ]).T
+        probabilities = np.array([
+            resolve_distribution(overrides.get(factor["id"], {}).get("probability"), PROBABILITY_LEVELS[factor["probability"]])
+            for factor in factors
+        ]).T
+        cholesky = correlation_cholesky(factor_ids, correlations)
+
+        sizes = [CHUNK_TRIALS] * (trials // CHUNK_TRIALS)
+        if trials % CHUNK_TRIALS:
+            sizes.append(trials % CHUNK_TRIALS)
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+        loop = asyncio.get_running_loop()
+        pool = self.executor(len(sizes))
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(pool, simulate_chunk, size, chunk_seed, impacts, probabilities, cholesky, aggregation)
+            for size, chunk_seed in zip(sizes, seeds)
+        ))
+        merged = merge_chunks(chunks)
+
+        # Contribution: how often a factor is the largest score, and how closely it tracks the facility score
+        mean_total = merged["total_sum"] / trials
+        variance_total = merged["total_squares"] / trials - mean_total ** 2
+        factor_means = merged["factor_sums"] / trials
+        factor_variances = merged["factor_squares"] / trials - factor_means ** 2
+        covariances = merged["cross_sums"] / trials - factor_means * mean_total
+        denominators = np.sqrt(np.maximum(factor_variances * variance_total, 0))
+        correlation = np.divide(covariances, denominators, out=np.zeros_like(covariances), where=denominators > 1e-12)
+        factor_percentiles = histogram_percentiles(merged["factor_histograms"], percentiles)
+
+        contributions = []
+        for position, factor in enumerate(factors):
+            contributions.append({
+                "id": factor["id"],
+                "name": factor["name"],
+                "mean_score": round(float(factor_means[position]), 3),
+                "percentiles": {
+                    f"p{percentile:g}": values[position]
+                    for percentile, values in zip(percentiles, factor_percentiles)
+                },
+                "driver_share": round(float(merged["drivers"][position] / trials), 4),
+                "correlation": round(float(correlation[position]), 4)
+            })
+        contributions.sort(key=lambda c: (-c["driver_share"], -c["correlation"]))
+
+        # Probability the facility score, rounded like the deterministic score, reaches each category's threshold
+        histogram = merged["total_histogram"]
+        exceedance = {}
+        for category in RISK_CATEGORIES[1:]:
+            exceedance[category] = round(float(merged["rounded_histogram"][category_thresholds[category]:].sum() / trials), 6)
+
+        return {
+            "trials": trials,
+            "seed": seed,
+            "aggregation": aggregation,
+            "mean": round(float(mean_total), 3),
+            "percentiles": {
+                f"p{percentile:g}": value
+                for percentile, value in zip(percentiles, histogram_percentiles(histogram, percentiles))
+            },
+            "exceedance": exceedance,
+            "factors": contributions,
+            "elapsed_seconds": round(time.perf_counter() - started, 6)
+        }
@@ -0,0 +1,313 @@
+from typing import Callable, Dict, Optional, Any, Tuple
+import threading
+import time
+import numpy as np
+from .downsampling import bucket_starts, parse_interval
+from .sensor_store import SensorStore, SeriesView
+
+# Rollup tiers, finest first: (name, bucket width in microseconds)
+TIERS = [("minute", 60_000_000), ("hour", 3_600_000_000), ("day", 86_400_000_000)]
+TIER_INTERVALS = dict(TIERS)
+
+# How long each tier is kept (None keeps it forever); sensor types can override any of these
+default_retention = {"raw": "7d", "minute": "30d", "hour": "365d", "day": None}
+
+# Columns of a rollup bucket; sum and last_timestamp make buckets exactly mergeable
+ROLLUP_COLUMNS = {
+    "timestamp": np.int64,
+    "min": np.float64,
+    "max": np.float64,
+    "sum": np.float64,
+    "count": np.int64,
+    "last": np.float64,
+    "last_timestamp": np.int64,
+    "last_status": np.uint8
+}
+
+
+def retention_us(policy: Dict[str, Optional[str]]) -> Dict[str, Optional[int]]:
+    """Parse a retention policy into microseconds per tier, raising ValueError for bad intervals"""
+    parsed = {}
+    for tier in ["raw"] + [name for name, _ in TIERS]:
+        value = policy.get(tier)
+        parsed[tier] = parse_interval(value) if value else None
+    return parsed
+
+
+def rollup_buckets(view: SeriesView, interval_us: int) -> Dict[str, np.ndarray]:
+    """Roll sorted readings into mergeable buckets aligned to the epoch"""
+    if len(view) == 0:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in ROLLUP_COLUMNS.items()}
+    starts = bucket_starts(view.timestamps, interval_us)
+    ends = np.append(starts[1:], len(view))
+    last = ends - 1
+    return {
+        "timestamp": (view.timestamps[starts] // interval_us) * interval_us,
+        "min": np.minimum.reduceat(view.values, starts),
+        "max": np.maximum.reduceat(view.values, starts),
+        "sum": np.add.reduceat(view.values, starts),
+        "count": (ends - starts).astype(np.int64),
+        "last": view.values[last],
+        "last_timestamp": view.timestamps[last],
+        "last_status": view.statuses[last]
+    }
+
+
+def merge_buckets(columns: Dict[str, np.ndarray], interval_us: int) -> Dict[str, np.ndarray]:
+    """Combine buckets into (coarser or duplicate) buckets of interval_us; input need not be sorted"""
+    if len(columns["timestamp"]) == 0:
+        return columns
+    keys = (columns["timestamp"] // interval_us) * interval_us
+    # Sort by bucket, then by last_timestamp so each group's final row holds its latest reading
+    order = np.lexsort((columns["last_timestamp"], keys))
+    keys = keys[order]
+    sorted_columns = {name: column[order] for name, column in columns.items()}
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    last = np.append(starts[1:], len(keys)) - 1
+    return {
+        "timestamp": keys[starts],
+        "min": np.minimum.reduceat(sorted_columns["min"], starts),
+        "max": np.maximum.reduceat(sorted_columns["max"], starts),
+        "sum": np.add.reduceat(sorted_columns["sum"], starts),
+        "count": np.add.reduceat(sorted_columns["count"], starts),
+        "last": sorted_columns["last"][last],
+        "last_timestamp": sorted_columns["last_timestamp"][last],
+        "last_status": sorted_columns["last_status"][last]
+    }
+
+
+def concat_buckets(*parts: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    return {name: np.concatenate([part[name] for part in parts]).astype(dtype, copy=False) for name, dtype in ROLLUP_COLUMNS.items()}
+
+
+def to_aggregates(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Convert rollup buckets to the aggregate_buckets layout (mean instead of sum)"""
+    return {
+        "timestamp": columns["timestamp"],
+        "min": columns["min"],
+        "max": columns["max"],
+        "mean": columns["sum"] / np.maximum(columns["count"], 1),
+        "count": columns["count"],
+        "last": columns["last"],
+        "last_status": columns["last_status"]
+    }
+
+
+class RollupSeries:
+    """One sensor's buckets for one tier, ordered by bucket start"""
+
+    def __init__(self):
+        self.columns = {name: np.empty(0, dtype=dtype) for name, dtype in ROLLUP_COLUMNS.items()}
+
+    def __len__(self) -> int:
+        return len(self.columns["timestamp"])
+
+    def merge(self, buckets: Dict[str, np.ndarray]):
+        """Merge new buckets in; buckets for an existing start are combined with it"""
+        if len(buckets["timestamp"]) == 0:
+            return
+        timestamps = self.columns["timestamp"]
+        # Only the stored tail at or after the first new bucket can overlap
+        position = int(np.searchsorted(timestamps, buckets["timestamp"].min(), side="left"))
+        if position == len(timestamps):
+            self.columns = concat_buckets(self.columns, buckets)
+            return
+        # Timestamps are already bucket starts, so an interval of 1 combines exact duplicates only
+        tail = {name: column[position:] for name, column in self.columns.items()}
+        merged = merge_buckets(concat_buckets(tail, buckets), 1)
+        head = {name: column[:position] for name, column in self.columns.items()}
+        self.columns = concat_buckets(head, merged)
+
+    def drop_before(self, cutoff_us: int) -> int:
+        position = int(np.searchsorted(self.columns["timestamp"], cutoff_us, side="left"))
+        if position:
+            self.columns = {name: column[position:].copy() for name, column in self.columns.items()}
+        return position
+
+    def read(self, start_us: Optional[int] = None, end_us: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Buckets starting in [start_us, end_us)"""
+        timestamps = self.columns["timestamp"]
+        lo = 0 if start_us is None else int(np.searchsorted(timestamps, start_us, side="left"))
+        hi = len(timestamps) if end_us is None else int(np.searchsorted(timestamps, end_us, side="left"))
+        return {name: column[lo:hi] for name, column in self.columns.items()}
+
+
+class RollupStore:
+    """
+    Minute, hour and day rollups of every sensor's readings, plus the retention job that
+    maintains them. Raw readings before a sensor's watermark have been rolled into every
+    tier; late readings below the watermark are merged in as they are written.
+    """
+
+    def __init__(self, sensor_store: SensorStore, policies: Optional[Dict[str, Dict[str, Optional[str]]]] = None):
+        self.sensor_store = sensor_store
+        self.lock = threading.RLock()
+        self.tiers: Dict[str, Dict[str, RollupSeries]] = {}
+        self.watermarks: Dict[str, int] = {}
+        self.default_policy = dict(default_retention)
+        self.policies: Dict[str, Dict[str, Optional[str]]] = {}
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.set_policies(self.default_policy, policies or {})
+
+    def set_policies(self, default_policy: Dict[str, Optional[str]], policies: Dict[str, Dict[str, Optional[str]]]):
+        """Replace the retention policies; unset tiers in a sensor type's policy fall back to the default"""
+        default_us = retention_us(default_policy)
+        policies_us = {sensor_type: retention_us(dict(default_policy, **policy)) for sensor_type, policy in policies.items()}
+        with self.lock:
+            self.default_policy = dict(default_policy)
+            self.policies = {sensor_type: dict(policy) for sensor_type, policy in policies.items()}
+            self.default_us = default_us
+            self.policies_us = policies_us
+
+    def policy_us(self, sensor_type: str) -> Dict[str, Optional[int]]:
+        return self.policies_us.get(sensor_type, self.default_us)
+
+    def series(self, sensor_id: str, tier: str) -> RollupSeries:
+        tiers = self.tiers.get(sensor_id)
+        if tiers is None:
+            tiers = self.tiers[sensor_id] = {name: RollupSeries() for name, _ in TIERS}
+        return tiers[tier]
+
+    def _roll(self, sensor_id: str, view: SeriesView):
+        for tier, interval_us in TIERS:
+            self.series(sensor_id, tier).merge(rollup_buckets(view, interval_us))
+
+    def readings_written(self, sensor_id: str, timestamps: np.ndarray, values: np.ndarray, statuses: np.ndarray):
+        """Store write hook: readings older than the watermark were missed by compaction, so roll them up now"""
+        watermark = self.watermarks.get(sensor_id)
+        if watermark is None or len(timestamps) == 0 or timestamps.min() >= watermark:
+            return
+        late = np.flatnonzero(timestamps < watermark)
+        late = late[np.argsort(timestamps[late], kind="stable")]
+        with self.lock:
+            self._roll(sensor_id, SeriesView(timestamps[late], values[late], statuses[late]))
+
+    def compact_sensor(self, sensor: Dict[str, Any], now_us: int) -> Dict[str, int]:
+        """Roll a sensor's new raw readings into every tier, then apply its retention policy"""
+        sensor_id = sensor["sensor_id"]
+        policy = self.policy_us(sensor["sensor_type"])
+        stats = {"rolled_up": 0, "dropped_raw": 0, "dropped_buckets": 0}
+
+        with self.sensor_store.lock:
+            view = self.sensor_store.read(sensor_id)
+            with self.lock:
+                watermark = self.watermarks.get(sensor_id)
+                if watermark is not None:
+                    lo = int(np.searchsorted(view.timestamps, watermark, side="left"))
+                    view = SeriesView(view.timestamps[lo:], view.values[lo:], view.statuses[lo:])
+                if len(view):
+                    self._roll(sensor_id, view)
+                    self.watermarks[sensor_id] = int(view.timestamps[-1]) + 1
+                    stats["rolled_up"] = len(view)
+
+                # Raw readings are only dropped once they are in every tier
+                if policy["raw"] is not None:
+                    stats["dropped_raw"] = self.sensor_store.drop_before(sensor_id, now_us - policy["raw"])
+                for tier, _ in TIERS:
+                    if policy[tier] is not None:
+                        stats["dropped_buckets"] += self.series(sensor_id, tier).drop_before(now_us - policy[tier])
+        return stats
+
+    def reclassify(
+        self,
+        sensor: Dict[str, Any],
+        classify: Callable[[Dict[str, Any], np.ndarray], np.ndarray],
+        start_us: Optional[int] = None,
+        end_us: Optional[int] = None
+    ) -> int:
+        """Re-evaluate last_status of the buckets whose last reading is in [start_us, end_us]; returns how many changed"""
+        changed = 0
+        with self.lock:
+            for rollups in self.tiers.get(sensor["sensor_id"], {}).values():
+                columns = rollups.columns
+                selected = np.ones(len(rollups), dtype=bool)
+                if start_us is not None:
+                    selected &= columns["last_timestamp"] >= start_us
+                if end_us is not None:
+                    selected &= columns["last_timestamp"] <= end_us
+                positions = np.flatnonzero(selected)
+                if not len(positions):
+                    continue
+                # Replace the column rather than writing into it, so buckets already read stay as they were
+                statuses = columns["last_status"].copy()
+                codes = classify(sensor, columns["last"][positions])
+                changed += int(np.count_nonzero(codes != statuses[positions]))
+                statuses[positions] = codes
+                rollups.columns = dict(columns, last_status=statuses)
+        return changed
+
+    def snapshot(self, sensor_id: str) -> Optional[Tuple[int, Dict[str, Dict[str, np.ndarray]]]]:
+        """
+        A sensor's watermark and buckets per tier, or None before its first compaction.
+        Columns are replaced rather than written in place, so the snapshot stays as it was.
+        """
+        with self.lock:
+            watermark = self.watermarks.get(sensor_id)
+            if watermark is None:
+                return None
+            return watermark, {tier: rollups.columns for tier, rollups in self.tiers[sensor_id].items()}
+
+    def restore(self, sensor_id: str, watermark: int, tiers: Dict[str, Dict[str, np.ndarray]]):
+        """Put back a snapshot taken by snapshot()"""
+        with self.lock:
+            self.watermarks[sensor_id] = watermark
+            for tier, columns in tiers.items():
+                self.series(sensor_id, tier).columns = columns
+
+    def compact(self, now_us: int) -> Dict[str, Any]:
+        """Run compaction and retention over every sensor"""
+        started = time.perf_counter()
+        totals = {"sensors": 0, "rolled_up": 0, "dropped_raw": 0, "dropped_buckets": 0}
+        for sensor in list(self.sensor_store.sensors.values()):
+            for key, value in self.compact_sensor(sensor, now_us).items():
+                totals[key] += value
+            totals["sensors"] += 1
+        totals["elapsed_seconds"] = round(time.perf_counter() - started, 6)
+        self.last_run = totals
+        return totals
+
+    def tier_for(self, interval_us: int) -> Optional[str]:
+        """Coarsest tier whose buckets divide the requested interval, or None if only raw data will do"""
+        for tier, tier_us in reversed(TIERS):
+            if interval_us % tier_us == 0:
+                return tier
+        return None
+
+    def aggregate(
+        self,
+        sensor_id: str,
+        interval_us: int,
+        start_us: Optional[int] = None,
+        end_us: Optional[int] = None
+    ) -> Tuple[Dict[str, np.ndarray], str]:
+        """
+        Aggregate a sensor's readings in [start_us, end_us] per interval. Whole tier buckets
+        inside the range come from the coarsest suitable tier; partial buckets at the edges
+        and readings past the watermark come from raw data. Returns (aggregates, tier used).
+        """
+        tier = self.tier_for(interval_us)
+        with self.sensor_store.lock, self.lock:
+            series = self.sensor_store.series[sensor_id]
+            watermark = self.watermarks.get(sensor_id)
+            if tier is None or watermark is None:
+                return to_aggregates(rollup_buckets(series.slice(start_us, end_us), interval_us)), "raw"
+
+            # Tier buckets lying wholly inside the range and below the watermark
+            tier_us = TIER_INTERVALS[tier]
+            lo = None if start_us is None else -(-start_us // tier_us) * tier_us
+            hi = watermark if end_us is None else min(watermark, (end_us + 1) // tier_us * tier_us)
+            if lo is not None and lo >= hi:
+                return to_aggregates(rollup_buckets(series.slice(start_us, end_us), interval_us)), "raw"
+
+            stored = self.series(sensor_id, tier).read(lo, hi)
+            parts = [stored]
+            if lo is not None and start_us < lo:
+                parts.append(rollup_buckets(series.slice(start_us, lo - 1), tier_us))
+            parts.append(rollup_buckets(series.slice(hi, end_us), tier_us))
+            buckets = merge_buckets(concat_buckets(*parts), interval_us)
+        return to_aggregates(buckets), tier
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            buckets = {tier: sum(len(tiers[tier]) for tiers in self.tiers.values()) for tier, _ in TIERS}
+        return {"buckets": buckets, "sensors": len(self.tiers), "last_run": self.last_run}
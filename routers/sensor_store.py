@@ -0,0 +1,295 @@
+from typing import Callable, Dict, List, Optional, Any, Iterable
+from datetime import datetime, timedelta
+import bisect
+import threading
+import numpy as np
+
+# Reading statuses are stored as small integer codes in the series buffers
+READING_STATUSES = ["Normal", "Warning", "Alert"]
+STATUS_CODES = {name: code for code, name in enumerate(READING_STATUSES)}
+
+# Timestamps are stored as naive microseconds since the Unix epoch
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_epoch_us(timestamp: datetime) -> int:
+    """Convert a datetime to epoch microseconds (aware values are converted to local time)"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    return (timestamp - EPOCH) // ONE_MICROSECOND
+
+
+def from_epoch_us(value: int) -> datetime:
+    """Convert epoch microseconds back to a naive datetime"""
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+def epoch_us_to_datetimes(values: np.ndarray) -> List[datetime]:
+    """Convert an array of epoch microseconds to datetimes in one pass"""
+    return values.astype("datetime64[us]").tolist()
+
+
+class SeriesView:
+    """Read-only slice of a sensor series; arrays are views, not copies"""
+
+    __slots__ = ("timestamps", "values", "statuses")
+
+    def __init__(self, timestamps: np.ndarray, values: np.ndarray, statuses: np.ndarray):
+        self.timestamps = timestamps
+        self.values = values
+        self.statuses = statuses
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+
+class SensorSeries:
+    """Growable columnar buffer holding the readings of one sensor, ordered by timestamp"""
+
+    __slots__ = ("timestamps", "values", "statuses", "size")
+
+    def __init__(self, capacity: int = 64):
+        self.timestamps = np.empty(capacity, dtype=np.int64)
+        self.values = np.empty(capacity, dtype=np.float64)
+        self.statuses = np.empty(capacity, dtype=np.uint8)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _reserve(self, extra: int):
+        required = self.size + extra
+        capacity = len(self.timestamps)
+        if required <= capacity:
+            return
+
+        # Grow geometrically so appends stay amortised O(1)
+        while capacity < required:
+            capacity *= 2
+        for name in ("timestamps", "values", "statuses"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def append(self, timestamp_us: int, value: float, status_code: int):
+        """Append a single reading"""
+        self.extend(
+            np.array([timestamp_us], dtype=np.int64),
+            np.array([value], dtype=np.float64),
+            np.array([status_code], dtype=np.uint8)
+        )
+
+    def extend(self, timestamps: np.ndarray, values: np.ndarray, statuses: np.ndarray):
+        """Append a batch of readings, merging if the batch is older than stored data"""
+        count = len(timestamps)
+        if count == 0:
+            return
+
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        statuses = np.asarray(statuses, dtype=np.uint8)
+
+        # Batches from loggers are almost always already sorted
+        if count > 1 and np.any(timestamps[1:] < timestamps[:-1]):
+            order = np.argsort(timestamps, kind="stable")
+            timestamps, values, statuses = timestamps[order], values[order], statuses[order]
+
+        # Late data: merge into fresh buffers so views handed out earlier stay valid
+        if self.size and timestamps[0] < self.timestamps[self.size - 1]:
+            self._merge(timestamps, values, statuses)
+            return
+
+        self._reserve(count)
+        start = self.size
+        end = start + count
+        self.timestamps[start:end] = timestamps
+        self.values[start:end] = values
+        self.statuses[start:end] = statuses
+        self.size = end
+
+    def _merge(self, timestamps: np.ndarray, values: np.ndarray, statuses: np.ndarray):
+        """Merge a sorted batch that overlaps stored data; stored readings stay ahead of new ones at equal times"""
+        lo = int(np.searchsorted(self.timestamps[:self.size], timestamps[0], side="right"))
+        total = self.size + len(timestamps)
+        capacity = len(self.timestamps)
+        while capacity < total:
+            capacity *= 2
+
+        order = np.argsort(np.concatenate((self.timestamps[lo:self.size], timestamps)), kind="stable")
+        for name, batch in (("timestamps", timestamps), ("values", values), ("statuses", statuses)):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:lo] = old[:lo]
+            new[lo:total] = np.concatenate((old[lo:self.size], batch))[order]
+            setattr(self, name, new)
+        self.size = total
+
+    def drop_before(self, cutoff_us: int) -> int:
+        """Drop readings older than cutoff_us; returns how many were dropped"""
+        dropped = int(np.searchsorted(self.timestamps[:self.size], cutoff_us, side="left"))
+        if dropped == 0:
+            return 0
+
+        # Copy the kept readings into fresh buffers so views handed out earlier stay valid
+        kept = self.size - dropped
+        capacity = max(64, 1 << max(kept - 1, 0).bit_length())
+        for name in ("timestamps", "values", "statuses"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:kept] = old[dropped:self.size]
+            setattr(self, name, new)
+        self.size = kept
+        return dropped
+
+    def bounds(self, start_us: Optional[int] = None, end_us: Optional[int] = None):
+        """Return the [lo, hi) index range covering start_us <= t <= end_us"""
+        stored = self.timestamps[:self.size]
+        lo = 0 if start_us is None else int(np.searchsorted(stored, start_us, side="left"))
+        hi = self.size if end_us is None else int(np.searchsorted(stored, end_us, side="right"))
+        return lo, max(lo, hi)
+
+    def slice(self, start_us: Optional[int] = None, end_us: Optional[int] = None) -> SeriesView:
+        """Return the readings between start_us and end_us (inclusive) without copying"""
+        lo, hi = self.bounds(start_us, end_us)
+        return SeriesView(self.timestamps[lo:hi], self.values[lo:hi], self.statuses[lo:hi])
+
+    def last(self) -> Optional[SeriesView]:
+        """Return the most recent reading as a one-element view"""
+        if self.size == 0:
+            return None
+        return SeriesView(
+            self.timestamps[self.size - 1:self.size],
+            self.values[self.size - 1:self.size],
+            self.statuses[self.size - 1:self.size]
+        )
+
+
+class SensorStore:
+    """In-process time-series store: sensor metadata plus one columnar series per sensor"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.sensors: Dict[str, Dict[str, Any]] = {}
+        self.series: Dict[str, SensorSeries] = {}
+        self.facility_sensors: Dict[str, List[str]] = {}
+        self.listeners: List[Callable] = []
+        self.sensor_listeners: List[Callable] = []
+        self.write_hooks: List[Callable] = []
+
+    def add_listener(self, listener: Callable):
+        """
+        Register a callback run after each write as
+        listener(sensor, timestamps, values, statuses, previous_status)
+        where previous_status is the status code of the latest reading before the write.
+        """
+        self.listeners.append(listener)
+
+    def add_write_hook(self, hook: Callable):
+        """
+        Register a callback run inside the store lock after each write as
+        hook(sensor_id, timestamps, values, statuses), for state that must never lag the series.
+        Hooks must be quick and must not call back into listeners.
+        """
+        self.write_hooks.append(hook)
+
+    def add_sensor_listener(self, listener: Callable):
+        """Register a callback run as listener(sensor, previous_status) when a sensor is registered (previous_status None) or updated"""
+        self.sensor_listeners.append(listener)
+
+    def register_sensor(
+        self,
+        sensor_id: str,
+        facility_id: str,
+        sensor_name: str,
+        sensor_type: str,
+        location: str,
+        unit: str,
+        status: str = "Online"
+    ) -> Dict[str, Any]:
+        """Register a sensor (or update its metadata if it already exists)"""
+        with self.lock:
+            sensor = self.sensors.get(sensor_id)
+            if sensor is None:
+                previous_status = None
+                sensor = {"sensor_id": sensor_id, "facility_id": facility_id}
+                self.sensors[sensor_id] = sensor
+                self.series[sensor_id] = SensorSeries()
+                bisect.insort(self.facility_sensors.setdefault(facility_id, []), sensor_id)
+            else:
+                previous_status = sensor["status"]
+            sensor.update({
+                "sensor_name": sensor_name,
+                "sensor_type": sensor_type,
+                "location": location,
+                "unit": unit,
+                "status": status
+            })
+
+        for listener in self.sensor_listeners:
+            listener(sensor, previous_status)
+        return sensor
+
+    def get_sensor(self, sensor_id: str) -> Optional[Dict[str, Any]]:
+        """Get sensor metadata by ID"""
+        return self.sensors.get(sensor_id)
+
+    def get_facility_sensors(self, facility_id: str, after: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get metadata for the sensors registered at a facility in sensor_id order, optionally only those after a given ID"""
+        sensor_ids = self.facility_sensors.get(facility_id, [])
+        if after is not None:
+            sensor_ids = sensor_ids[bisect.bisect_right(sensor_ids, after):]
+        return [self.sensors[sensor_id] for sensor_id in sensor_ids]
+
+    def append(self, sensor_id: str, timestamp: datetime, value: float, status: str):
+        """Append a single reading to a sensor's series"""
+        with self.lock:
+            self.series[sensor_id].append(to_epoch_us(timestamp), value, STATUS_CODES[status])
+
+    def extend(self, sensor_id: str, timestamps: Iterable[int], values: Iterable[float], statuses: Iterable[int]):
+        """Append a batch of readings (epoch microseconds, values, status codes) to a sensor's series"""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        statuses = np.asarray(statuses, dtype=np.uint8)
+
+        with self.lock:
+            series = self.series[sensor_id]
+            previous_status = int(series.statuses[series.size - 1]) if series.size else None
+            series.extend(timestamps, values, statuses)
+            for hook in self.write_hooks:
+                hook(sensor_id, timestamps, values, statuses)
+
+        for listener in self.listeners:
+            listener(self.sensors[sensor_id], timestamps, values, statuses, previous_status)
+
+    def drop_before(self, sensor_id: str, cutoff_us: int) -> int:
+        """Drop a sensor's readings older than cutoff_us (the latest reading is always kept)"""
+        with self.lock:
+            series = self.series[sensor_id]
+            if series.size == 0:
+                return 0
+            return series.drop_before(min(cutoff_us, int(series.timestamps[series.size - 1])))
+
+    def read(self, sensor_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> SeriesView:
+        """Read a sensor's readings in a time range"""
+        start_us = to_epoch_us(start) if start is not None else None
+        end_us = to_epoch_us(end) if end is not None else None
+        with self.lock:
+            return self.series[sensor_id].slice(start_us, end_us)
+
+    def last(self, sensor_id: str) -> Optional[SeriesView]:
+        """Read a sensor's most recent reading"""
+        with self.lock:
+            return self.series[sensor_id].last()
+
+
+def serialize_readings(view: SeriesView, unit: str) -> List[Dict[str, Any]]:
+    """Materialise a series view as reading dicts, converting each column in bulk"""
+    timestamps = epoch_us_to_datetimes(view.timestamps)
+    values = view.values.tolist()
+    statuses = [READING_STATUSES[code] for code in view.statuses.tolist()]
+    return [
+        {"timestamp": timestamp, "value": value, "unit": unit, "status": status}
+        for timestamp, value, status in zip(timestamps, values, statuses)
+    ]
@@ -0,0 +1,491 @@
+"""
+Deterministic synthetic telemetry for capacity testing.
+
+Every value comes from a generator seeded by the run seed plus a fixed key (facility, sensor, day or week),
+so any facility, sensor or time window can be regenerated on its own and a run with
+the same seed always produces the same fleet and the same readings.
+
+Usage:
+    python -m routers.telemetry_simulator fill --facilities 500 --sensors 200 --days 90
+    python -m routers.telemetry_simulator replay --url http://localhost:8000 --rate 20000 --duration 300
+"""
+from typing import Callable, Dict, Iterator, List, Optional, Any, Tuple
+from datetime import datetime
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+import numpy as np
+from .sensor_store import SensorStore, to_epoch_us, from_epoch_us
+
+DAY_US = 86_400_000_000
+HOUR_US = 3_600_000_000
+
+# Independent random streams
+STREAM_METADATA = 0
+STREAM_STORMS = 1
+STREAM_BLOCK = 2
+
+# Noise and failures are drawn per sensor in blocks of this many days
+BLOCK_DAYS = 7
+
+# Storms keep affecting readings for a few days after they start
+STORM_LOOKBACK_DAYS = 5
+
+# Period of the slow wander that non-creeping sensors drift along
+DRIFT_PERIOD_DAYS = 180
+
+# Fleet shape and event rates
+default_simulation_config = {
+    "seed": 42,
+    "facilities": 4,
+    "sensors_per_facility": 10,
+    "interval_seconds": 3600,         # Must divide a day
+    "origin": "2025-01-01",           # Creep and drift are measured from this date
+    "storms_per_month": 3.0,          # Per facility
+    "failures_per_sensor_month": 0.5, # Dropouts, stuck readings and spikes
+    "days": 1.0                       # History loaded when the server starts with a simulated fleet
+}
+
+# Per sensor type behaviour: base value range, noise, drift per day, daily cycle amplitude,
+# response per mm/h of rainfall and its time constant, and floor (default 0). Creeping sensors only drift upwards.
+default_sensor_profiles = {
+    "piezometer": {"unit": "kPa", "base": (50, 150), "noise": 0.5, "drift": 0.3, "diurnal": 0.5, "storm": 1.5, "storm_tau_hours": 8},
+    "inclinometer": {"unit": "mm", "base": (0, 3), "noise": 0.05, "drift": 0.002, "diurnal": 0.02, "storm": 0.02, "storm_tau_hours": 24, "creep": True},
+    "water_level": {"unit": "m", "base": (10, 16), "noise": 0.02, "drift": 0.02, "diurnal": 0.0, "storm": 0.1, "storm_tau_hours": 12},
+    "flow_rate": {"unit": "L/s", "base": (5, 15), "noise": 0.3, "drift": 0.05, "diurnal": 0.5, "storm": 0.8, "storm_tau_hours": 4},
+    "rainfall": {"unit": "mm", "base": (0, 0), "noise": 0.0, "drift": 0.0, "diurnal": 0.0, "storm": 1.0, "storm_tau_hours": 0},
+    "temperature": {"unit": "°C", "base": (15, 25), "noise": 0.2, "drift": 0.05, "diurnal": 4.0, "storm": -0.1, "storm_tau_hours": 3, "min": -40.0},
+    "ph": {"unit": "pH", "base": (7.0, 8.0), "noise": 0.03, "drift": 0.003, "diurnal": 0.02, "storm": -0.01, "storm_tau_hours": 12},
+    "conductivity": {"unit": "μS/cm", "base": (200, 800), "noise": 5.0, "drift": 1.0, "diurnal": 0.0, "storm": -8.0, "storm_tau_hours": 12},
+    "turbidity": {"unit": "NTU", "base": (1, 15), "noise": 0.5, "drift": 0.02, "diurnal": 0.0, "storm": 1.5, "storm_tau_hours": 6},
+    "settlement": {"unit": "mm", "base": (0, 8), "noise": 0.05, "drift": 0.005, "diurnal": 0.0, "storm": 0.0, "storm_tau_hours": 0, "creep": True}
+}
+
+LOCATIONS = ["Dam Crest", "Upstream Slope", "Downstream Slope", "Foundation", "Spillway", "Decant Pond"]
+SENSOR_STATUSES = ["Online", "Online", "Online", "Online", "Maintenance", "Offline"]
+FAILURE_KINDS = ["dropout", "stuck", "spike"]
+
+# Ingestion responses that mean "back off and retry"
+BACKPRESSURE_STATUSES = (429, 503)
+
+# A storm at a facility: (start, end) in epoch microseconds and rainfall intensity in mm/h
+Storm = Tuple[int, int, float]
+
+
+def facility_number(facility_id: str) -> int:
+    return int(facility_id[3:])
+
+
+def sensor_number(sensor_id: str) -> int:
+    return int(sensor_id[-3:])
+
+
+class TelemetrySimulator:
+    """Seeded generator for a fleet of facilities, their sensors and their readings"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, profiles: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.config = dict(default_simulation_config, **(config or {}))
+        self.profiles = dict(default_sensor_profiles if profiles is None else profiles)
+        self.sensor_types = sorted(self.profiles)
+        self.seed = int(self.config["seed"])
+        self.interval_us = int(self.config["interval_seconds"]) * 1_000_000
+        if self.interval_us <= 0 or DAY_US % self.interval_us:
+            raise ValueError("interval_seconds must be positive and divide a day")
+        if not 1 <= int(self.config["sensors_per_facility"]) <= 999:
+            raise ValueError("sensors_per_facility must be between 1 and 999")
+        self.slots_per_day = DAY_US // self.interval_us
+        self.origin_us = to_epoch_us(datetime.fromisoformat(str(self.config["origin"])))
+
+    def rng(self, stream: int, *key: int) -> np.random.Generator:
+        return np.random.default_rng([self.seed, stream, *key])
+
+    def facility_ids(self) -> List[str]:
+        return [f"FAC{number:03d}" for number in range(1, int(self.config["facilities"]) + 1)]
+
+    def facility(self, facility_id: str) -> Dict[str, Any]:
+        return {"name": f"Simulated Facility {facility_number(facility_id)}"}
+
+    def _draw_sensor(self, facility: int, index: int) -> Dict[str, Any]:
+        rng = self.rng(STREAM_METADATA, facility, index)
+        sensor_type = self.sensor_types[rng.integers(len(self.sensor_types))]
+        return {
+            "sensor_type": sensor_type,
+            "location": LOCATIONS[rng.integers(len(LOCATIONS))],
+            "status": SENSOR_STATUSES[rng.integers(len(SENSOR_STATUSES))],
+            "base": rng.uniform(),
+            "drift": rng.normal(),
+            "phase": rng.uniform(0, 2 * np.pi)
+        }
+
+    def sensors(self, facility_id: str) -> List[Dict[str, Any]]:
+        """Sensor metadata for a facility, in the shape SensorStore.register_sensor takes"""
+        number = facility_number(facility_id)
+        sensors = []
+        for index in range(1, int(self.config["sensors_per_facility"]) + 1):
+            draw = self._draw_sensor(number, index)
+            sensor_type = draw["sensor_type"]
+            sensors.append({
+                "sensor_id": f"SEN{facility_id[3:]}{index:03d}",
+                "facility_id": facility_id,
+                "sensor_name": f"{sensor_type.capitalize()} {index}",
+                "sensor_type": sensor_type,
+                "location": draw["location"],
+                "unit": self.profiles[sensor_type]["unit"],
+                "status": draw["status"]
+            })
+        return sensors
+
+    def sensor_model(self, sensor: Dict[str, Any]) -> Dict[str, float]:
+        """Per-sensor constants: base value, drift per day and daily cycle phase"""
+        draw = self._draw_sensor(facility_number(sensor["facility_id"]), sensor_number(sensor["sensor_id"]))
+        profile = self.profiles[sensor["sensor_type"]]
+        low, high = profile["base"]
+        drift = draw["drift"] * profile["drift"]
+        return {
+            "base": low + (high - low) * draw["base"],
+            "drift_per_day": abs(drift) if profile.get("creep") else drift,
+            "phase": draw["phase"]
+        }
+
+    def storms(self, facility_id: str, start_us: int, end_us: int) -> List[Storm]:
+        """Storms at a facility that can affect readings in [start_us, end_us)"""
+        number = facility_number(facility_id)
+        rate = float(self.config["storms_per_month"]) / 30
+        storms = []
+        for day in range(start_us // DAY_US - STORM_LOOKBACK_DAYS, (end_us - 1) // DAY_US + 1):
+            rng = self.rng(STREAM_STORMS, number, day)
+            for _ in range(rng.poisson(rate)):
+                start = day * DAY_US + int(rng.uniform(0, DAY_US))
+                duration = int(rng.uniform(1, 12) * HOUR_US)
+                intensity = float(rng.lognormal(1.2, 0.6))
+                storms.append((start, start + duration, intensity))
+        storms.sort()
+        return storms
+
+    def _storm_response(self, timestamps: np.ndarray, storms: List[Storm], tau_hours: float) -> np.ndarray:
+        """Rainfall intensity (tau 0), or a first-order lagged response to it"""
+        response = np.zeros(len(timestamps))
+        for start, end, intensity in storms:
+            lo = np.searchsorted(timestamps, start)
+            if tau_hours <= 0:
+                hi = np.searchsorted(timestamps, end)
+                response[lo:hi] += intensity
+                continue
+            hi = np.searchsorted(timestamps, end + int(tau_hours * 8 * HOUR_US))
+            t = timestamps[lo:hi]
+            rising = np.minimum(t, end) - start
+            after = np.maximum(t - end, 0)
+            response[lo:hi] += (
+                intensity * (1 - np.exp(-rising / (tau_hours * HOUR_US))) * np.exp(-after / (tau_hours * HOUR_US))
+            )
+        return response
+
+    def _block_noise(self, sensor: Dict[str, Any], model: Dict[str, float], block: int, values: np.ndarray) -> Optional[np.ndarray]:
+        """Add a block's noise and failures to its values in place; returns a keep mask when readings drop out"""
+        profile = self.profiles[sensor["sensor_type"]]
+        rng = self.rng(STREAM_BLOCK, facility_number(sensor["facility_id"]), sensor_number(sensor["sensor_id"]), block)
+
+        # Failure draws come first and always have the same size, so the noise never shifts
+        fails = rng.random(BLOCK_DAYS) < float(self.config["failures_per_sensor_month"]) / 30
+        kinds = rng.integers(len(FAILURE_KINDS), size=BLOCK_DAYS)
+        starts = rng.integers(self.slots_per_day, size=BLOCK_DAYS)
+        hours = rng.uniform(0.5, 12, size=BLOCK_DAYS)
+        signs = rng.choice([-1, 1], size=(BLOCK_DAYS, 3))
+        if profile["noise"]:
+            values += rng.normal(0, profile["noise"], len(values))
+
+        keep = None
+        for day in np.flatnonzero(fails).tolist():
+            lo = day * self.slots_per_day + int(starts[day])
+            hi = min((day + 1) * self.slots_per_day, lo + max(1, int(hours[day] * HOUR_US // self.interval_us)))
+            kind = FAILURE_KINDS[kinds[day]]
+            if kind == "dropout":
+                if keep is None:
+                    keep = np.ones(len(values), dtype=bool)
+                keep[lo:hi] = False
+            elif kind == "stuck":
+                values[lo:hi] = values[lo]
+            else:
+                count = min(hi - lo, 3)
+                spread = max(profile["noise"] * 10, abs(model["base"]) * 0.1, 1.0)
+                values[lo:lo + count] += signs[day, :count] * spread
+        return keep
+
+    def readings(
+        self,
+        sensor: Dict[str, Any],
+        start_us: int,
+        end_us: int,
+        storms: Optional[List[Storm]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Timestamps (epoch microseconds) and values for a sensor in [start_us, end_us)"""
+        if end_us <= start_us:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        if storms is None:
+            storms = self.storms(sensor["facility_id"], start_us, end_us)
+        profile = self.profiles[sensor["sensor_type"]]
+        model = self.sensor_model(sensor)
+
+        # Generate whole blocks so every window sees the same noise and failures
+        block_us = BLOCK_DAYS * DAY_US
+        block_slots = BLOCK_DAYS * self.slots_per_day
+        first_block, last_block = start_us // block_us, (end_us - 1) // block_us
+        timestamps = first_block * block_us + np.arange((last_block - first_block + 1) * block_slots, dtype=np.int64) * self.interval_us
+        days = (timestamps - self.origin_us) / DAY_US
+
+        # Creep grows steadily; other drift wanders slowly around the base value
+        if profile.get("creep"):
+            values = model["base"] + model["drift_per_day"] * np.maximum(days, 0)
+        else:
+            amplitude = model["drift_per_day"] * DRIFT_PERIOD_DAYS / (2 * np.pi)
+            values = model["base"] + amplitude * np.sin(2 * np.pi * days / DRIFT_PERIOD_DAYS + model["phase"])
+        if profile["diurnal"]:
+            values += profile["diurnal"] * np.sin(2 * np.pi * days + model["phase"])
+
+        # Noise and occasional failures: gaps, a stuck logger or spurious spikes
+        keep = None
+        for offset, block in enumerate(range(first_block, last_block + 1)):
+            span = slice(offset * block_slots, (offset + 1) * block_slots)
+            block_keep = self._block_noise(sensor, model, block, values[span])
+            if block_keep is not None:
+                if keep is None:
+                    keep = np.ones(len(timestamps), dtype=bool)
+                keep[span] = block_keep
+
+        lo, hi = np.searchsorted(timestamps, [start_us, end_us])
+        timestamps, values = timestamps[lo:hi], values[lo:hi]
+        if profile["storm"] and storms:
+            values += profile["storm"] * self._storm_response(timestamps, storms, profile["storm_tau_hours"])
+        values = np.round(np.maximum(values, profile.get("min", 0.0)), 3)
+        if keep is not None:
+            window_keep = keep[lo:hi]
+            return timestamps[window_keep], values[window_keep]
+        return timestamps, values
+
+    def iter_fleet(
+        self,
+        start_us: int,
+        end_us: int,
+        facility_ids: Optional[List[str]] = None
+    ) -> Iterator[Tuple[Dict[str, Any], np.ndarray, np.ndarray]]:
+        """Yield (sensor, timestamps, values) for every sensor in the fleet"""
+        for facility_id in facility_ids or self.facility_ids():
+            storms = self.storms(facility_id, start_us, end_us)
+            for sensor in self.sensors(facility_id):
+                timestamps, values = self.readings(sensor, start_us, end_us, storms)
+                yield sensor, timestamps, values
+
+
+def fill_store(
+    simulator: TelemetrySimulator,
+    store: SensorStore,
+    classify: Callable[[Dict[str, Any], np.ndarray], np.ndarray],
+    start: datetime,
+    end: datetime,
+    facility_ids: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """Register the simulated fleet and bulk load its history into a sensor store"""
+    started = time.perf_counter()
+    sensor_count = readings = 0
+    for metadata, timestamps, values in simulator.iter_fleet(to_epoch_us(start), to_epoch_us(end), facility_ids):
+        sensor = store.register_sensor(**metadata)
+        if len(timestamps):
+            store.extend(sensor["sensor_id"], timestamps, values, classify(sensor, values))
+        sensor_count += 1
+        readings += len(timestamps)
+    elapsed = time.perf_counter() - started
+    return {
+        "sensors": sensor_count,
+        "readings": readings,
+        "elapsed_seconds": round(elapsed, 6),
+        "rows_per_second": round(readings / elapsed, 1) if elapsed > 0 else 0.0
+    }
+
+
+def iter_ndjson_batches(
+    simulator: TelemetrySimulator,
+    start_us: int,
+    end_us: int,
+    batch_rows: int = 5000,
+    facility_ids: Optional[List[str]] = None
+) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yield (row count, NDJSON body) batches for the ingestion endpoint in time order.
+    The fleet is generated a time slice at a time, sized so a slice holds about one batch,
+    so memory stays bounded by the batch size rather than the fleet's readings per day.
+    """
+    facility_ids = facility_ids or simulator.facility_ids()
+    sensor_count = sum(len(simulator.sensors(facility_id)) for facility_id in facility_ids)
+    if not sensor_count or end_us <= start_us:
+        return
+    slice_us = min(DAY_US, simulator.interval_us * max(1, batch_rows // sensor_count))
+
+    pending: List[str] = []
+    for slice_start in range(start_us - start_us % simulator.interval_us, end_us, slice_us):
+        window = (max(start_us, slice_start), min(end_us, slice_start + slice_us))
+        sensor_ids, timestamps, values = [], [], []
+        for sensor, sensor_timestamps, sensor_values in simulator.iter_fleet(*window, facility_ids):
+            sensor_ids.extend([sensor["sensor_id"]] * len(sensor_timestamps))
+            timestamps.append(sensor_timestamps)
+            values.append(sensor_values)
+        if not sensor_ids:
+            continue
+        timestamps = np.concatenate(timestamps)
+        values = np.concatenate(values)
+        order = np.argsort(timestamps, kind="stable")
+        pending.extend(
+            json.dumps({"sensor_id": sensor_ids[i], "timestamp": timestamp, "value": value})
+            for i, timestamp, value in zip(order.tolist(), (timestamps[order] // 1_000_000).tolist(), values[order].tolist())
+        )
+        while len(pending) >= batch_rows:
+            rows, pending = pending[:batch_rows], pending[batch_rows:]
+            yield len(rows), ("\n".join(rows) + "\n").encode("utf-8")
+    if pending:
+        yield len(pending), ("\n".join(pending) + "\n").encode("utf-8")
+
+
+def replay(
+    simulator: TelemetrySimulator,
+    url: str,
+    rate: float,
+    duration_seconds: float,
+    start: Optional[datetime] = None,
+    batch_rows: int = 5000,
+    token: Optional[str] = None,
+    facility_ids: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Replay simulated readings from start (default now) into a running server's ingestion
+    endpoint at about rate rows per second, for duration_seconds of wall-clock time.
+    Simulated time runs as fast as the rate allows, so it can move ahead of the clock.
+    The server must hold the same fleet (same seed and size) or the rows are rejected.
+    A batch refused with 429 or 503 is retried after the server's Retry-After. A 503 can come
+    after part of the batch was stored, so a retry may store some of its rows twice.
+    """
+    endpoint = url.rstrip("/") + f"/api/monitoring/ingest?batch_size={batch_rows}"
+    headers = {"Content-Type": "application/x-ndjson"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+
+    start_us = to_epoch_us(start or datetime.now())
+    end_us = start_us + 365 * DAY_US
+    sent = accepted = rejected = requests = 0
+    refused = retried_batches = 0
+    backoff_seconds = 0.0
+    latencies = []
+    started = time.perf_counter()
+
+    for rows, body in iter_ndjson_batches(simulator, start_us, end_us, batch_rows, facility_ids):
+        if time.perf_counter() - started >= duration_seconds:
+            break
+
+        # Retry the batch for as long as the server pushes back, within the run's duration
+        report = None
+        attempts = 0
+        while report is None:
+            request = urllib.request.Request(endpoint, data=body, headers=headers, method="POST")
+            posted = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request) as response:
+                    report = json.loads(response.read())
+            except urllib.error.HTTPError as e:
+                if e.code not in BACKPRESSURE_STATUSES:
+                    raise
+                retry_after = e.headers.get("Retry-After", "1")
+                e.close()
+                refused += 1
+                attempts += 1
+                wait = float(retry_after) if retry_after.isdigit() else 1.0
+                if time.perf_counter() - started + wait >= duration_seconds:
+                    break
+                backoff_seconds += wait
+                time.sleep(wait)
+        if attempts:
+            retried_batches += 1
+        if report is None:
+            break
+        latencies.append(time.perf_counter() - posted)
+        sent += rows
+        accepted += report["accepted"]
+        rejected += report["rejected"]
+        requests += 1
+
+        # Pace to the requested rate
+        ahead = sent / rate - (time.perf_counter() - started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "sent": sent,
+        "accepted": accepted,
+        "rejected": rejected,
+        "refused": refused,  # 429 and 503 responses
+        "retried_batches": retried_batches,
+        "backoff_seconds": round(backoff_seconds, 3),
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(sent / elapsed, 1) if elapsed > 0 else 0.0,
+        "latency_p50_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+        "latency_p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2) if latencies else None
+    }
+
+
+def simulation_config_from_env(environ: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """Simulator settings from TAILINGSIQ_SIM_* variables, or None when TAILINGSIQ_SIM_FACILITIES is unset"""
+    if not environ.get("TAILINGSIQ_SIM_FACILITIES"):
+        return None
+    config = {"facilities": int(environ["TAILINGSIQ_SIM_FACILITIES"])}
+    for key, name, cast in (
+        ("seed", "TAILINGSIQ_SEED", int),
+        ("sensors_per_facility", "TAILINGSIQ_SIM_SENSORS", int),
+        ("interval_seconds", "TAILINGSIQ_SIM_INTERVAL_SECONDS", int),
+        ("days", "TAILINGSIQ_SIM_DAYS", float)
+    ):
+        if environ.get(name):
+            config[key] = cast(environ[name])
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["fill", "replay"])
+    parser.add_argument("--seed", type=int, default=default_simulation_config["seed"])
+    parser.add_argument("--facilities", type=int, default=default_simulation_config["facilities"])
+    parser.add_argument("--sensors", type=int, default=default_simulation_config["sensors_per_facility"], help="Sensors per facility")
+    parser.add_argument("--interval", type=int, default=default_simulation_config["interval_seconds"], help="Seconds between readings")
+    parser.add_argument("--days", type=float, default=30, help="History to generate (fill)")
+    parser.add_argument("--end", help="End of the generated history, ISO 8601 (fill, default now)")
+    parser.add_argument("--url", default="http://localhost:8000", help="Server to replay into")
+    parser.add_argument("--rate", type=float, default=5000, help="Rows per second (replay)")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to replay for")
+    parser.add_argument("--batch", type=int, default=5000, help="Rows per ingestion request")
+    parser.add_argument("--token", help="Bearer token for the API")
+    args = parser.parse_args()
+
+    simulator = TelemetrySimulator({
+        "seed": args.seed,
+        "facilities": args.facilities,
+        "sensors_per_facility": args.sensors,
+        "interval_seconds": args.interval
+    })
+
+    if args.mode == "fill":
+        from .threshold_rules import ThresholdRuleSet, default_threshold_rules
+
+        rules = ThresholdRuleSet(default_threshold_rules)
+        end = datetime.fromisoformat(args.end) if args.end else datetime.now()
+        start = from_epoch_us(to_epoch_us(end) - int(args.days * DAY_US))
+        report = fill_store(simulator, SensorStore(), rules.classify, start, end)
+    else:
+        report = replay(simulator, args.url, args.rate, args.duration, batch_rows=args.batch, token=args.token)
+
+    for key, value in report.items():
+        print(f"{key + ':':<20}{value}")
+
+
+if __name__ == "__main__":
+    main()
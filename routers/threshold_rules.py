@@ -0,0 +1,131 @@
+from typing import Callable, Dict, List, Optional, Any, Iterable
+from datetime import datetime
+import numpy as np
+from .sensor_store import SensorStore, STATUS_CODES, to_epoch_us
+
+# Threshold fields a rule may set; missing bounds never trigger
+THRESHOLD_FIELDS = ["warning_low", "warning_high", "alert_low", "alert_high"]
+
+# Default thresholds per sensor type
+default_threshold_rules = [
+    {"sensor_type": "piezometer", "alert_high": 140},
+    {"sensor_type": "inclinometer", "warning_high": 4},
+    {"sensor_type": "water_level", "warning_high": 18},
+    {"sensor_type": "ph", "warning_low": 6.8, "warning_high": 8.2}
+]
+
+
+def rule_scope(rule: Dict[str, Any]) -> tuple:
+    """Key identifying what a rule applies to: a sensor, a facility's sensor type, or a sensor type"""
+    if rule.get("sensor_id"):
+        return ("sensor", rule["sensor_id"])
+    if rule.get("facility_id"):
+        return ("facility", rule["facility_id"], rule["sensor_type"])
+    return ("type", rule["sensor_type"])
+
+
+class ThresholdRuleSet:
+    """
+    Threshold rules compiled into parallel arrays so a whole batch of readings
+    is classified with a handful of vectorised comparisons.
+    The most specific rule wins: sensor, then facility + sensor type, then sensor type.
+    """
+
+    def __init__(self, rules: Iterable[Dict[str, Any]]):
+        self.rules: List[Dict[str, Any]] = []
+        self.index: Dict[tuple, int] = {}
+
+        # Row 0 is the "no rule" row: every reading is Normal
+        bounds = {field: [np.nan] for field in THRESHOLD_FIELDS}
+
+        for rule in rules:
+            rule = {key: value for key, value in rule.items() if value is not None}
+            if not rule.get("sensor_type") and not rule.get("sensor_id"):
+                raise ValueError("A threshold rule needs a sensor_type or sensor_id")
+            for low, high in (("warning_low", "warning_high"), ("alert_low", "alert_high")):
+                if low in rule and high in rule and rule[low] > rule[high]:
+                    raise ValueError(f"{low} must not exceed {high}")
+
+            scope = rule_scope(rule)
+            if scope in self.index:
+                raise ValueError(f"Duplicate threshold rule for {' '.join(scope[1:])}")
+            self.index[scope] = len(self.rules) + 1
+            self.rules.append(rule)
+            for field in THRESHOLD_FIELDS:
+                bounds[field].append(rule.get(field, np.nan))
+
+        # Missing bounds become +/-inf so comparisons against them are always False
+        self.warning_low = np.nan_to_num(np.array(bounds["warning_low"], dtype=np.float64), nan=-np.inf)
+        self.warning_high = np.nan_to_num(np.array(bounds["warning_high"], dtype=np.float64), nan=np.inf)
+        self.alert_low = np.nan_to_num(np.array(bounds["alert_low"], dtype=np.float64), nan=-np.inf)
+        self.alert_high = np.nan_to_num(np.array(bounds["alert_high"], dtype=np.float64), nan=np.inf)
+
+    def resolve(self, sensor: Dict[str, Any]) -> int:
+        """Return the rule row that applies to a sensor"""
+        index = self.index
+        return (
+            index.get(("sensor", sensor["sensor_id"]))
+            or index.get(("facility", sensor["facility_id"], sensor["sensor_type"]))
+            or index.get(("type", sensor["sensor_type"]))
+            or 0
+        )
+
+    def thresholds(self, sensor: Dict[str, Any]) -> Dict[str, float]:
+        """Return the effective bounds for a sensor (infinite when unset)"""
+        row = self.resolve(sensor)
+        return {field: float(getattr(self, field)[row]) for field in THRESHOLD_FIELDS}
+
+    def evaluate(self, rows: Any, values: np.ndarray) -> np.ndarray:
+        """Classify values into status codes; rows is one rule row or an array aligned with values"""
+        values = np.asarray(values, dtype=np.float64)
+        codes = np.full(values.shape, STATUS_CODES["Normal"], dtype=np.uint8)
+        warning = (values < self.warning_low[rows]) | (values > self.warning_high[rows])
+        alert = (values < self.alert_low[rows]) | (values > self.alert_high[rows])
+        codes[warning] = STATUS_CODES["Warning"]
+        codes[alert] = STATUS_CODES["Alert"]
+        return codes
+
+    def classify(self, sensor: Dict[str, Any], values: np.ndarray) -> np.ndarray:
+        """Classify a batch of readings from one sensor"""
+        return self.evaluate(self.resolve(sensor), values)
+
+
+def reclassify_history(
+    store: SensorStore,
+    rules: ThresholdRuleSet,
+    sensors: List[Dict[str, Any]],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    listener: Optional[Callable[[Dict[str, Any], np.ndarray, np.ndarray, np.ndarray], None]] = None
+) -> Dict[str, int]:
+    """
+    Re-evaluate stored readings against the current rules.
+    listener is called, under the store lock, with each sensor's changed readings (timestamps, values, new statuses).
+    """
+    start_us = to_epoch_us(start) if start is not None else None
+    end_us = to_epoch_us(end) if end is not None else None
+    readings = 0
+    changed = 0
+
+    with store.lock:
+        for sensor in sensors:
+            series = store.series[sensor["sensor_id"]]
+            lo, hi = series.bounds(start_us, end_us)
+            if lo == hi:
+                continue
+            codes = rules.classify(sensor, series.values[lo:hi])
+            positions = np.flatnonzero(codes != series.statuses[lo:hi])
+            readings += hi - lo
+            if not len(positions):
+                continue
+            changed += len(positions)
+
+            # Write into a copy so views handed out earlier keep the statuses they were read with
+            statuses = series.statuses.copy()
+            statuses[lo:hi] = codes
+            series.statuses = statuses
+            if listener is not None:
+                positions += lo
+                listener(sensor, series.timestamps[positions], series.values[positions], series.statuses[positions])
+
+    return {"sensors": len(sensors), "readings": readings, "changed": changed}